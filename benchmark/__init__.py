@@ -0,0 +1,7 @@
+import os
+import sys
+
+# srcのモジュールをsrc/main.pyと同じ名前で読み込めるようにする
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
@@ -0,0 +1,72 @@
+import argparse
+import time
+from typing import Any, Callable
+
+import ffmpeg
+
+from converter.graph import compile_args
+
+
+def create_graph(count: int) -> Any:
+    """
+    VSMLの変換結果に近い形の、入力ごとにoverlayを重ねたグラフを作る。
+    """
+
+    video = ffmpeg.input("color=c=black:s=1920x1080:d=10", f="lavfi")
+    audio = ffmpeg.input("anullsrc=d=10", f="lavfi")
+    audios = [audio]
+    for i in range(count):
+        source = ffmpeg.input("source_{}.mp4".format(i))
+        layer = (
+            source.video.trim(start=0, duration=1)
+            .setpts("PTS-STARTPTS")
+            .setpts("PTS+{}/TB".format(i * 0.1))
+        )
+        video = video.overlay(layer, x=i, y=i, eof_action="pass")
+        audios.append(
+            source.audio.filter("atrim", start=0, duration=1).filter(
+                "adelay", "{}ms".format(i * 100), all=1
+            )
+        )
+    audio = ffmpeg.filter(audios, "amix", inputs=len(audios))
+    return ffmpeg.output(video, audio, "out.mp4")
+
+
+def measure(compile_func: Callable[[Any], list[str]], process: Any) -> str:
+    start_time = time.perf_counter()
+    try:
+        compile_func(process)
+    except RecursionError:
+        return "RecursionError"
+    return "{:.3f}s".format(time.perf_counter() - start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ffmpeg-pythonとgraph.compile_argsのコンパイル時間の比較"
+    )
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        type=int,
+        default=[50, 100, 200, 400, 800],
+        help="重ねる入力の数",
+    )
+    args = parser.parse_args()
+
+    print(
+        "{:>8}{:>16}{:>16}".format("inputs", "ffmpeg-python", "compile_args")
+    )
+    for size in args.sizes:
+        process = create_graph(size)
+        print(
+            "{:>8}{:>16}{:>16}".format(
+                size,
+                measure(ffmpeg.compile, process),
+                measure(compile_args, process),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from typing import Callable
+
+from .media import AUDIO_NAME, IMAGE_NAME, VIDEO_NAME
+
+DEFAULT_STYLE = "txt { font-size: 24px; }"
+DOCUMENT_TEMPLATE = """<vsml>
+  <meta>
+    <style>
+      {style}
+    </style>
+  </meta>
+  <cont resolution="{resolution}" fps="30">
+{content}
+  </cont>
+</vsml>
+"""
+
+
+def get_document(
+    content: str,
+    resolution: str = "640x360",
+    style: str = DEFAULT_STYLE,
+) -> str:
+    return DOCUMENT_TEMPLATE.format(
+        style=style, resolution=resolution, content=content
+    )
+
+
+def deep_nesting(depth: int) -> str:
+    # seqとprlを交互に入れ子にし、各階層に文字を並べる
+    content = '<vid src="{}" style="object-length: 1s;" />'.format(VIDEO_NAME)
+    for level in range(depth):
+        tag = "prl" if level % 2 == 0 else "seq"
+        content = "<{0}><txt>level {1}</txt>{2}</{0}>".format(
+            tag, level, content
+        )
+    return get_document(content)
+
+
+def wide_parallel(width: int, tag: str = "prl") -> str:
+    items = "\n".join(
+        '<img src="{}" style="object-length: 1s; margin-left: {}px;" />'
+        "".format(IMAGE_NAME, index % 64)
+        for index in range(width)
+    )
+    return get_document("<{0}>\n{1}\n</{0}>".format(tag, items))
+
+
+def long_sequence(length: int) -> str:
+    items = "\n".join(
+        '<img src="{}" style="object-length: 2f;" />'.format(IMAGE_NAME)
+        for _ in range(length)
+    )
+    return get_document("<seq>\n{}\n</seq>".format(items))
+
+
+def many_texts(count: int, distinct: int = 100) -> str:
+    # 描画する静止画の数を抑えるため、文字列はdistinct種類を繰り返す
+    items = "\n".join(
+        '<txt style="object-length: 2f;">caption {}</txt>'.format(
+            index % distinct
+        )
+        for index in range(count)
+    )
+    return get_document("<seq>\n{}\n</seq>".format(items))
+
+
+def repeated_sources(count: int) -> str:
+    # 同じ動画と音声を何度も使い、入力の共有と分岐を増やす
+    items = "\n".join(
+        "<prl>"
+        '<vid src="{}" style="object-length: 10f;" />'
+        '<aud src="{}" style="object-length: 10f;" />'
+        "</prl>".format(VIDEO_NAME, AUDIO_NAME)
+        for _ in range(count)
+    )
+    return get_document("<seq>\n{}\n</seq>".format(items))
+
+
+# ケース名ごとの生成関数と、既定の大きさ
+DOCUMENT_CASES: dict[str, tuple[Callable[[int], str], int]] = {
+    "deep_nesting": (deep_nesting, 50),
+    "wide_prl": (lambda width: wide_parallel(width, "prl"), 200),
+    "wide_layer": (lambda width: wide_parallel(width, "layer"), 200),
+    "long_seq": (long_sequence, 500),
+    "many_txt": (many_texts, 1000),
+    "repeated_sources": (repeated_sources, 200),
+}
+
+
+# examplesの各タグの動画に相当する、エンコードの計測用のVSML
+EXAMPLE_STYLE = "txt { font-size: 50px; background-color: red; }"
+EXAMPLE_DOCUMENTS: dict[str, str] = {
+    "txt": '<txt style="object-length: 5s;">1つ目の文章</txt>',
+    "img": '<img style="object-length: 5s;" src="{image}" />',
+    "aud": '<aud src="{audio}" />',
+    "vid": '<vid src="{video}" />',
+    "seq": (
+        "<seq>"
+        '<aud src="{audio}" />'
+        '<txt style="object-length: 2s;">1つ目の文章</txt>'
+        '<img style="object-length: 2s;" src="{image}" />'
+        '<vid src="{video}" />'
+        "</seq>"
+    ),
+    "prl": (
+        "<prl>"
+        '<aud src="{audio}" />'
+        '<txt style="object-length: 5s;">1つ目の文章</txt>'
+        '<img style="object-length: 5s;" src="{image}" />'
+        "</prl>"
+    ),
+    "layer": (
+        "<layer>"
+        '<vid src="{video}" />'
+        '<txt style="object-length: 5s;">1つ目の文章</txt>'
+        '<img style="object-length: 5s;" src="{image}" />'
+        "</layer>"
+    ),
+}
+
+
+def get_example_document(name: str, resolution: str = "1280x720") -> str:
+    content = EXAMPLE_DOCUMENTS[name].format(
+        image=IMAGE_NAME, audio=AUDIO_NAME, video=VIDEO_NAME
+    )
+    return get_document(content, resolution, EXAMPLE_STYLE)
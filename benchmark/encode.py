@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from converter.command import compile_command
+from converter.ffmpeg import get_output_process
+from converter.main import create_root_process, get_whole_time
+from converter.profile import EncodeProfile, get_encode_profile
+from converter.progress import get_progress_args
+from utils import VSMLManager, use_render_context
+from xml_parser import parsing_vsml
+
+from . import SRC_DIR
+from .documents import EXAMPLE_DOCUMENTS, get_example_document
+from .media import generate_media
+
+# ffmpegの最大常駐メモリを確認する間隔(秒)
+MEMORY_POLL_INTERVAL = 0.02
+# 計測結果の表の1行(VSML、プロファイル、fps、標準偏差、倍率、メモリ、サイズ)
+RESULT_FORMAT = "{:<10}{:<10}{:>10.1f}{:>10.1f}{:>9.2f}x{:>14}{:>12}"
+
+
+def get_peak_rss(pid: int) -> Optional[int]:
+    try:
+        with open("/proc/{}/status".format(pid), "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_ffmpeg(args: list[str]) -> tuple[float, int, int]:
+    """
+    ffmpegを実行し、経過時間、エンコードしたフレーム数、最大常駐メモリを返す。
+
+    フレーム数は-progressの出力の最後のframeの値を使う。wait4のru_maxrssは
+    fork元のPythonのメモリを含むため、最大常駐メモリは実行中に
+    /proc/<pid>/statusのVmHWMを読んで求める。
+
+    Parameters
+    ----------
+    args : list[str]
+        ffmpegのコマンド引数
+
+    Returns
+    -------
+    result : tuple[float, int, int]
+        経過時間(秒)、フレーム数、最大常駐メモリ(バイト)
+    """
+
+    frames = 0
+    peak_rss = 0
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        get_progress_args(args),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stdout is not None and process.stderr is not None
+
+    def watch_memory():
+        nonlocal peak_rss
+        while process.poll() is None:
+            rss = get_peak_rss(process.pid)
+            if rss is not None:
+                peak_rss = max(peak_rss, rss)
+            time.sleep(MEMORY_POLL_INTERVAL)
+
+    # 標準エラー出力が詰まらないよう、読み込みもスレッドで行う
+    stderr_lines: list[str] = []
+    threads = [
+        threading.Thread(target=watch_memory),
+        threading.Thread(
+            target=lambda: stderr_lines.extend(process.stderr or [])
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+    for line in process.stdout:
+        key, _, value = line.strip().partition("=")
+        if key == "frame" and value.isdigit():
+            frames = int(value)
+    process.wait()
+    elapsed_time = time.perf_counter() - start_time
+    for thread in threads:
+        thread.join()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, args, stderr="".join(stderr_lines)
+        )
+    return elapsed_time, frames, peak_rss
+
+
+def measure_document(
+    vsml_path: str,
+    out_path: str,
+    encode_profile: Optional[EncodeProfile],
+    repeat: int,
+) -> dict[str, float]:
+    """
+    VSMLを動画に変換し、エンコードの速度とメモリ、出力のサイズを測る。
+
+    Parameters
+    ----------
+    vsml_path : str
+        計測するVSMLのパス
+    out_path : str
+        出力先のパス
+    encode_profile : Optional[EncodeProfile]
+        エンコードのプロファイル
+    repeat : int
+        エンコードを測る回数。速度は全ての回の平均と標準偏差を求める
+
+    Returns
+    -------
+    result : dict[str, float]
+        エンコードのfpsの平均と標準偏差、実時間に対する倍率の平均、
+        ffmpegの最大常駐メモリ(バイト)、出力のサイズ(バイト)
+    """
+
+    vsml_data = parsing_vsml(vsml_path, True)
+    duration = get_whole_time(vsml_data)
+    with use_render_context(vsml_data.context):
+        process = create_root_process(vsml_data)
+        process = get_output_process(
+            process.video, process.audio, out_path, encode_profile
+        )
+    # 静止画の描画などはフロントエンドの計測に含め、ここではffmpegだけを測る
+    measurements = []
+    with compile_command(process, overwrite=True) as args:
+        args = args[:1] + ["-v", "error"] + args[1:]
+        for _ in range(repeat):
+            measurements.append(run_ffmpeg(args))
+    frames = measurements[0][1]
+    if duration is None:
+        with use_render_context(vsml_data.context):
+            duration = frames / VSMLManager.get_root_fps()
+    # 音声だけの動画ではフレーム数が0になる
+    fps_values = [frames / measurement[0] for measurement in measurements]
+    return {
+        "fps": statistics.mean(fps_values),
+        "fps_stdev": (
+            statistics.stdev(fps_values) if len(fps_values) > 1 else 0.0
+        ),
+        "realtime_factor": statistics.mean(
+            duration / measurement[0] for measurement in measurements
+        ),
+        "peak_rss": max(measurement[2] for measurement in measurements),
+        "output_size": os.path.getsize(out_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="生成した素材でexamples相当のVSMLをエンコードし、速度を測る"
+    )
+    parser.add_argument(
+        "documents",
+        nargs="*",
+        help="計測するVSML({})。既定は全て".format(", ".join(EXAMPLE_DOCUMENTS)),
+    )
+    parser.add_argument("--resolution", default="1280x720", help="出力する動画の解像度")
+    parser.add_argument(
+        "--duration", type=float, default=5, help="生成する素材の長さ(秒)"
+    )
+    parser.add_argument(
+        "--encode-profile",
+        action="append",
+        help=(
+            "エンコードのプロファイル(draft, balanced, final, default)。"
+            "複数指定すると並べて比べる。defaultはffmpegの既定値"
+        ),
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="エンコードを測る回数")
+    parser.add_argument("--output", help="計測結果を書き出すJSONのパス")
+    args = parser.parse_args()
+
+    documents = args.documents or list(EXAMPLE_DOCUMENTS)
+    unknown_documents = set(documents) - set(EXAMPLE_DOCUMENTS)
+    if len(unknown_documents) > 0:
+        parser.error(
+            "unknown documents: {}".format(", ".join(unknown_documents))
+        )
+    profile_names = args.encode_profile or ["default"]
+    try:
+        encode_profiles = {
+            profile_name: get_encode_profile(
+                None if profile_name == "default" else profile_name
+            )
+            for profile_name in profile_names
+        }
+    except ValueError as e:
+        parser.error(str(e))
+    # オフラインのXSDはリポジトリのルートからの相対パスで読み込む
+    os.chdir(os.path.dirname(SRC_DIR))
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.environ["VSML_CACHE_DIR"] = os.path.join(work_dir, "cache")
+        generate_media(work_dir, args.resolution, args.duration)
+        print(
+            "{:<10}{:<10}{:>10}{:>10}{:>10}{:>14}{:>12}".format(
+                "document",
+                "profile",
+                "fps",
+                "stdev",
+                "realtime",
+                "peak_rss(B)",
+                "size(B)",
+            )
+        )
+        for document in documents:
+            vsml_path = os.path.join(work_dir, "{}.vsml".format(document))
+            with open(vsml_path, "w") as f:
+                f.write(get_example_document(document, args.resolution))
+            results[document] = {}
+            for profile_name, encode_profile in encode_profiles.items():
+                values = measure_document(
+                    vsml_path,
+                    os.path.join(work_dir, "{}.mp4".format(document)),
+                    encode_profile,
+                    args.repeat,
+                )
+                results[document][profile_name] = values
+                print(
+                    RESULT_FORMAT.format(
+                        document,
+                        profile_name,
+                        values["fps"],
+                        values["fps_stdev"],
+                        values["realtime_factor"],
+                        values["peak_rss"],
+                        values["output_size"],
+                    )
+                )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
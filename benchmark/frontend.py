@@ -0,0 +1,239 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from lxml import etree
+
+from converter.ffmpeg import get_output_process
+from converter.graph import compile_args
+from converter.main import create_root_process
+from style.main import probe_cache
+from style.utils import calculate_text_size
+from utils import VSMLManager
+from vsml import VSML
+from xml_parser import get_parser_with_xsd, get_vsml_text
+
+from . import SRC_DIR
+from .documents import DOCUMENT_CASES
+from .media import generate_media
+
+STAGES = ["parsing_vsml", "element_to_content", "create_process", "compile"]
+BASELINE_PATH = os.path.join(
+    os.path.dirname(__file__), "baselines", "frontend.json"
+)
+# 計測の揺れで失敗しないよう、これより短い時間と小さいメモリの差は比較しない
+MIN_TIME_DIFFERENCE = 0.01
+MIN_MEMORY_DIFFERENCE = 1024 * 1024
+
+
+def run_stages(
+    vsml_path: str, measure: Callable[[str, Callable[[], Any]], Any]
+):
+    # プロセス内のキャッシュを空にし、毎回同じ条件で測る
+    probe_cache.clear()
+    calculate_text_size.cache_clear()
+
+    parser = get_parser_with_xsd(True)
+    vsml_element = measure(
+        "parsing_vsml",
+        lambda: etree.fromstring(get_vsml_text(vsml_path), parser),
+    )
+    VSMLManager.set_root_path(os.path.dirname(vsml_path) + "/")
+    vsml_data = measure("element_to_content", lambda: VSML(vsml_element, True))
+    process = measure("create_process", lambda: create_root_process(vsml_data))
+    measure(
+        "compile",
+        lambda: compile_args(
+            get_output_process(process.video, process.audio, "out.mp4")
+        ),
+    )
+
+
+def measure_case(vsml_path: str, repeat: int) -> dict[str, dict[str, float]]:
+    """
+    フロントエンドの段階ごとに、処理時間とメモリの最大使用量を測る。
+
+    処理時間はrepeat回のうち最短のものを使う。1回目は静止画を描画して
+    キャッシュに保存するため、以降の回で描画を除いた時間を測る。
+
+    Parameters
+    ----------
+    vsml_path : str
+        計測するVSMLのパス
+    repeat : int
+        処理時間を測る回数
+
+    Returns
+    -------
+    result : dict[str, dict[str, float]]
+        段階ごとの処理時間(秒)とメモリの最大使用量(バイト)
+    """
+
+    times: dict[str, list[float]] = {stage: [] for stage in STAGES}
+
+    def measure_time(stage: str, func: Callable[[], Any]) -> Any:
+        # timeitと同様に、ガベージコレクションによる揺れを除く
+        gc.collect()
+        gc.disable()
+        try:
+            start_time = time.perf_counter()
+            value = func()
+            times[stage].append(time.perf_counter() - start_time)
+        finally:
+            gc.enable()
+        return value
+
+    for _ in range(repeat):
+        run_stages(vsml_path, measure_time)
+
+    # tracemallocは処理を遅くするため、時間とは別に1回だけ測る
+    peak_memories: dict[str, int] = {}
+
+    def measure_memory(stage: str, func: Callable[[], Any]) -> Any:
+        tracemalloc.start()
+        try:
+            return func()
+        finally:
+            peak_memories[stage] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    run_stages(vsml_path, measure_memory)
+
+    return {
+        stage: {"time": min(times[stage]), "peak_memory": peak_memories[stage]}
+        for stage in STAGES
+    }
+
+
+def get_regressions(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]],
+    threshold: float,
+) -> list[str]:
+    regressions = []
+    for case, stages in results.items():
+        for stage, values in stages.items():
+            base_values = baseline.get(case, {}).get(stage)
+            if base_values is None:
+                continue
+            for key, min_difference in [
+                ("time", MIN_TIME_DIFFERENCE),
+                ("peak_memory", MIN_MEMORY_DIFFERENCE),
+            ]:
+                value = values[key]
+                base_value = base_values[key]
+                if (
+                    value > base_value * (1 + threshold)
+                    and value - base_value > min_difference
+                ):
+                    regressions.append(
+                        "{}/{} {}: {:.4g} -> {:.4g} (+{:.0%})".format(
+                            case,
+                            stage,
+                            key,
+                            base_value,
+                            value,
+                            value / base_value - 1,
+                        )
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="合成したVSMLでフロントエンドの段階ごとの時間とメモリを測る"
+    )
+    parser.add_argument(
+        "cases",
+        nargs="*",
+        help="計測するケース({})。既定は全て".format(", ".join(DOCUMENT_CASES)),
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="各ケースの既定の大きさに掛ける倍率",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="処理時間を測る回数")
+    parser.add_argument(
+        "--baseline",
+        default=BASELINE_PATH,
+        help="比較する基準値のJSONのパス",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="計測結果を基準値として保存する",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="基準値からの悪化を許容する割合",
+    )
+    parser.add_argument("--output", help="計測結果を書き出すJSONのパス")
+    args = parser.parse_args()
+
+    cases = args.cases or list(DOCUMENT_CASES)
+    unknown_cases = set(cases) - set(DOCUMENT_CASES)
+    if len(unknown_cases) > 0:
+        parser.error("unknown cases: {}".format(", ".join(unknown_cases)))
+    # オフラインのXSDはリポジトリのルートからの相対パスで読み込む
+    os.chdir(os.path.dirname(SRC_DIR))
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 静止画のキャッシュも使い捨てのディレクトリに作る
+        os.environ["VSML_CACHE_DIR"] = os.path.join(work_dir, "cache")
+        generate_media(work_dir)
+        print(
+            "{:<20}{:<20}{:>12}{:>16}".format(
+                "case", "stage", "time(s)", "peak_memory(B)"
+            )
+        )
+        for case in cases:
+            generator, size = DOCUMENT_CASES[case]
+            vsml_path = os.path.join(work_dir, "{}.vsml".format(case))
+            with open(vsml_path, "w") as f:
+                f.write(generator(max(1, round(size * args.scale))))
+            results[case] = measure_case(vsml_path, args.repeat)
+            for stage, values in results[case].items():
+                print(
+                    "{:<20}{:<20}{:>12.4f}{:>16}".format(
+                        case, stage, values["time"], values["peak_memory"]
+                    )
+                )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        baseline |= results
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        return
+
+    if not os.path.exists(args.baseline):
+        return
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    regressions = get_regressions(results, baseline, args.threshold)
+    if len(regressions) > 0:
+        print("\n".join(["regressions:"] + regressions), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
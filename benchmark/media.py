@@ -0,0 +1,74 @@
+import os
+import subprocess
+
+from PIL import Image, ImageDraw
+
+VIDEO_NAME = "video.mp4"
+AUDIO_NAME = "audio.wav"
+IMAGE_NAME = "image.png"
+
+
+def generate_media(
+    media_dir: str,
+    resolution: str = "640x360",
+    duration: float = 2,
+) -> None:
+    """
+    ベンチマークで使う動画、音声、画像をネットワークを使わずに生成する。
+
+    Parameters
+    ----------
+    media_dir : str
+        生成先のディレクトリ。既にある素材は作り直さない
+    resolution : str
+        動画の解像度
+    duration : float
+        動画と音声の長さ(秒)
+    """
+
+    os.makedirs(media_dir, exist_ok=True)
+    video_path = os.path.join(media_dir, VIDEO_NAME)
+    if not os.path.exists(video_path):
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-v",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                "testsrc2=s={}:r=30:d={}".format(resolution, duration),
+                "-f",
+                "lavfi",
+                "-i",
+                "sine=f=440:d={}".format(duration),
+                "-pix_fmt",
+                "yuv420p",
+                "-shortest",
+                video_path,
+            ],
+            check=True,
+        )
+    audio_path = os.path.join(media_dir, AUDIO_NAME)
+    if not os.path.exists(audio_path):
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-v",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                "sine=f=880:d={}".format(duration),
+                "-ac",
+                "2",
+                audio_path,
+            ],
+            check=True,
+        )
+    image_path = os.path.join(media_dir, IMAGE_NAME)
+    if not os.path.exists(image_path):
+        image = Image.new("RGBA", (160, 120), (40, 80, 160, 255))
+        draw = ImageDraw.Draw(image)
+        draw.ellipse((20, 10, 140, 110), fill=(240, 200, 40, 255))
+        image.save(image_path)
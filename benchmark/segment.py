@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from converter.main import convert_video
+from xml_parser import parsing_vsml
+
+from . import SRC_DIR
+from .documents import EXAMPLE_STYLE, get_document
+from .media import IMAGE_NAME, VIDEO_NAME, generate_media
+
+# 区間の境界になる、ルートのseqの子要素
+SEGMENT_BLOCK = (
+    "<prl>"
+    '<vid src="{video}" style="object-length: 2s;" />'
+    '<img src="{image}" style="object-length: 2s;" />'
+    '<txt style="object-length: 2s;">block {index}</txt>'
+    "</prl>"
+)
+
+
+def get_segment_document(count: int, resolution: str) -> str:
+    content = "\n".join(
+        SEGMENT_BLOCK.format(video=VIDEO_NAME, image=IMAGE_NAME, index=index)
+        for index in range(count)
+    )
+    return get_document(content, resolution, EXAMPLE_STYLE)
+
+
+@contextmanager
+def suppress_stderr() -> Iterator[None]:
+    # ffmpegの出力で計測結果の表が読みにくくならないよう、標準エラー出力を捨てる
+    stderr_fd = os.dup(2)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 2)
+        try:
+            yield
+        finally:
+            os.dup2(stderr_fd, 2)
+            os.close(stderr_fd)
+
+
+def measure_jobs(
+    vsml_path: str, out_path: str, jobs: int, repeat: int
+) -> list[float]:
+    """
+    VSMLを区間に分割して変換し、変換全体の経過時間を測る。
+
+    1回目は静止画の描画をキャッシュに載せるためのもので、計測に含めない。
+
+    Parameters
+    ----------
+    vsml_path : str
+        計測するVSMLのパス
+    out_path : str
+        出力先のパス
+    jobs : int
+        並列に描画する区間の数
+    repeat : int
+        計測する回数
+
+    Returns
+    -------
+    elapsed_times : list[float]
+        回ごとの経過時間(秒)
+    """
+
+    vsml_data = parsing_vsml(vsml_path, True)
+    elapsed_times = []
+    with suppress_stderr():
+        for index in range(repeat + 1):
+            start_time = time.perf_counter()
+            convert_video(vsml_data, out_path, False, True, jobs)
+            if index > 0:
+                elapsed_times.append(time.perf_counter() - start_time)
+    return elapsed_times
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="区間ごとの並列描画(--jobs)による変換全体の速度向上を測る"
+    )
+    parser.add_argument(
+        "jobs",
+        nargs="*",
+        type=int,
+        default=[1, os.cpu_count() or 1],
+        help="比べる並列数。最初の値を基準にする",
+    )
+    parser.add_argument("--count", type=int, default=8, help="ルートのseqの子要素の数")
+    parser.add_argument("--resolution", default="1280x720", help="出力する動画の解像度")
+    parser.add_argument("--repeat", type=int, default=3, help="並列数ごとに測る回数")
+    parser.add_argument("--output", help="計測結果を書き出すJSONのパス")
+    args = parser.parse_args()
+
+    # オフラインのXSDはリポジトリのルートからの相対パスで読み込む
+    os.chdir(os.path.dirname(SRC_DIR))
+    results: dict[int, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.environ["VSML_CACHE_DIR"] = os.path.join(work_dir, "cache")
+        generate_media(work_dir, args.resolution, 2)
+        vsml_path = os.path.join(work_dir, "segment.vsml")
+        with open(vsml_path, "w") as f:
+            f.write(get_segment_document(args.count, args.resolution))
+        print("cpu_count: {}".format(os.cpu_count()))
+        print(
+            "{:>6}{:>12}{:>12}{:>10}".format(
+                "jobs", "mean(s)", "stdev(s)", "speedup"
+            )
+        )
+        for jobs in args.jobs:
+            elapsed_times = measure_jobs(
+                vsml_path,
+                os.path.join(work_dir, "segment.mp4"),
+                jobs,
+                args.repeat,
+            )
+            mean = statistics.mean(elapsed_times)
+            results[jobs] = {
+                "mean": mean,
+                "stdev": (
+                    statistics.stdev(elapsed_times)
+                    if len(elapsed_times) > 1
+                    else 0.0
+                ),
+                "speedup": results[args.jobs[0]]["mean"] / mean
+                if len(results) > 0
+                else 1.0,
+            }
+            print(
+                "{:>6}{:>12.2f}{:>12.2f}{:>9.2f}x".format(
+                    jobs,
+                    results[jobs]["mean"],
+                    results[jobs]["stdev"],
+                    results[jobs]["speedup"],
+                )
+            )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
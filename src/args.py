@@ -1,4 +1,5 @@
 import json
+import os
 from argparse import Action, ArgumentParser, Namespace
 from collections.abc import Sequence
 
@@ -37,17 +38,55 @@ def init_parser():
         description="command line tool to struct video from xml"
     )
     parser.add_argument(
-        "filename",
+        "filenames",
         metavar="filename",
         type=str,
-        help="file name to convert xml",
+        nargs="*",
+        help="file name to convert xml (several files are rendered in batch)",
     )
     parser.add_argument(
         "-o",
         "--output",
         metavar="output_path",
         type=str,
-        help="path to output video",
+        help="path to output video (output directory in batch)",
+    )
+    parser.add_argument(
+        "--output-mode",
+        choices=["file", "pipe", "fmp4", "hls"],
+        default="file",
+        help="write a file, stream to stdout, fragmented MP4 or HLS segments",
+    )
+    parser.add_argument(
+        "--manifest",
+        metavar="manifest_path",
+        type=str,
+        help="path to JSON manifest listing files to render in batch",
+    )
+    parser.add_argument(
+        "--workers",
+        metavar="workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of ffmpeg processes run at once in batch",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="run a local render server accepting jobs over HTTP",
+    )
+    parser.add_argument(
+        "--port",
+        metavar="port",
+        type=int,
+        default=8765,
+        help="port of the render server",
+    )
+    parser.add_argument(
+        "--queue",
+        metavar="queue_path",
+        type=str,
+        help="path to the job queue database of the render server",
     )
     parser.add_argument(
         "-f",
@@ -71,6 +110,74 @@ def init_parser():
         action="store_true",
         help="offline mode",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="jobs",
+        type=int,
+        default=1,
+        help="number of segments rendered in parallel",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="reuse rendered elements from cache",
+    )
+    parser.add_argument(
+        "--encode-profile",
+        metavar="encode_profile",
+        type=str,
+        help="encode profile name (draft, balanced, final)",
+    )
+    parser.add_argument(
+        "--draft",
+        action="store_true",
+        help="render at reduced resolution and fps for review",
+    )
+    parser.add_argument(
+        "--draft-scale",
+        metavar="draft_scale",
+        type=float,
+        default=0.5,
+        help="scale of resolution in draft mode (default: 0.5)",
+    )
+    parser.add_argument(
+        "--draft-fps",
+        metavar="draft_fps",
+        type=float,
+        default=15,
+        help="upper limit of fps in draft mode (default: 15)",
+    )
+    parser.add_argument(
+        "--proxy",
+        action="store_true",
+        help="use low resolution proxies of heavy videos in draft and preview",
+    )
+    parser.add_argument(
+        "--config",
+        metavar="config_path",
+        type=str,
+        help="path to config file",
+    )
+    parser.add_argument(
+        "--progress-json",
+        metavar="progress_path",
+        type=str,
+        help="path to write progress as JSON lines (- for stdout)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="report_path",
+        type=str,
+        nargs="?",
+        const="profile.json",
+        help="measure each stage and write a report (default: profile.json)",
+    )
+    parser.add_argument(
+        "--profile-cprofile",
+        action="store_true",
+        help="include cProfile statistics in the profile report",
+    )
     parser.add_argument(
         "--font-family-list",
         action=FontFamilyAction,
@@ -81,4 +188,30 @@ def init_parser():
 
 def get_args() -> Namespace:
     parser = init_parser()
-    return parser.parse_args()
+    args = parser.parse_args()
+    if len(args.filenames) == 0 and args.manifest is None and not args.serve:
+        parser.error("the following arguments are required: filename")
+    if args.output_mode == "pipe" and (
+        args.progress_json == "-"
+        or len(args.filenames) > 1
+        or args.manifest is not None
+        or args.serve
+    ):
+        parser.error("--output-mode pipe requires a single output on stdout")
+    if len(args.filenames) > 1 or args.manifest is not None or args.serve:
+        # 並列の区間描画や進捗の出力は、1つの出力だけを対象にする
+        unsupported_options = [
+            option
+            for option, is_set in [
+                ("--jobs", args.jobs != 1),
+                ("--output-mode", args.output_mode != "file"),
+                ("--progress-json", args.progress_json is not None),
+            ]
+            if is_set
+        ]
+        if len(unsupported_options) > 0:
+            message = "{} only applies to a single file, not batch or --serve"
+            parser.error(message.format(", ".join(unsupported_options)))
+    if args.draft and not (0 < args.draft_scale <= 1 and args.draft_fps > 0):
+        parser.error("--draft-scale must be in (0, 1] and --draft-fps above 0")
+    return args
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import sys
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from converter import convert_image_from_frame_async, convert_video_async
+from converter.profile import EncodeProfile
+from utils import DraftSetting
+from xml_parser import parsing_vsml
+
+
+@dataclass
+class BatchJob:
+    filename: str
+    output: str
+    frame: Optional[int] = None
+
+
+def get_default_output(
+    filename: str, output_dir: Optional[str], frame: Optional[int]
+) -> str:
+    name = os.path.splitext(os.path.basename(filename))[0]
+    extension = ".png" if frame is not None else ".mp4"
+    return os.path.join(output_dir or ".", name + extension)
+
+
+def load_manifest(
+    manifest_path: str, frame: Optional[int] = None
+) -> list[BatchJob]:
+    """
+    変換するVSMLの一覧をマニフェスト(JSON)から読み込む。
+
+    Parameters
+    ----------
+    manifest_path : str
+        マニフェストのパス。"filename"と、省略可能な"output"と"frame"を持つ
+        オブジェクトの配列で、相対パスはマニフェストの場所を基準とする
+    frame : Optional[int]
+        "frame"を省略した要素に使うフレーム
+
+    Returns
+    -------
+    jobs : list[BatchJob]
+        変換する内容の一覧
+    """
+
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(manifest_path)
+    jobs = []
+    for item in manifest:
+        job_frame = item.get("frame", frame)
+        filename = os.path.join(base_dir, item["filename"])
+        output = (
+            os.path.join(base_dir, item["output"])
+            if "output" in item
+            else get_default_output(filename, base_dir, job_frame)
+        )
+        jobs.append(BatchJob(filename, output, job_frame))
+    return jobs
+
+
+async def render_job(
+    job: BatchJob,
+    is_offline: bool,
+    overwrite: bool,
+    use_cache: bool,
+    encode_profile: Optional[EncodeProfile],
+    limiter: asyncio.Semaphore,
+    draft: Optional[DraftSetting] = None,
+):
+    vsml_data = parsing_vsml(job.filename, is_offline, draft)
+    # -oやマニフェストで指定した出力先のディレクトリは、無ければ作る
+    os.makedirs(os.path.dirname(job.output) or ".", exist_ok=True)
+    if job.frame is None:
+        await convert_video_async(
+            vsml_data,
+            job.output,
+            overwrite,
+            use_cache,
+            encode_profile,
+            limiter=limiter,
+        )
+    else:
+        await convert_image_from_frame_async(
+            vsml_data, job.frame, job.output, limiter=limiter
+        )
+
+
+async def render_batch(
+    jobs: list[BatchJob],
+    is_offline: bool,
+    overwrite: bool,
+    workers: int,
+    use_cache: bool = False,
+    encode_profile: Optional[EncodeProfile] = None,
+    draft: Optional[DraftSetting] = None,
+) -> list[Optional[Exception]]:
+    """
+    複数のVSMLを1つのプロセスで変換する。
+
+    スキーマ、フォント、素材の解析結果、文字の大きさはプロセス内で共有し、
+    ffmpegはworkersの数まで並行して実行する。
+
+    Parameters
+    ----------
+    jobs : list[BatchJob]
+        変換する内容の一覧
+    is_offline : bool
+        オフラインモード
+    overwrite : bool
+        出力先の上書きを許可するか
+    workers : int
+        同時に実行するffmpegの数
+    use_cache : bool
+        要素ごとの描画結果のキャッシュを使うか
+    encode_profile : Optional[EncodeProfile]
+        全てのジョブで共通して使うエンコードのプロファイル
+    draft : Optional[DraftSetting]
+        全てのジョブで共通して使う縮小描画の設定
+
+    Returns
+    -------
+    errors : list[Optional[Exception]]
+        ジョブごとの例外。成功した場合はNone
+    """
+
+    limiter = asyncio.Semaphore(workers)
+    errors: list[Optional[Exception]] = [None] * len(jobs)
+    job_iterator: Iterator[tuple[int, BatchJob]] = iter(enumerate(jobs))
+    finished_count = 0
+
+    async def worker():
+        nonlocal finished_count
+        # 組み立て済みのグラフがworkersの数を超えて溜まらないよう、順に取り出す
+        for index, job in job_iterator:
+            try:
+                await render_job(
+                    job,
+                    is_offline,
+                    overwrite,
+                    use_cache,
+                    encode_profile,
+                    limiter,
+                    draft,
+                )
+            except Exception as e:
+                errors[index] = e
+            finished_count += 1
+            print(
+                "[{}/{}] {} {} -> {}".format(
+                    finished_count,
+                    len(jobs),
+                    "failed" if errors[index] is not None else "done",
+                    job.filename,
+                    job.output,
+                ),
+                file=sys.stderr,
+            )
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return errors
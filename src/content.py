@@ -1,4 +1,5 @@
 import re
+from fractions import Fraction
 
 from lxml.etree import _Element, tostring
 
@@ -53,7 +54,7 @@ class VSMLContent:
     style: Style
     exist_video: bool
     exist_audio: bool
-    _second: float
+    _second: Fraction
 
     def __init__(
         self,
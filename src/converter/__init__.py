@@ -1,2 +1,7 @@
+from .asynchronous import convert_image_from_frame_async, convert_video_async
 from .main import convert_video
+from .output import OutputMode
 from .preview import *
+from .profile import get_encode_profile
+from .progress import Progress, ProgressCallback, get_json_lines_callback
+from .proxy import ProxyManager, use_proxy_manager
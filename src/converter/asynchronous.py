@@ -0,0 +1,269 @@
+import asyncio
+import contextlib
+import sys
+from typing import Any, Optional
+
+import ffmpeg
+
+from utils import use_render_context
+from vsml import VSML
+
+from .command import compile_command
+from .ffmpeg import get_output_process
+from .main import create_root_process, get_render_vsml, get_whole_time
+from .output import OutputMode, get_output_target
+from .preview.main import create_image_process
+from .profile import EncodeProfile
+from .progress import (
+    PROGRESS_LINE_PATTERN,
+    ProgressCallback,
+    ProgressReader,
+    get_progress_args,
+)
+
+# 止めたffmpegが終了するまで待つ時間(秒)。過ぎた場合は強制終了する
+TERMINATE_TIMEOUT = 5.0
+
+
+async def stop_process(popen: asyncio.subprocess.Process):
+    if popen.returncode is not None:
+        return
+    popen.terminate()
+    try:
+        await asyncio.wait_for(popen.wait(), TERMINATE_TIMEOUT)
+    except asyncio.TimeoutError:
+        popen.kill()
+        await popen.wait()
+
+
+async def run_command_async(
+    args: list[str],
+    quiet: bool = False,
+    progress_callback: Optional[ProgressCallback] = None,
+    total_time: Optional[float] = None,
+    stdout_output: bool = False,
+) -> bytes:
+    """
+    ffmpegを非同期のサブプロセスとして実行する。
+
+    キャンセルされた場合は、ffmpegを止めて終了を待ってから例外を伝える。
+
+    Parameters
+    ----------
+    args : list[str]
+        ffmpegのコマンド引数
+    quiet : bool
+        ffmpegの出力を表示せず、標準エラー出力を受け取るか
+    progress_callback : Optional[ProgressCallback]
+        進捗を受け取る関数
+    total_time : Optional[float]
+        出力する動画全体の長さ(秒)
+    stdout_output : bool
+        ffmpegが動画を標準出力に書き出すか。進捗は標準エラー出力から受け取る
+
+    Returns
+    -------
+    stderr : bytes
+        quietの場合はffmpegの標準エラー出力、それ以外は空
+    """
+
+    progress_on_stderr = progress_callback is not None and stdout_output
+    if progress_callback is not None:
+        args = get_progress_args(
+            args, "pipe:2" if progress_on_stderr else "pipe:1"
+        )
+    if stdout_output:
+        stdout = None
+    elif progress_callback is not None:
+        stdout = asyncio.subprocess.PIPE
+    else:
+        stdout = asyncio.subprocess.DEVNULL if quiet else None
+    popen = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=stdout,
+        stderr=(
+            asyncio.subprocess.PIPE if quiet or progress_on_stderr else None
+        ),
+    )
+    stderr_task = (
+        asyncio.create_task(popen.stderr.read())
+        if popen.stderr is not None and not progress_on_stderr
+        else None
+    )
+    stderr_lines = []
+    try:
+        if progress_callback is not None:
+            reader = ProgressReader(total_time, progress_callback)
+            progress_stream = (
+                popen.stderr if progress_on_stderr else popen.stdout
+            )
+            async for line in progress_stream:
+                text = line.decode(errors="replace")
+                if not progress_on_stderr or PROGRESS_LINE_PATTERN.match(text):
+                    reader.feed(text)
+                elif quiet:
+                    stderr_lines.append(line)
+                else:
+                    sys.stderr.write(text)
+        await popen.wait()
+        stderr = (
+            await stderr_task
+            if stderr_task is not None
+            else b"".join(stderr_lines)
+        )
+    finally:
+        # キャンセルやタイムアウトの場合も、ffmpegを残さない
+        await stop_process(popen)
+        if stderr_task is not None and not stderr_task.done():
+            stderr_task.cancel()
+    if popen.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, stderr)
+    return stderr
+
+
+async def run_process_async(
+    process: Any,
+    overwrite: bool = False,
+    quiet: bool = False,
+    limiter: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+    total_time: Optional[float] = None,
+    stdout_output: bool = False,
+) -> bytes:
+    with compile_command(process, overwrite) as args:
+        # 同時に実行するffmpegの数を、呼び出し元と共有する上限で抑える
+        async with limiter or contextlib.nullcontext():
+            # 待ち時間は含めず、ffmpegの実行時間のみを制限する
+            return await asyncio.wait_for(
+                run_command_async(
+                    args, quiet, progress_callback, total_time, stdout_output
+                ),
+                timeout,
+            )
+
+
+def create_output_process(
+    vsml_data: VSML,
+    out_filename: Optional[str],
+    use_cache: bool,
+    encode_profile: Optional[EncodeProfile],
+    output_mode: OutputMode,
+) -> Any:
+    with use_render_context(vsml_data.context):
+        process = create_root_process(vsml_data, use_cache=use_cache)
+        return get_output_process(
+            process.video,
+            process.audio,
+            out_filename,
+            encode_profile,
+            output_mode,
+        )
+
+
+async def convert_video_async(
+    vsml_data: VSML,
+    out_filename: Optional[str] = None,
+    overwrite: bool = False,
+    use_cache: bool = False,
+    encode_profile: Optional[EncodeProfile] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+    limiter: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+    quiet: bool = True,
+    output_mode: OutputMode = OutputMode.FILE,
+):
+    """
+    convert_videoの非同期版。イベントループから複数の動画を並行して出力する。
+
+    静止画の描画を含むグラフの組み立てはスレッドで行い、イベントループを
+    止めない。スレッドには呼び出し元のコンテキストを複製して渡す。
+    ルートの情報は解析したVSMLが持つため、解析から呼び出しまでの間に
+    他のタスクに切り替わってもよい。
+
+    Parameters
+    ----------
+    vsml_data : VSML
+        解析したVSML
+    out_filename : Optional[str]
+        出力先のパス
+    overwrite : bool
+        出力先の上書きを許可するか
+    use_cache : bool
+        要素ごとの描画結果のキャッシュを使うか
+    encode_profile : Optional[EncodeProfile]
+        エンコードのプロファイル
+    progress_callback : Optional[ProgressCallback]
+        進捗を受け取る関数
+    limiter : Optional[asyncio.Semaphore]
+        同時に実行するffmpegの数を制限するセマフォ
+    timeout : Optional[float]
+        ffmpegの実行時間の上限(秒)。過ぎた場合はasyncio.TimeoutError
+    quiet : bool
+        ffmpegの出力を表示しないか。失敗した場合は例外に含める
+    output_mode : OutputMode
+        出力の形式
+    """
+
+    out_filename = get_output_target(output_mode, out_filename)
+    vsml_data = get_render_vsml(vsml_data, encode_profile)
+    # to_threadはコンテキストを複製するため、計測もスレッドに引き継ぐ
+    output_process = await asyncio.to_thread(
+        create_output_process,
+        vsml_data,
+        out_filename,
+        use_cache,
+        encode_profile,
+        output_mode,
+    )
+    await run_process_async(
+        output_process,
+        overwrite,
+        quiet,
+        limiter,
+        timeout,
+        progress_callback,
+        get_whole_time(vsml_data),
+        output_mode == OutputMode.PIPE,
+    )
+
+
+async def convert_image_from_frame_async(
+    vsml_data: VSML,
+    frame: int,
+    output_path: Optional[str] = None,
+    limiter: Optional[asyncio.Semaphore] = None,
+    timeout: Optional[float] = None,
+    quiet: bool = True,
+):
+    """
+    convert_image_from_frameの非同期版。
+
+    Parameters
+    ----------
+    vsml_data : VSML
+        解析したVSML
+    frame : int
+        出力するフレームの番号
+    output_path : Optional[str]
+        出力先のパス
+    limiter : Optional[asyncio.Semaphore]
+        同時に実行するffmpegの数を制限するセマフォ
+    timeout : Optional[float]
+        ffmpegの実行時間の上限(秒)。過ぎた場合はasyncio.TimeoutError
+    quiet : bool
+        ffmpegの出力を表示しないか。失敗した場合は例外に含める
+    """
+
+    output_path = "preview.png" if output_path is None else output_path
+    image_process = await asyncio.to_thread(
+        create_image_process, vsml_data, frame, output_path
+    )
+    await run_process_async(
+        image_process,
+        True,
+        quiet,
+        limiter,
+        timeout,
+    )
@@ -0,0 +1,35 @@
+import hashlib
+import os
+from typing import Any
+
+CACHE_DIR_ENV = "VSML_CACHE_DIR"
+
+
+def get_cache_dir() -> str:
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if cache_dir is None:
+        cache_home = os.environ.get(
+            "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+        )
+        cache_dir = os.path.join(cache_home, "vsml")
+    return cache_dir
+
+
+def get_cache_path(category: str, key: str, extension: str) -> str:
+    category_dir = os.path.join(get_cache_dir(), category)
+    os.makedirs(category_dir, exist_ok=True)
+    return os.path.join(category_dir, "{}.{}".format(key, extension))
+
+
+def get_cache_key(*values: Any) -> str:
+    return hashlib.sha256(repr(values).encode()).hexdigest()
+
+
+def get_file_fingerprint(src_path: str) -> str:
+    # URLのソースは中身を確認できないため、パスのみで識別する
+    if src_path[:4] == "http":
+        return src_path
+    stat = os.stat(src_path)
+    return "{}:{}:{}".format(
+        os.path.abspath(src_path), stat.st_size, stat.st_mtime_ns
+    )
@@ -0,0 +1,111 @@
+import os
+import tempfile
+from fractions import Fraction
+from typing import Any, Optional
+
+import ffmpeg
+
+from content import SourceContent, VSMLContent, WrapContent
+from profiler import profile_stage
+from utils import SourceType, VSMLManager
+
+from .cache import get_cache_key, get_cache_path, get_file_fingerprint
+from .command import run_process
+from .ffmpeg import get_source_process
+from .schemas import Process
+
+
+def get_content_fingerprint(vsml_content: VSMLContent) -> Any:
+    if isinstance(vsml_content, SourceContent):
+        source = (
+            vsml_content.src_path
+            if vsml_content.type == SourceType.TEXT
+            else get_file_fingerprint(vsml_content.src_path)
+        )
+        return (
+            vsml_content.type.name,
+            source,
+            repr(vsml_content.style),
+        )
+    elif isinstance(vsml_content, WrapContent):
+        return (
+            vsml_content.tag_name,
+            repr(vsml_content.style),
+            [get_content_fingerprint(item) for item in vsml_content.items],
+        )
+    else:
+        raise Exception()
+
+
+def get_clip_path(vsml_content: WrapContent) -> Optional[str]:
+    """
+    子要素を持つ要素を描画したクリップのキャッシュ先を求める。
+
+    Parameters
+    ----------
+    vsml_content : WrapContent
+        子要素を持つVSMLの要素
+
+    Returns
+    -------
+    clip_path : Optional[str]
+        スタイル、構造、ソースから決まるクリップのパス。長さが決まらない要素はNone
+    """
+
+    if not vsml_content.style.object_length.has_specific_value():
+        return None
+    # フレーム単位の長さはルートのfpsで、縮小描画の大きさは倍率で変わるため、
+    # 書き出しの解像度とは別にキーに含める
+    key = get_cache_key(
+        VSMLManager.get_root_resolution().get_str(),
+        VSMLManager.get_root_frame_rate(),
+        VSMLManager.get_draft_scale(),
+        get_content_fingerprint(vsml_content),
+    )
+    return get_cache_path("clip", key, "mkv")
+
+
+def render_clip(process: Process, clip_path: str):
+    fd, temp_path = tempfile.mkstemp(
+        suffix=".mkv", dir=os.path.dirname(clip_path)
+    )
+    os.close(fd)
+    try:
+        outputs = []
+        option: dict[str, Any] = {}
+        if process.video is not None:
+            outputs.append(process.video)
+            # 透過を保ったまま無劣化で保存する
+            # 縮小描画でもfpsを下げるのは書き出しのみとし、クリップはルートのfpsで持つ
+            option |= {
+                "vcodec": "ffv1",
+                "pix_fmt": "bgra",
+                "r": VSMLManager.get_root_fps(),
+            }
+        if process.audio is not None:
+            outputs.append(process.audio)
+            option |= {"acodec": "pcm_f32le"}
+        with profile_stage("clip_render"):
+            run_process(
+                ffmpeg.output(*outputs, temp_path, **option),
+                overwrite=True,
+                quiet=True,
+            )
+        os.replace(temp_path, clip_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def create_clip_process(
+    vsml_content: WrapContent,
+    clip_path: str,
+    offset: Optional[Fraction] = None,
+) -> Process:
+    source = get_source_process(
+        clip_path,
+        vsml_content.exist_video,
+        vsml_content.exist_audio,
+        timeline_start=offset,
+    )
+    return Process(source["video"], source["audio"], vsml_content.style)
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+import ffmpeg
+
+from profiler import profile_stage
+
+from .graph import compile_args
+
+
+@contextmanager
+def compile_command(
+    process: Any,
+    overwrite: bool = False,
+    keep_script: bool = False,
+) -> Iterator[list[str]]:
+    """
+    ffmpegのコマンドを組み立て、フィルタグラフはスクリプトファイルとして渡す。
+
+    Parameters
+    ----------
+    process : Any
+        出力まで組み立てたffmpegのプロセス
+    overwrite : bool
+        出力先の上書きを許可するか
+    keep_script : bool
+        終了後もスクリプトファイルを残すか
+
+    Yields
+    ------
+    args : list[str]
+        フィルタグラフを-filter_complex_scriptで参照するコマンド引数
+    """
+
+    with profile_stage("compile"):
+        args = compile_args(process, overwrite)
+    if "-filter_complex" not in args:
+        yield args
+        return
+
+    # 巨大なグラフでもコマンド引数の長さの上限に掛からないよう、ファイルに書き出す
+    index = args.index("-filter_complex")
+    fd, script_path = tempfile.mkstemp(prefix="vsml_", suffix=".filter")
+    with os.fdopen(fd, "w") as f:
+        f.write(args[index + 1])
+    args = (
+        args[:index]
+        + ["-filter_complex_script", script_path]
+        + args[index + 2 :]
+    )
+    try:
+        yield args
+    finally:
+        if not keep_script:
+            os.remove(script_path)
+
+
+def get_filter_script_path(args: list[str]) -> Optional[str]:
+    if "-filter_complex_script" not in args:
+        return None
+    return args[args.index("-filter_complex_script") + 1]
+
+
+def run_command(
+    args: list[str],
+    quiet: bool = False,
+    capture_stderr: bool = False,
+) -> bytes:
+    result = subprocess.run(
+        args,
+        stdout=subprocess.PIPE if quiet else None,
+        stderr=subprocess.PIPE if quiet or capture_stderr else None,
+    )
+    if result.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", result.stdout, result.stderr)
+    return result.stderr if result.stderr is not None else b""
+
+
+def run_process(
+    process: Any,
+    overwrite: bool = False,
+    quiet: bool = False,
+) -> bytes:
+    with compile_command(process, overwrite) as args:
+        return run_command(args, quiet)
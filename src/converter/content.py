@@ -1,53 +1,60 @@
+from fractions import Fraction
 from typing import Any, Optional
 
 from content import SourceContent
 from style import Style
-from utils import SourceType
+from utils import SourceType, VSMLManager
 
 from .ffmpeg import (
     audio_system_filter,
     audio_volume_filter,
     get_background_color_code,
     get_source_process,
-    get_text_process,
     object_length_filter,
     set_background_filter,
+    source_size_filter,
+    still_loop_filter,
     time_space_end_filter,
     time_space_start_filter,
-    width_height_filter,
 )
+from .proxy import get_proxy_source
 from .schemas import Process
+from .still import render_still
 
 
 def get_process_by_source(
-    src_path: str, type: SourceType, exist_audio: bool, style: Style
+    src_path: str,
+    type: SourceType,
+    exist_audio: bool,
+    style: Style,
+    duration: Optional[float] = None,
+    timeline_start: Optional[Fraction] = None,
 ) -> tuple[Optional[Any], Optional[Any]]:
     video_process = None
     audio_process = None
+    # 長さを持つソースのループは入力側で行い、デコード済みフレームを溜めない
+    loop_option = {"stream_loop": -1} if style.is_source_loop() else {}
     match type:
-        case SourceType.IMAGE:
-            source = get_source_process(src_path, True, False, loop=1)
-            video_process = source["video"].filter("setsar", "1/1")
         case SourceType.VIDEO:
-            source = get_source_process(src_path, True, exist_audio)
+            source = get_source_process(
+                src_path,
+                True,
+                exist_audio,
+                duration=duration,
+                timeline_start=timeline_start,
+                **loop_option,
+            )
             video_process = source["video"]
             audio_process = source["audio"]
         case SourceType.AUDIO:
-            audio_process = get_source_process(src_path, False, True)["audio"]
-        case SourceType.TEXT:
-            video_process = get_text_process(
+            audio_process = get_source_process(
                 src_path,
-                style.get_width_with_padding(),
-                style.get_height_with_padding(),
-                style.padding_left,
-                style.padding_top,
-                style.background_color,
-                style.using_font_path,
-                style.font_size,
-                style.font_color,
-                style.font_border_color,
-                style.font_border_width,
-            )
+                False,
+                True,
+                duration=duration,
+                timeline_start=timeline_start,
+                **loop_option,
+            )["audio"]
         case _:
             raise Exception()
     return video_process, audio_process
@@ -56,21 +63,48 @@ def get_process_by_source(
 def create_source_process(
     vsml_content: SourceContent,
     debug_mode: bool = False,
+    offset: Optional[Fraction] = None,
 ) -> Process:
     # styleの取得
     style = vsml_content.style
-    video_process, audio_process = get_process_by_source(
-        vsml_content.src_path,
-        vsml_content.type,
-        vsml_content.exist_audio,
-        style,
+    # 長さが決まっているファイルソースは入力オプションで長さを指定し、trimを省く
+    is_trimmed_by_input = (
+        vsml_content.type in [SourceType.VIDEO, SourceType.AUDIO]
+        and style.object_length.has_specific_value()
+    )
+    timeline_start = (
+        offset + style.time_padding_start.get_fraction()
+        if offset is not None
+        else None
     )
+    src_path = vsml_content.src_path
+    if vsml_content.type in [SourceType.IMAGE, SourceType.TEXT]:
+        # 時間で変化しない要素は1度だけ描画し、そのフレームを保持し続ける
+        still_path = render_still(vsml_content)
+        video_process = still_loop_filter(
+            get_source_process(
+                still_path, True, False, timeline_start=timeline_start
+            )["video"]
+        )
+        audio_process = None
+    else:
+        if vsml_content.type == SourceType.VIDEO and VSMLManager.is_draft():
+            # 確認用の描画では、作成済みの代替の素材でデコードを軽くする
+            src_path = get_proxy_source(src_path)
+        video_process, audio_process = get_process_by_source(
+            src_path,
+            vsml_content.type,
+            vsml_content.exist_audio,
+            style,
+            style.object_length.get_second() if is_trimmed_by_input else None,
+            timeline_start,
+        )
 
-    if video_process is not None and vsml_content.type != SourceType.TEXT:
+    if video_process is not None and vsml_content.type == SourceType.VIDEO:
         # videoのstyle対応
         # resize
-        video_process = width_height_filter(
-            style.width, style.height, video_process
+        video_process = source_size_filter(
+            style, video_process, src_path != vsml_content.src_path
         )
         # padding and background-color
         if (
@@ -96,9 +130,10 @@ def create_source_process(
 
     # timeのstyle対応
     background_color_code = get_background_color_code(style.background_color)
-    video_process, audio_process = object_length_filter(
-        style.object_length, video_process, audio_process
-    )
+    if not is_trimmed_by_input:
+        video_process, audio_process = object_length_filter(
+            style.object_length, video_process, audio_process
+        )
     video_process, audio_process = time_space_start_filter(
         style.time_padding_start,
         background_color_code,
@@ -1,76 +1,147 @@
 # import time
 import math
+import sys
+from fractions import Fraction
 from typing import Any, Optional
 
 import ffmpeg
 
-from style import AudioSystem, Color, GraphicValue, TimeValue
+from profiler import get_profiler, profile_stage
+from style import AudioSystem, Color, GraphicValue, Style, TimeValue
 from utils import VSMLManager
 
-origin_background_processes = {}
-origin_graphic_processes: dict[str, dict[str, Any]] = {}
+from .command import compile_command, get_filter_script_path, run_command
+from .graph_cache import get_graph_cache
+from .output import OutputMode, get_output_mode_option
+from .profile import EncodeProfile
+from .progress import ProgressCallback, run_with_progress
+from .schemas import SourceInstance
 
+# 同じソースをsplitで共有する際に許容する再生位置の差(秒)
+SHARED_SOURCE_MAX_LAG = 1.0
+# concatやamixの1つのフィルタにまとめる入力数の上限の既定値
+MAX_FILTER_INPUTS = 64
 
-def get_background_process(
+
+def create_background_process(
     resolution_text: str, background_color: Optional[Color] = None
 ) -> Any:
-    global origin_background_process
+    background_process = ffmpeg.input(
+        "rgbtestsrc=s={}".format(resolution_text),
+        f="lavfi",
+    )
+    if background_color is None:
+        background_process = ffmpeg.filter(
+            background_process, "geq", a=0, r=0, g=0, b=0
+        )
+    else:
+        background_process = ffmpeg.filter(
+            background_process,
+            "geq",
+            a=background_color.a_value,
+            r=background_color.r_value,
+            g=background_color.g_value,
+            b=background_color.b_value,
+        )
+    return background_process
+
+
+def get_background_process(
+    resolution_text: str,
+    background_color: Optional[Color] = None,
+    use_cache: bool = True,
+) -> Any:
+    if not use_cache:
+        return create_background_process(resolution_text, background_color)
     key = "{}/{}".format(
         resolution_text,
         "transparent" if background_color is None else background_color.value,
     )
-    origin_background_process = origin_background_processes.get(key)
+    background_cache = get_graph_cache().background_processes
+    origin_background_process = background_cache.get(key)
     if origin_background_process is None:
-        origin_background_process = ffmpeg.input(
-            "rgbtestsrc=s={}".format(resolution_text),
-            f="lavfi",
+        origin_background_process = create_background_process(
+            resolution_text, background_color
         )
-        if background_color is None:
-            origin_background_process = ffmpeg.filter(
-                origin_background_process, "geq", a=0, r=0, g=0, b=0
-            )
-        else:
-            origin_background_process = ffmpeg.filter(
-                origin_background_process,
-                "geq",
-                a=background_color.a_value,
-                r=background_color.r_value,
-                g=background_color.g_value,
-                b=background_color.b_value,
-            )
     background_processes = origin_background_process.split()
-    origin_background_processes[key] = background_processes[1]
+    background_cache.set(key, background_processes[1])
     return background_processes[0]
 
 
+def get_silent_process(duration: float) -> Any:
+    silent_process = ffmpeg.input("anullsrc=channel_layout=stereo", f="lavfi")
+    return ffmpeg.filter(silent_process, "atrim", end=duration)
+
+
+def find_shared_source_instance(
+    instances: list[SourceInstance],
+    exist_video: bool,
+    exist_audio: bool,
+    timeline_start: Optional[Fraction],
+) -> Optional[SourceInstance]:
+    for instance in instances:
+        if (exist_video and instance.video is None) or (
+            exist_audio and instance.audio is None
+        ):
+            continue
+        if timeline_start is None or instance.timeline_start is None:
+            return instance
+        # 再生位置の差がsplitのバッファ量になるため、差が小さい場合のみ共有する
+        if (
+            abs(timeline_start - instance.timeline_start)
+            <= SHARED_SOURCE_MAX_LAG
+        ):
+            return instance
+    return None
+
+
 def get_source_process(
-    src_path: str, exist_video: bool, exist_audio: bool, **option
+    src_path: str,
+    exist_video: bool,
+    exist_audio: bool,
+    start: Optional[float] = None,
+    duration: Optional[float] = None,
+    timeline_start: Optional[Fraction] = None,
+    **option,
 ) -> dict[str, Any]:
-    global origin_graphic_processes
-    origin_graphic_process = origin_graphic_processes.get(src_path)
-    if origin_graphic_process is None:
-        process = ffmpeg.input(src_path, **option)
-        origin_graphic_process = {
-            "video": process.video if exist_video else None,
-            "audio": process.audio if exist_audio else None,
-        }
-    video_graphic_processes = (
-        origin_graphic_process["video"].split()
-        if origin_graphic_process["video"] is not None
-        else (None, None)
+    # シークと長さの指定は入力オプションとして渡し、使わないフレームをデコードさせない
+    if start is not None and start > 0:
+        option |= {"ss": start}
+    if duration is not None:
+        option |= {"t": duration}
+    key = "{}/{}".format(
+        src_path,
+        ",".join("{}={}".format(k, v) for k, v in sorted(option.items())),
     )
-    audio_graphic_processes = (
-        origin_graphic_process["audio"].asplit()
-        if origin_graphic_process["audio"] is not None
-        else (None, None)
+    source_cache = get_graph_cache().source_instances
+    instances: Optional[list[SourceInstance]] = source_cache.get(key)
+    if instances is None:
+        instances = []
+        source_cache.set(key, instances)
+    instance = find_shared_source_instance(
+        instances, exist_video, exist_audio, timeline_start
     )
-    origin_graphic_processes[src_path] = {
-        "video": video_graphic_processes[1],
-        "audio": audio_graphic_processes[1],
-    }
+    if instance is None:
+        # 時間的に離れた利用は、splitで繋がず独立した入力としてデコードする
+        thread_queue_size = VSMLManager.get_input_thread_queue_size()
+        input_option = (
+            {"thread_queue_size": thread_queue_size}
+            if thread_queue_size is not None
+            else {}
+        )
+        process = ffmpeg.input(src_path, **option, **input_option)
+        instance = SourceInstance(
+            video=process.video.split() if exist_video else None,
+            audio=process.audio.asplit() if exist_audio else None,
+            timeline_start=timeline_start,
+        )
+        instances.append(instance)
+    # 1つのsplitから出力を増やしていき、splitの連鎖を作らない
+    index = instance.use_count
+    instance.use_count += 1
     return {
-        "video": video_graphic_processes[0],
-        "audio": audio_graphic_processes[0],
+        "video": instance.video[index] if exist_video else None,
+        "audio": instance.audio[index] if exist_audio else None,
     }
 
 
@@ -91,15 +162,31 @@ def width_height_filter(
 ) -> Any:
     if video_process is not None:
         if not (width.is_auto() and height.is_auto()):
+            option = {}
+            if VSMLManager.get_draft_scale() != 1:
+                # 縮小描画では画質より速度を優先する
+                option["flags"] = "fast_bilinear"
             video_process = ffmpeg.filter(
                 video_process,
                 "scale",
                 width.get_pixel(-1),
                 height.get_pixel(-1),
+                **option,
             )
     return video_process
 
 
+def source_size_filter(
+    style: Style, video_process: Any, is_proxy: bool = False
+) -> Any:
+    # 縮小描画や代替の素材では、大きさの指定が無いソースも描画する大きさに合わせる
+    if is_proxy or VSMLManager.get_draft_scale() != 1:
+        return width_height_filter(
+            style.get_width(), style.get_height(), video_process
+        )
+    return width_height_filter(style.width, style.height, video_process)
+
+
 def audio_system_filter(
     source_audio_system: Optional[AudioSystem],
     audio_system: Optional[AudioSystem],
@@ -150,18 +237,14 @@ def object_length_filter(
                 "atrim",
                 end=length_second,
             )
-    elif object_length.is_fit():
-        if video_process is not None:
-            video_process = ffmpeg.filter(
-                video_process, "loop", loop=-1, size=32767, start=0
-            )
-        if audio_process is not None:
-            audio_process = ffmpeg.filter(
-                audio_process, "aloop", loop=-1, size=2147483647, start=0
-            )
     return video_process, audio_process
 
 
+def still_loop_filter(video_process: Any) -> Any:
+    # 静止画は1フレームだけを保持して繰り返す
+    return ffmpeg.filter(video_process, "loop", loop=-1, size=1, start=0)
+
+
 def time_space_start_filter(
     time_space_start: TimeValue,
     background_color_code: Optional[str] = None,
@@ -183,7 +266,8 @@ def time_space_start_filter(
                 **option,
             )
         if audio_process is not None:
-            delays = int(space_second * 1000)
+            # ミリ秒に切り捨てるとずれが積み重なるため、小数のまま渡す
+            delays = space_second * 1000
             audio_process = ffmpeg.filter(
                 audio_process,
                 "adelay",
@@ -222,29 +306,56 @@ def time_space_end_filter(
     return video_process, audio_process
 
 
+def get_max_filter_inputs() -> int:
+    # エンコードのプロファイルで指定が無ければ、既定値を使う
+    max_inputs = VSMLManager.get_max_filter_inputs()
+    return MAX_FILTER_INPUTS if max_inputs is None else max_inputs
+
+
 def concat_filter(
-    base_process: Optional[Any], merging_process: Any, is_video: bool = True
-) -> Any:
-    if base_process is None:
-        return merging_process
-    else:
-        return ffmpeg.concat(
-            base_process, merging_process, v=int(is_video), a=int(not is_video)
-        )
+    processes: list[Any],
+    is_video: bool = True,
+    max_inputs: Optional[int] = None,
+) -> Optional[Any]:
+    if len(processes) == 0:
+        return None
+    if len(processes) == 1:
+        return processes[0]
+    if max_inputs is None:
+        max_inputs = get_max_filter_inputs()
+    # 入力数が多すぎる場合は分割してから連結する
+    if len(processes) > max_inputs:
+        processes = [
+            concat_filter(processes[i : i + max_inputs], is_video, max_inputs)
+            for i in range(0, len(processes), max_inputs)
+        ]
+        return concat_filter(processes, is_video, max_inputs)
+    return ffmpeg.concat(*processes, v=int(is_video), a=int(not is_video))
 
 
 def audio_merge_filter(
-    base_audio_process: Optional[Any],
-    merging_audio_process: Any,
-) -> Any:
-    if base_audio_process is None:
-        return merging_audio_process
-    else:
-        return ffmpeg.filter(
-            [base_audio_process, merging_audio_process],
-            "amix",
-            normalize=False,
-        )
+    audio_processes: list[Any],
+    max_inputs: Optional[int] = None,
+) -> Optional[Any]:
+    if len(audio_processes) == 0:
+        return None
+    if len(audio_processes) == 1:
+        return audio_processes[0]
+    if max_inputs is None:
+        max_inputs = get_max_filter_inputs()
+    # 入力数が多すぎる場合は分割してからミックスする
+    if len(audio_processes) > max_inputs:
+        audio_processes = [
+            audio_merge_filter(audio_processes[i : i + max_inputs], max_inputs)
+            for i in range(0, len(audio_processes), max_inputs)
+        ]
+        return audio_merge_filter(audio_processes, max_inputs)
+    return ffmpeg.filter(
+        audio_processes,
+        "amix",
+        inputs=len(audio_processes),
+        normalize=False,
+    )
 
 
 def get_text_process(
@@ -259,6 +370,7 @@ def get_text_process(
     font_color: Optional[Color],
     font_border_color: Optional[Color],
     font_border_width: Optional[int],
+    use_cache: bool = True,
 ) -> Any:
     option: dict = {
         "x": padding_left.get_pixel(),
@@ -270,6 +382,7 @@ def get_text_process(
     transparent_process = get_background_process(
         "{}x{}".format(width_px, height_px),
         background_color,
+        use_cache,
     )
     if font_path is not None:
         option |= {
@@ -340,6 +453,7 @@ def set_background_filter(
     fit_video_process: bool = False,
     position_x: Optional[GraphicValue] = None,
     position_y: Optional[GraphicValue] = None,
+    use_cache: bool = True,
 ) -> Any:
     resolution = ""
     if resolution_text is not None:
@@ -351,7 +465,9 @@ def set_background_filter(
         )
     else:
         raise Exception()
-    background_process = get_background_process(resolution, background_color)
+    background_process = get_background_process(
+        resolution, background_color, use_cache
+    )
 
     return layering_filter(
         background_process,
@@ -389,13 +505,25 @@ def layering_filter(
         )
 
 
-def export_video(
+def output_fps_filter(video_process: Any) -> Any:
+    # 書き出しのfpsを下げる場合、-rのみでは末尾のフレームが複製されるため、
+    # グラフの中で間引いてフレーム数を長さに合わせる
+    frame_rate = VSMLManager.get_output_frame_rate()
+    if frame_rate == VSMLManager.get_root_frame_rate():
+        return video_process
+    # 終端で最後のフレームを落とさないよう、残りはそのまま書き出す
+    return ffmpeg.filter(
+        video_process, "fps", fps=str(frame_rate), eof_action="pass"
+    )
+
+
+def get_output_process(
     video_process: Optional[Any],
     audio_process: Optional[Any],
     out_filename: str,
-    debug_mode: bool,
-    overwrite: bool,
-):
+    encode_profile: Optional[EncodeProfile] = None,
+    output_mode: OutputMode = OutputMode.FILE,
+) -> Any:
     match (
         video_process,
         audio_process,
@@ -403,29 +531,82 @@ def export_video(
         case None, None:
             raise Exception()
         case _, None:
-            process = video_process
+            process = output_fps_filter(video_process)
         case None, _:
             process = audio_process
         case _:
             process = ffmpeg.concat(
-                video_process,
+                output_fps_filter(video_process),
                 audio_process,
                 v=1,
                 a=1,
                 n=1,
             )
+    option = (
+        encode_profile.get_output_option(VSMLManager.get_output_fps())
+        if encode_profile is not None
+        else {}
+    )
     process = ffmpeg.output(
         process,
         out_filename,
-        r=VSMLManager.get_root_fps(),
+        r=VSMLManager.get_output_fps(),
+        **option,
+        **get_output_mode_option(output_mode, out_filename),
     )
+    if encode_profile is not None:
+        process = process.global_args(*encode_profile.get_global_args())
+    return process
 
-    if debug_mode:
-        # ffmpeg.view(process)
-        # time.sleep(0.1)
-        print("\n[[[command args]]]\n{}".format(ffmpeg.compile(process)))
 
-    ffmpeg.run(
-        process,
-        overwrite_output=overwrite,
+def export_video(
+    video_process: Optional[Any],
+    audio_process: Optional[Any],
+    out_filename: str,
+    debug_mode: bool,
+    overwrite: bool,
+    encode_profile: Optional[EncodeProfile] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+    total_time: Optional[float] = None,
+    output_mode: OutputMode = OutputMode.FILE,
+):
+    process = get_output_process(
+        video_process, audio_process, out_filename, encode_profile, output_mode
     )
+    profiler = get_profiler()
+    if profiler is not None:
+        process = process.global_args("-benchmark")
+
+    with compile_command(process, overwrite, debug_mode) as args:
+        if debug_mode:
+            # ffmpeg.view(process)
+            # time.sleep(0.1)
+            # 標準出力に動画を書き出す場合に混ざらないよう、標準エラー出力に表示する
+            print("\n[[[command args]]]\n{}".format(args), file=sys.stderr)
+            script_path = get_filter_script_path(args)
+            if script_path is not None:
+                print(
+                    "\n[[[filter script]]]\n{}".format(script_path),
+                    file=sys.stderr,
+                )
+
+        # ベンチマークの結果を取り出すため、計測中は標準エラー出力を受け取る
+        stderr = None
+        with profile_stage("encode"):
+            if progress_callback is not None:
+                stderr = run_with_progress(
+                    args,
+                    total_time,
+                    progress_callback,
+                    progress_on_stderr=output_mode == OutputMode.PIPE,
+                    capture_stderr=profiler is not None,
+                )
+            elif profiler is not None:
+                stderr = run_command(args, capture_stderr=True).decode(
+                    errors="replace"
+                )
+                sys.stderr.write(stderr)
+            else:
+                run_command(args)
+        if profiler is not None and stderr is not None:
+            profiler.add_ffmpeg_benchmark(stderr)
@@ -0,0 +1,200 @@
+from typing import Any, Optional
+
+from ffmpeg._utils import convert_kwargs_to_cmd_line_args
+from ffmpeg.nodes import (
+    FilterNode,
+    GlobalNode,
+    InputNode,
+    MergeOutputsNode,
+    OutputNode,
+)
+
+
+def sort_nodes(output_node: Any) -> list[Any]:
+    """
+    出力から辿れるノードを、上流が先に来る順に並べる。
+
+    ffmpeg-pythonのtopo_sortとは異なり、再帰せずに1度だけ辿り、
+    ハッシュではなくオブジェクトの同一性でノードを区別する。
+
+    Parameters
+    ----------
+    output_node : Any
+        出力、もしくはそれをまとめたノード
+
+    Returns
+    -------
+    sorted_nodes : list[Any]
+        上流から順に並べたノード
+    """
+
+    sorted_nodes = []
+    visited = set()
+    stack = [(output_node, False)]
+    while len(stack) > 0:
+        node, is_expanded = stack.pop()
+        if is_expanded:
+            sorted_nodes.append(node)
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        stack.append((node, True))
+        upstream_nodes = [
+            upstream_node
+            for upstream_node, _, _ in node.incoming_edge_map.values()
+        ]
+        # 入力の順番を保つため、先頭の上流ノードから辿る
+        for upstream_node in reversed(upstream_nodes):
+            if id(upstream_node) not in visited:
+                stack.append((upstream_node, False))
+    return sorted_nodes
+
+
+def get_stream_name(
+    stream_names: dict[tuple[int, Any], str],
+    upstream_node: Any,
+    upstream_label: Any,
+    upstream_selector: Optional[str],
+    is_map: bool = False,
+) -> str:
+    name = stream_names[id(upstream_node), upstream_label]
+    if upstream_selector:
+        name += ":{}".format(upstream_selector)
+    # -mapで入力を直接指定する場合は括弧を付けない
+    if is_map and isinstance(upstream_node, InputNode):
+        return name
+    return "[{}]".format(name)
+
+
+def get_input_args(node: InputNode) -> list[str]:
+    kwargs = dict(node.kwargs)
+    filename = kwargs.pop("filename")
+    input_format = kwargs.pop("format", None)
+    video_size = kwargs.pop("video_size", None)
+    args = []
+    if input_format:
+        args += ["-f", input_format]
+    if video_size:
+        args += ["-video_size", "{}x{}".format(video_size[0], video_size[1])]
+    args += convert_kwargs_to_cmd_line_args(kwargs)
+    args += ["-i", filename]
+    return args
+
+
+def get_output_args(
+    node: OutputNode,
+    stream_names: dict[tuple[int, Any], str],
+) -> list[str]:
+    args = []
+    edges = list(node.incoming_edge_map.values())
+    if len(edges) == 0:
+        raise ValueError("Output node {} has no mapped streams".format(node))
+    for upstream_node, upstream_label, upstream_selector in edges:
+        stream_name = get_stream_name(
+            stream_names,
+            upstream_node,
+            upstream_label,
+            upstream_selector,
+            is_map=True,
+        )
+        if stream_name != "0" or len(edges) > 1:
+            args += ["-map", stream_name]
+
+    kwargs = dict(node.kwargs)
+    filename = kwargs.pop("filename")
+    if "format" in kwargs:
+        args += ["-f", kwargs.pop("format")]
+    if "video_bitrate" in kwargs:
+        args += ["-b:v", str(kwargs.pop("video_bitrate"))]
+    if "audio_bitrate" in kwargs:
+        args += ["-b:a", str(kwargs.pop("audio_bitrate"))]
+    args += convert_kwargs_to_cmd_line_args(kwargs)
+    args += [filename]
+    return args
+
+
+def compile_args(stream: Any, overwrite: bool = False) -> list[str]:
+    """
+    ffmpeg-pythonで組み立てたグラフから、ffmpegのコマンド引数を作る。
+
+    ノードを1度並べた後、ストリームの名前を順に割り当てながらfilter_complexと
+    入出力の引数を作るため、ノード数に対して線形の時間で終わる。
+
+    Parameters
+    ----------
+    stream : Any
+        ffmpeg.outputなどで組み立てた出力のストリーム
+    overwrite : bool
+        出力先の上書きを許可するか
+
+    Returns
+    -------
+    args : list[str]
+        ffmpegのコマンド引数
+    """
+
+    sorted_nodes = sort_nodes(stream.node)
+
+    # 上流のノードと出力のラベルごとに、利用する下流の数を数える
+    outgoing_counts: dict[int, dict[Any, int]] = {}
+    for node in sorted_nodes:
+        for (
+            upstream_node,
+            upstream_label,
+            _,
+        ) in node.incoming_edge_map.values():
+            labels = outgoing_counts.setdefault(id(upstream_node), {})
+            labels[upstream_label] = labels.get(upstream_label, 0) + 1
+
+    input_args = []
+    filter_specs = []
+    output_nodes = []
+    global_args = []
+    stream_names: dict[tuple[int, Any], str] = {}
+    input_count = 0
+    stream_count = 0
+    for node in sorted_nodes:
+        if isinstance(node, InputNode):
+            stream_names[id(node), None] = str(input_count)
+            input_count += 1
+            input_args += get_input_args(node)
+        elif isinstance(node, FilterNode):
+            inputs = "".join(
+                get_stream_name(stream_names, *edge)
+                for edge in node.incoming_edge_map.values()
+            )
+            outputs = ""
+            labels = outgoing_counts.get(id(node), {})
+            for label in sorted(
+                labels, key=lambda label: (label is None, label)
+            ):
+                if labels[label] > 1:
+                    raise ValueError(
+                        "Encountered {} with multiple outgoing edges with same"
+                        " upstream label {!r}; a `split` filter is probably"
+                        " required".format(node, label)
+                    )
+                name = "s{}".format(stream_count)
+                stream_count += 1
+                stream_names[id(node), label] = name
+                outputs += "[{}]".format(name)
+            # splitの出力数は実際に使う出力の数で決まる
+            filter_text = node._get_filter([None] * len(labels))
+            filter_specs.append(inputs + filter_text + outputs)
+        elif isinstance(node, OutputNode):
+            output_nodes.append(node)
+        elif isinstance(node, GlobalNode):
+            global_args += list(node.args)
+        elif not isinstance(node, MergeOutputsNode):
+            raise ValueError("Unsupported node: {}".format(node))
+
+    args = input_args
+    if len(filter_specs) > 0:
+        args += ["-filter_complex", ";".join(filter_specs)]
+    for node in output_nodes:
+        args += get_output_args(node, stream_names)
+    args += global_args
+    if overwrite:
+        args += ["-y"]
+    return ["ffmpeg"] + args
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from profiler import get_profiler
+
+# 1つのグラフで共有のために保持する背景と入力の数の上限
+MAX_BACKGROUND_PROCESSES = 64
+MAX_SOURCE_PROCESSES = 256
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class BoundedCache:
+    """
+    最近使っていないものから捨てる、大きさに上限のあるキャッシュ。
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.items: OrderedDict[str, Any] = OrderedDict()
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.items.get(key)
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self.items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+            self.stats.evictions += 1
+
+
+@dataclass
+class GraphCache:
+    """
+    1つのグラフを組み立てる間だけ、背景と入力をsplitで共有するためのキャッシュ。
+    """
+
+    background_processes: BoundedCache = field(
+        default_factory=lambda: BoundedCache(MAX_BACKGROUND_PROCESSES)
+    )
+    source_instances: BoundedCache = field(
+        default_factory=lambda: BoundedCache(MAX_SOURCE_PROCESSES)
+    )
+
+    def get_stats(self) -> dict[str, CacheStats]:
+        return {
+            "background_processes": self.background_processes.stats,
+            "source_instances": self.source_instances.stats,
+        }
+
+
+current_graph_cache: ContextVar[Optional[GraphCache]] = ContextVar(
+    "current_graph_cache", default=None
+)
+
+
+def get_graph_cache() -> GraphCache:
+    graph_cache = current_graph_cache.get()
+    # グラフの組み立て中でなければ共有せず、呼び出しごとに独立した入力を作る
+    return GraphCache() if graph_cache is None else graph_cache
+
+
+@contextmanager
+def use_graph_cache() -> Iterator[GraphCache]:
+    """
+    with文の間に組み立てるグラフで、背景と入力を共有する。
+
+    with文を抜けるとキャッシュは破棄されるため、次のグラフに前のグラフの
+    ノードが混ざらない。計測中であれば、ヒット数などを計測結果に加える。
+
+    Yields
+    ------
+    graph_cache : GraphCache
+        with文の間に使うキャッシュ
+    """
+
+    graph_cache = GraphCache()
+    token = current_graph_cache.set(graph_cache)
+    try:
+        yield graph_cache
+    finally:
+        current_graph_cache.reset(token)
+        profiler = get_profiler()
+        if profiler is not None:
+            for name, stats in graph_cache.get_stats().items():
+                profiler.add_cache_stats(
+                    name, stats.hits, stats.misses, stats.evictions
+                )
@@ -1,9 +1,13 @@
+import os
+from fractions import Fraction
 from typing import Optional
 
 from content import SourceContent, VSMLContent, WrapContent
-from utils import VSMLManager
+from profiler import profile_stage
+from utils import VSMLManager, use_render_context
 from vsml import VSML
 
+from .clip import create_clip_process, get_clip_path, render_clip
 from .content import create_source_process
 from .ffmpeg import (
     export_video,
@@ -11,23 +15,45 @@ from .ffmpeg import (
     time_space_end_filter,
     time_space_start_filter,
 )
-from .schemas import Process
-from .wrap import create_wrap_process
+from .graph_cache import use_graph_cache
+from .output import OutputMode, get_output_target
+from .profile import EncodeProfile
+from .progress import ProgressCallback
+from .schemas import Process, Segment
+from .segment import create_segment_process, export_segments, split_segments
+from .still import prerender_stills
+from .wrap import (
+    create_caption_process,
+    create_wrap_process,
+    get_child_offsets,
+    is_caption_sequence,
+)
 
 
 def create_process(
     vsml_content: VSMLContent,
     debug_mode: bool = False,
+    offset: Fraction = Fraction(0),
+    use_cache: bool = False,
 ) -> Process:
     if isinstance(vsml_content, SourceContent):
         process = create_source_process(
             vsml_content,
             debug_mode,
+            offset,
         )
+    elif isinstance(vsml_content, WrapContent) and is_caption_sequence(
+        vsml_content
+    ):
+        # 同じスタイルの文字が並ぶseqは、子要素を組み立てずに1つの字幕にする
+        process = create_caption_process(vsml_content, debug_mode)
     elif isinstance(vsml_content, WrapContent):
         child_processes = []
-        for item in vsml_content.items:
-            child_process = create_process(item, debug_mode)
+        child_offsets = get_child_offsets(vsml_content, offset)
+        for item, child_offset in zip(vsml_content.items, child_offsets):
+            child_process = create_child_process(
+                item, debug_mode, child_offset, use_cache
+            )
             if child_process is not None:
                 child_processes.append(child_process)
         process = create_wrap_process(
@@ -41,35 +67,184 @@ def create_process(
     return process
 
 
+def create_child_process(
+    vsml_content: VSMLContent,
+    debug_mode: bool = False,
+    offset: Fraction = Fraction(0),
+    use_cache: bool = False,
+) -> Process:
+    clip_path = (
+        get_clip_path(vsml_content)
+        if use_cache and isinstance(vsml_content, WrapContent)
+        else None
+    )
+    if clip_path is None:
+        return create_process(vsml_content, debug_mode, offset, use_cache)
+    if not os.path.exists(clip_path):
+        # 初回は描画してキャッシュに保存し、以降は変更のない要素を描画済みのクリップで済ませる
+        # クリップは別のグラフとして書き出すため、親のグラフと入力を共有しない
+        with use_graph_cache():
+            clip_process = create_process(
+                vsml_content, debug_mode, offset, use_cache
+            )
+        render_clip(clip_process, clip_path)
+    return create_clip_process(vsml_content, clip_path, offset)
+
+
+def get_whole_time(vsml_data: VSML) -> Optional[float]:
+    style = vsml_data.content.style
+    if not style.object_length.has_specific_value():
+        return None
+    with use_render_context(vsml_data.context):
+        return (
+            style.time_margin_start
+            + style.get_object_length_with_padding()
+            + style.time_margin_end
+        ).get_second()
+
+
+def get_render_vsml(
+    vsml_data: VSML, encode_profile: Optional[EncodeProfile]
+) -> VSML:
+    # 同じVSMLを別の設定で並行して変換しても混ざらないよう、変換ごとに複製する
+    if encode_profile is None:
+        return vsml_data.replace_context(
+            input_thread_queue_size=None, max_filter_inputs=None
+        )
+    return vsml_data.replace_context(
+        input_thread_queue_size=encode_profile.thread_queue_size,
+        max_filter_inputs=encode_profile.max_filter_inputs,
+    )
+
+
+def create_root_process(
+    vsml_data: VSML,
+    debug_mode: bool = False,
+    use_cache: bool = False,
+) -> Process:
+    style = vsml_data.content.style
+    # 背景と入力の共有はこのグラフの中に限り、組み立て後に破棄する
+    with (
+        use_render_context(vsml_data.context),
+        use_graph_cache(),
+        profile_stage("graph_construction"),
+    ):
+        prerender_stills(vsml_data.content)
+        process = create_process(
+            vsml_data.content,
+            debug_mode,
+            style.time_margin_start.get_fraction(),
+            use_cache,
+        )
+        if process.video is not None:
+            process.video = set_background_filter(
+                background_color=style.background_color,
+                resolution_text=VSMLManager.get_root_resolution().get_str(),
+                video_process=process.video,
+                fit_video_process=True,
+            )
+        process.video, process.audio = time_space_start_filter(
+            style.time_margin_start,
+            video_process=process.video,
+            audio_process=process.audio,
+        )
+        if style.object_length.has_specific_value():
+            process.video, process.audio = time_space_end_filter(
+                style.time_margin_end,
+                video_process=process.video,
+                audio_process=process.audio,
+            )
+    return process
+
+
 def convert_video(
     vsml_data: VSML,
     out_filename: Optional[str],
     debug_mode: bool,
     overwrite: bool,
+    jobs: int = 1,
+    use_cache: bool = False,
+    encode_profile: Optional[EncodeProfile] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+    output_mode: OutputMode = OutputMode.FILE,
 ):
-    out_filename = "video.mp4" if out_filename is None else out_filename
+    # 区間ごとの変換やffmpegの出力の設定も、解析時のルートの情報を参照する
+    vsml_data = get_render_vsml(vsml_data, encode_profile)
+    with use_render_context(vsml_data.context):
+        out_filename = get_output_target(output_mode, out_filename)
 
-    process = create_process(vsml_data.content, debug_mode)
-    style = vsml_data.content.style
-    if process.video is not None:
-        process.video = set_background_filter(
-            background_color=style.background_color,
-            resolution_text=VSMLManager.get_root_resolution().get_str(),
-            video_process=process.video,
-            fit_video_process=True,
-        )
-    process.video, process.audio = time_space_start_filter(
-        style.time_margin_start,
-        video_process=process.video,
-        audio_process=process.audio,
-    )
-    if style.object_length.has_specific_value():
-        process.video, process.audio = time_space_end_filter(
-            style.time_margin_end,
-            video_process=process.video,
-            audio_process=process.audio,
+        # 区間ごとの出力は結合してから書き出すため、ファイルへの出力のみ分割する
+        if jobs > 1 and output_mode == OutputMode.FILE:
+            segments = split_segments(vsml_data.content, jobs)
+            if segments is not None:
+                convert_video_by_segments(
+                    vsml_data,
+                    segments,
+                    out_filename,
+                    debug_mode,
+                    overwrite,
+                    jobs,
+                    use_cache,
+                    encode_profile,
+                    progress_callback,
+                )
+                return
+
+        process = create_root_process(vsml_data, debug_mode, use_cache)
+        export_video(
+            process.video,
+            process.audio,
+            out_filename,
+            debug_mode,
+            overwrite,
+            encode_profile,
+            progress_callback,
+            get_whole_time(vsml_data),
+            output_mode,
         )
 
-    export_video(
-        process.video, process.audio, out_filename, debug_mode, overwrite
+
+def convert_video_by_segments(
+    vsml_data: VSML,
+    segments: list[Segment],
+    out_filename: str,
+    debug_mode: bool,
+    overwrite: bool,
+    jobs: int,
+    use_cache: bool = False,
+    encode_profile: Optional[EncodeProfile] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+):
+    style = vsml_data.content.style
+    margin_start = style.time_margin_start.get_fraction()
+    processes = []
+    with profile_stage("graph_construction"):
+        prerender_stills(vsml_data.content)
+        for segment in segments:
+            # 区間ごとに独立したグラフとして組み立てる
+            with use_graph_cache():
+                child_processes = [
+                    create_child_process(
+                        item, debug_mode, margin_start + offset, use_cache
+                    )
+                    for item, offset in zip(segment.items, segment.offsets)
+                ]
+                processes.append(
+                    create_segment_process(
+                        child_processes,
+                        segment,
+                        style,
+                        vsml_data.content.exist_video,
+                        vsml_data.content.exist_audio,
+                    )
+                )
+    export_segments(
+        processes,
+        out_filename,
+        debug_mode,
+        overwrite,
+        jobs,
+        encode_profile,
+        progress_callback,
+        get_whole_time(vsml_data),
     )
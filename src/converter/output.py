@@ -0,0 +1,74 @@
+import os
+from enum import Enum
+from typing import Any, Optional
+
+# HLSの1つのセグメントの長さ(秒)
+HLS_SEGMENT_TIME = 4
+# 書き出し中でも再生できるよう、キーフレームごとに区切る
+# empty_moovでは編集リストを書けず映像の開始がずれるため、最初の区切りまでmoovを遅らせる
+FRAGMENTED_MP4_FLAGS = "frag_keyframe+delay_moov+default_base_moof"
+
+
+class OutputMode(Enum):
+    FILE = "file"
+    PIPE = "pipe"
+    FMP4 = "fmp4"
+    HLS = "hls"
+
+
+def get_output_target(
+    output_mode: OutputMode, out_filename: Optional[str]
+) -> str:
+    """
+    出力の形式に合わせて、ffmpegに渡す出力先を決める。
+
+    Parameters
+    ----------
+    output_mode : OutputMode
+        出力の形式
+    out_filename : Optional[str]
+        指定された出力先のパス。HLSでは.m3u8以外をディレクトリとして扱う
+
+    Returns
+    -------
+    output_target : str
+        ffmpegに渡す出力先
+    """
+
+    match output_mode:
+        case OutputMode.PIPE:
+            return "pipe:1"
+        case OutputMode.HLS:
+            if out_filename is None:
+                out_filename = "playlist.m3u8"
+            elif not out_filename.endswith(".m3u8"):
+                out_filename = os.path.join(out_filename, "playlist.m3u8")
+            out_dir = os.path.dirname(out_filename)
+            if out_dir != "":
+                os.makedirs(out_dir, exist_ok=True)
+            return out_filename
+        case _:
+            return "video.mp4" if out_filename is None else out_filename
+
+
+def get_output_mode_option(
+    output_mode: OutputMode, output_target: str
+) -> dict[str, Any]:
+    match output_mode:
+        case OutputMode.PIPE | OutputMode.FMP4:
+            return {"f": "mp4", "movflags": FRAGMENTED_MP4_FLAGS}
+        case OutputMode.HLS:
+            # セグメントを書き終えるたびにプレイリストへ追記する
+            return {
+                "f": "hls",
+                "hls_time": HLS_SEGMENT_TIME,
+                "hls_playlist_type": "event",
+                "hls_segment_filename": os.path.join(
+                    os.path.dirname(output_target), "segment%05d.ts"
+                ),
+                "force_key_frames": "expr:gte(t,n_forced*{})".format(
+                    HLS_SEGMENT_TIME
+                ),
+            }
+        case _:
+            return {}
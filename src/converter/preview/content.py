@@ -1,3 +1,4 @@
+from fractions import Fraction
 from typing import Optional
 
 from style import Order
@@ -5,7 +6,7 @@ from vsml import SourceContent, VSMLContent, WrapContent
 
 
 def pick_data(
-    vsml_content: VSMLContent, second: float
+    vsml_content: VSMLContent, second: Fraction
 ) -> Optional[VSMLContent]:
     if not vsml_content.exist_video:
         return None
@@ -13,22 +14,23 @@ def pick_data(
         if vsml_content.style.order == Order.SEQUENCE:
             items = vsml_content.items
             vsml_content.items = []
-            whole_second = 0
-            left_margin_end = 0
+            whole_second = Fraction(0)
+            left_margin_end = Fraction(0)
 
             for item in items:
                 whole_second += max(
-                    item.style.time_margin_start.get_second(), left_margin_end
+                    item.style.time_margin_start.get_fraction(),
+                    left_margin_end,
                 )
                 if second < whole_second:
                     return vsml_content
-                whole_second += item.style.time_padding_start.get_second()
+                whole_second += item.style.time_padding_start.get_fraction()
                 if second < whole_second:
                     item._second = -1
                     vsml_content.items = [item]
                     return vsml_content
                 whole_second_with_object_length = (
-                    whole_second + item.style.object_length.get_second()
+                    whole_second + item.style.object_length.get_fraction()
                 )
                 if second < whole_second_with_object_length:
                     child = pick_data(item, second - whole_second)
@@ -36,28 +38,28 @@ def pick_data(
                         vsml_content.items = [child]
                     return vsml_content
                 whole_second = whole_second_with_object_length
-                whole_second += item.style.time_padding_end.get_second()
+                whole_second += item.style.time_padding_end.get_fraction()
                 if second < whole_second:
                     item._second = -1
                     vsml_content.items = [item]
                     return vsml_content
-                left_margin_end = item.style.time_margin_end.get_second()
+                left_margin_end = item.style.time_margin_end.get_fraction()
 
         elif vsml_content.style.order == Order.PARALLEL:
             items = vsml_content.items
             vsml_content.items = []
 
             for item in items:
-                whole_second = item.style.time_margin_start.get_second()
+                whole_second = item.style.time_margin_start.get_fraction()
                 if second < whole_second:
                     continue
-                whole_second += item.style.time_padding_start.get_second()
+                whole_second += item.style.time_padding_start.get_fraction()
                 if second < whole_second:
                     item._second = -1
                     vsml_content.items.append(item)
                     continue
                 whole_second_with_object_length = (
-                    whole_second + item.style.object_length.get_second()
+                    whole_second + item.style.object_length.get_fraction()
                 )
                 if (
                     second < whole_second_with_object_length
@@ -68,7 +70,7 @@ def pick_data(
                         vsml_content.items.append(child)
                     continue
                 whole_second = whole_second_with_object_length
-                whole_second += item.style.time_padding_end.get_second()
+                whole_second += item.style.time_padding_end.get_fraction()
                 if second < whole_second:
                     item._second = -1
                     vsml_content.items.append(item)
@@ -1,38 +1,49 @@
-from typing import Optional
+from fractions import Fraction
+from typing import Any, Optional
 
 import ffmpeg
 
+from converter.command import run_process
 from converter.ffmpeg import set_background_filter
-from utils import VSMLManager
+from converter.graph_cache import use_graph_cache
+from utils import VSMLManager, use_render_context
 from vsml import VSML, WrapContent
 
 from .content import pick_data
 from .process import create_preview_process
 
 
+def create_image_process(vsml_data: VSML, frame: int, output_path: str) -> Any:
+    with use_render_context(vsml_data.context):
+        # フレームの境界で要素が切り替わるよう、時刻を有理数で比べる
+        second = Fraction(frame) / VSMLManager.get_root_frame_rate()
+        if second > vsml_data.content.style.object_length.get_fraction():
+            raise Exception()
+        vsml_content_for_pick = None
+        vsml_content = vsml_data.content
+        if second >= vsml_content.style.time_margin_start.get_fraction():
+            if second < vsml_content.style.time_padding_start.get_fraction():
+                if isinstance(vsml_content, WrapContent):
+                    vsml_content.items = []
+                vsml_content_for_pick = vsml_content
+            else:
+                vsml_content_for_pick = pick_data(vsml_content, second)
+
+        with use_graph_cache():
+            process = create_preview_process(vsml_content_for_pick)
+            process.video = set_background_filter(
+                background_color=vsml_content.style.background_color,
+                resolution_text=VSMLManager.get_root_resolution().get_str(),
+                video_process=process.video,
+                fit_video_process=True,
+            )
+        return ffmpeg.output(process.video, output_path, vframes=1)
+
+
 def convert_image_from_frame(
     vsml_data: VSML, frame: int, output_path: Optional[str]
 ) -> None:
     output_path = "preview.png" if output_path is None else output_path
-    second = frame / VSMLManager.get_root_fps()
-    if second > vsml_data.content.style.object_length.get_second():
-        raise Exception()
-    vsml_content_for_pick = None
-    vsml_content = vsml_data.content
-    if second >= vsml_content.style.time_margin_start.get_second():
-        if second < vsml_content.style.time_padding_start.get_second():
-            if isinstance(vsml_content, WrapContent):
-                vsml_content.items = []
-            vsml_content_for_pick = vsml_content
-        else:
-            vsml_content_for_pick = pick_data(vsml_content, second)
-
-    process = create_preview_process(vsml_content_for_pick)
-    process.video = set_background_filter(
-        background_color=vsml_content.style.background_color,
-        resolution_text=VSMLManager.get_root_resolution().get_str(),
-        video_process=process.video,
-        fit_video_process=True,
+    run_process(
+        create_image_process(vsml_data, frame, output_path), overwrite=True
     )
-    process = ffmpeg.output(process.video, output_path, vframes=1)
-    process.run(overwrite_output=True)
@@ -1,15 +1,14 @@
 from typing import Optional
 
-import ffmpeg
-
 from converter.ffmpeg import (
     get_background_process,
     get_source_process,
     get_text_process,
     layering_filter,
     set_background_filter,
-    width_height_filter,
+    source_size_filter,
 )
+from converter.proxy import get_proxy_source
 from converter.schemas import Process
 from style import GraphicValue, LayerMode, Order
 from utils import SourceType
@@ -18,6 +17,7 @@ from vsml import SourceContent, VSMLContent, WrapContent
 
 def create_preview_source_process(vsml_content: SourceContent) -> Process:
     style = vsml_content.style
+    src_path = vsml_content.src_path
     if vsml_content.type == SourceType.TEXT:
         video_process = get_text_process(
             vsml_content.src_path,
@@ -33,14 +33,28 @@ def create_preview_source_process(vsml_content: SourceContent) -> Process:
             style.font_border_width,
         )
     else:
+        if vsml_content.type == SourceType.VIDEO:
+            src_path = get_proxy_source(src_path)
         video_process = get_source_process(
-            vsml_content.src_path,
+            src_path,
             exist_video=True,
             exist_audio=False,
+            start=(
+                float(
+                    vsml_content._second
+                    % style.source_object_length.get_fraction()
+                    if style.source_object_length is not None
+                    and style.is_source_loop()
+                    else vsml_content._second
+                )
+                if vsml_content._second != -1
+                and vsml_content.tag_name == "vid"
+                else None
+            ),
         )["video"]
     if vsml_content.type != SourceType.TEXT:
-        video_process = width_height_filter(
-            style.width, style.height, video_process
+        video_process = source_size_filter(
+            style, video_process, src_path != vsml_content.src_path
         )
         if (
             style.padding_top.is_zero_over()
@@ -55,8 +69,6 @@ def create_preview_source_process(vsml_content: SourceContent) -> Process:
                 position_y=style.padding_top,
                 fit_video_process=True,
             )
-    if vsml_content._second != -1 and vsml_content.tag_name == "vid":
-        video_process = ffmpeg.trim(video_process, start=vsml_content._second)
     return Process(video_process, None, vsml_content.style)
 
 
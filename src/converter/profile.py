@@ -0,0 +1,111 @@
+import json
+from dataclasses import dataclass, fields, replace
+from typing import Any, Optional
+
+
+@dataclass
+class EncodeProfile:
+    preset: str
+    crf: int
+    keyframe_interval: float
+    audio_bitrate: str
+    thread_queue_size: int
+    threads: Optional[int] = None
+    filter_complex_threads: Optional[int] = None
+    max_filter_inputs: Optional[int] = None
+
+    def get_output_option(self, fps: float) -> dict[str, Any]:
+        option: dict[str, Any] = {
+            "vcodec": "libx264",
+            "preset": self.preset,
+            "crf": self.crf,
+            "g": max(1, round(fps * self.keyframe_interval)),
+            "audio_bitrate": self.audio_bitrate,
+        }
+        if self.threads is not None:
+            option |= {"threads": self.threads}
+        return option
+
+    def get_global_args(self) -> list[str]:
+        if self.filter_complex_threads is None:
+            return []
+        return ["-filter_complex_threads", str(self.filter_complex_threads)]
+
+
+# draftは確認用に速度を、finalは配布用に画質とサイズを優先する
+ENCODE_PROFILES = {
+    "draft": EncodeProfile(
+        preset="ultrafast",
+        crf=28,
+        keyframe_interval=1,
+        audio_bitrate="96k",
+        thread_queue_size=8,
+    ),
+    "balanced": EncodeProfile(
+        preset="medium",
+        crf=23,
+        keyframe_interval=5,
+        audio_bitrate="128k",
+        thread_queue_size=32,
+    ),
+    "final": EncodeProfile(
+        preset="slow",
+        crf=18,
+        keyframe_interval=2,
+        audio_bitrate="192k",
+        thread_queue_size=64,
+    ),
+}
+
+
+def get_encode_profile(
+    profile_name: Optional[str] = None,
+    config_path: Optional[str] = None,
+) -> Optional[EncodeProfile]:
+    """
+    名前と設定ファイルからエンコードのプロファイルを取得する。
+
+    Parameters
+    ----------
+    profile_name : Optional[str]
+        プロファイル名。設定ファイルの指定より優先する
+    config_path : Optional[str]
+        設定ファイル(JSON)のパス。"encode_profile"でプロファイル名を、
+        "encode_profiles"で名前ごとの設定の上書きや追加を指定する
+
+    Returns
+    -------
+    encode_profile : Optional[EncodeProfile]
+        プロファイル。指定がない場合はNone
+    """
+
+    profiles = dict(ENCODE_PROFILES)
+    if config_path is not None:
+        with open(config_path, "r") as f:
+            config = json.load(f)
+        field_names = [field.name for field in fields(EncodeProfile)]
+        for name, values in config.get("encode_profiles", {}).items():
+            unknown_keys = set(values) - set(field_names)
+            if len(unknown_keys) > 0:
+                raise ValueError(
+                    "unknown encode profile options: {}".format(
+                        ", ".join(sorted(unknown_keys))
+                    )
+                )
+            profiles[name] = (
+                replace(profiles[name], **values)
+                if name in profiles
+                else EncodeProfile(**values)
+            )
+            max_filter_inputs = profiles[name].max_filter_inputs
+            # 1入力ずつに分けても入力数が減らず、分割が終わらない
+            if max_filter_inputs is not None and max_filter_inputs < 2:
+                raise ValueError("max_filter_inputs must be at least 2")
+        if profile_name is None:
+            profile_name = config.get("encode_profile")
+
+    if profile_name is None:
+        return None
+    if profile_name not in profiles:
+        raise ValueError("unknown encode profile: {}".format(profile_name))
+    return profiles[profile_name]
@@ -0,0 +1,245 @@
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import IO, Any, Callable, Optional
+
+import ffmpeg
+
+# -progressの出力の1行 (frame=123, out_time_us=456789など)
+PROGRESS_LINE_PATTERN = re.compile(r"^\w+=\S*$")
+
+
+@dataclass
+class Progress:
+    frame: int
+    fps: float
+    speed: Optional[float]
+    out_time: float
+    total_time: Optional[float]
+    elapsed_time: float
+    is_end: bool = False
+
+    @property
+    def percent(self) -> Optional[float]:
+        if self.total_time is None or self.total_time <= 0:
+            return None
+        return min(100.0, self.out_time / self.total_time * 100)
+
+    @property
+    def eta(self) -> Optional[float]:
+        if self.total_time is None:
+            return None
+        if self.is_end:
+            return 0.0
+        if self.speed is None or self.speed <= 0:
+            return None
+        return max(0.0, self.total_time - self.out_time) / self.speed
+
+    def to_dict(self) -> dict:
+        return asdict(self) | {"percent": self.percent, "eta": self.eta}
+
+
+ProgressCallback = Callable[[Progress], None]
+
+
+def parse_progress_value(key: str, value: str) -> Any:
+    if value == "N/A":
+        return None
+    match key:
+        case "frame":
+            return int(value)
+        case "fps":
+            return float(value)
+        case "speed":
+            return float(value.rstrip("x"))
+        case "out_time_us" | "out_time_ms":
+            # out_time_msも実際の単位はマイクロ秒
+            return int(value) / 1000000
+        case _:
+            return value
+
+
+class ProgressReader:
+    """
+    ffmpegの-progressの出力を1行ずつ受け取り、区切りごとに進捗を通知する。
+    """
+
+    def __init__(
+        self,
+        total_time: Optional[float],
+        callback: ProgressCallback,
+    ) -> None:
+        self.total_time = total_time
+        self.callback = callback
+        self.values: dict[str, Any] = {}
+        self.start_time = time.monotonic()
+
+    def feed(self, line: str):
+        key, _, value = line.strip().partition("=")
+        if key != "progress":
+            self.values[key] = parse_progress_value(key, value)
+            return
+        self.callback(
+            Progress(
+                frame=self.values.get("frame") or 0,
+                fps=self.values.get("fps") or 0.0,
+                speed=self.values.get("speed"),
+                out_time=max(
+                    0.0,
+                    self.values.get("out_time_us")
+                    or self.values.get("out_time_ms")
+                    or 0.0,
+                ),
+                total_time=self.total_time,
+                elapsed_time=time.monotonic() - self.start_time,
+                is_end=value == "end",
+            )
+        )
+
+
+def get_progress_args(
+    args: list[str], progress_url: str = "pipe:1"
+) -> list[str]:
+    return args[:1] + ["-progress", progress_url, "-nostats"] + args[1:]
+
+
+def run_with_progress(
+    args: list[str],
+    total_time: Optional[float],
+    callback: ProgressCallback,
+    quiet: bool = False,
+    progress_on_stderr: bool = False,
+    capture_stderr: bool = False,
+) -> Optional[str]:
+    """
+    ffmpegの進捗を標準出力から受け取りながら実行する。
+
+    Parameters
+    ----------
+    args : list[str]
+        ffmpegのコマンド引数
+    total_time : Optional[float]
+        出力する動画全体の長さ(秒)
+    callback : ProgressCallback
+        進捗を受け取る関数
+    quiet : bool
+        ffmpegの標準エラー出力を表示しないか
+    progress_on_stderr : bool
+        動画を標準出力に書き出す場合に、進捗を標準エラー出力から受け取るか
+    capture_stderr : bool
+        進捗以外の標準エラー出力を受け取って返すか。quietでなければ表示もする
+
+    Returns
+    -------
+    stderr : Optional[str]
+        capture_stderrの場合は、進捗以外の標準エラー出力
+    """
+
+    reader = ProgressReader(total_time, callback)
+    if progress_on_stderr:
+        popen = subprocess.Popen(
+            get_progress_args(args, "pipe:2"),
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        # 進捗以外のログは、そのまま標準エラー出力に流す
+        stderr_lines = []
+        for line in popen.stderr:
+            if PROGRESS_LINE_PATTERN.match(line):
+                reader.feed(line)
+                continue
+            if quiet or capture_stderr:
+                stderr_lines.append(line)
+            if not quiet:
+                sys.stderr.write(line)
+        popen.wait()
+        if popen.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, "".join(stderr_lines).encode())
+        return "".join(stderr_lines) if capture_stderr else None
+
+    popen = subprocess.Popen(
+        get_progress_args(args),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE if quiet or capture_stderr else None,
+        text=True,
+    )
+    # 標準エラー出力を受け取る場合、詰まらないよう別スレッドで読み出す
+    stderr_lines: list[str] = []
+    stderr_thread = None
+
+    def read_stderr():
+        for line in popen.stderr:
+            stderr_lines.append(line)
+            if not quiet:
+                sys.stderr.write(line)
+
+    if quiet or capture_stderr:
+        stderr_thread = threading.Thread(target=read_stderr, daemon=True)
+        stderr_thread.start()
+
+    for line in popen.stdout:
+        reader.feed(line)
+    popen.wait()
+    if stderr_thread is not None:
+        stderr_thread.join()
+    if popen.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, "".join(stderr_lines).encode())
+    return "".join(stderr_lines) if capture_stderr else None
+
+
+def get_json_lines_callback(stream: IO[str]) -> ProgressCallback:
+    def callback(progress: Progress):
+        stream.write(json.dumps(progress.to_dict()) + "\n")
+        stream.flush()
+
+    return callback
+
+
+class ProgressAggregator:
+    """
+    並列に実行する複数のffmpegの進捗を、1つの出力の進捗としてまとめる。
+    """
+
+    def __init__(
+        self,
+        count: int,
+        total_time: Optional[float],
+        callback: ProgressCallback,
+    ) -> None:
+        self.total_time = total_time
+        self.callback = callback
+        self.progresses: list[Optional[Progress]] = [None] * count
+        self.start_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def get_callback(self, index: int) -> ProgressCallback:
+        def callback(progress: Progress):
+            with self.lock:
+                self.progresses[index] = progress
+                self.callback(self.get_progress())
+
+        return callback
+
+    def finish(self):
+        # 区間を結合し終えてから、出力全体の終了を通知する
+        with self.lock:
+            self.callback(self.get_progress(is_end=True))
+
+    def get_progress(self, is_end: bool = False) -> Progress:
+        progresses = [p for p in self.progresses if p is not None]
+        speeds = [
+            p.speed for p in progresses if not p.is_end and p.speed is not None
+        ]
+        return Progress(
+            frame=sum(p.frame for p in progresses),
+            fps=sum(p.fps for p in progresses if not p.is_end),
+            speed=sum(speeds) if len(speeds) > 0 else None,
+            out_time=sum(p.out_time for p in progresses),
+            total_time=self.total_time,
+            elapsed_time=time.monotonic() - self.start_time,
+            is_end=is_end,
+        )
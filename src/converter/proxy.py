@@ -0,0 +1,196 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+import ffmpeg
+
+from style.main import ffprobe
+from utils import ContextThreadPoolExecutor
+
+from .cache import get_cache_key, get_cache_path, get_file_fingerprint
+from .command import run_process
+
+# 代替の素材の高さの上限
+PROXY_HEIGHT = 540
+# これより画素数の多い映像は、デコードが重いため代替の素材を作る
+HEAVY_SOURCE_PIXELS = 1920 * 1080
+# フレーム間予測が深く、デコードとシークが重いコーデック
+HEAVY_SOURCE_CODECS = ["hevc", "av1", "vp9"]
+# 代替の素材を同時に作るffmpegの数
+PROXY_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+
+
+def get_video_stream(src_path: str) -> Optional[dict]:
+    for stream in ffprobe(src_path).get("streams", []):
+        if stream.get("codec_type") == "video":
+            return stream
+    return None
+
+
+def is_heavy_source(src_path: str) -> bool:
+    # URLのソースは更新を確認できないため、代替の素材を作らない
+    if src_path[:4] == "http":
+        return False
+    stream = get_video_stream(src_path)
+    if stream is None:
+        return False
+    return (
+        stream.get("width", 0) * stream.get("height", 0) > HEAVY_SOURCE_PIXELS
+        or stream.get("codec_name") in HEAVY_SOURCE_CODECS
+    )
+
+
+def get_proxy_path(src_path: str) -> str:
+    key = get_cache_key(get_file_fingerprint(src_path), PROXY_HEIGHT)
+    return get_cache_path("proxy", key, "mkv")
+
+
+def write_proxy(src_path: str, proxy_path: str):
+    """
+    ソースを、全てのフレームをキーフレームにした低解像度の映像に変換する。
+
+    時刻をそのまま置き換えられるよう、fpsと長さは変えず、音声は無劣化で保つ。
+
+    Parameters
+    ----------
+    src_path : str
+        元のソースのパス
+    proxy_path : str
+        代替の素材を書き出すパス
+    """
+
+    stream = get_video_stream(src_path)
+    assert stream is not None
+    has_audio = any(
+        audio_stream.get("codec_type") == "audio"
+        for audio_stream in ffprobe(src_path).get("streams", [])
+    )
+    fd, temp_path = tempfile.mkstemp(
+        suffix=".mkv", dir=os.path.dirname(proxy_path)
+    )
+    os.close(fd)
+    try:
+        source = ffmpeg.input(src_path)
+        outputs = [
+            source.video.filter(
+                "scale", -2, min(stream.get("height", 0), PROXY_HEIGHT)
+            )
+        ]
+        option = {
+            "vcodec": "libx264",
+            "preset": "ultrafast",
+            "crf": 20,
+            "g": 1,
+            "pix_fmt": "yuv420p",
+        }
+        if has_audio:
+            outputs.append(source.audio)
+            option |= {"acodec": "pcm_s16le"}
+        run_process(
+            ffmpeg.output(*outputs, temp_path, **option),
+            overwrite=True,
+            quiet=True,
+        )
+        os.replace(temp_path, proxy_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class ProxyManager:
+    """
+    重いソースの代替の素材を、変換と並行してバックグラウンドで作る。
+
+    作成はffmpegのプロセスで行い、スレッドはその終了を待つだけのため、
+    描画中のグラフの組み立てや書き出しを妨げない。
+    """
+
+    def __init__(self, workers: int = PROXY_WORKERS):
+        # 依頼した描画のRenderContextと計測を、作成するスレッドに引き継ぐ
+        self.executor = ContextThreadPoolExecutor(max_workers=workers)
+        self.futures: dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    def request(self, src_path: str):
+        if not is_heavy_source(src_path):
+            return
+        proxy_path = get_proxy_path(src_path)
+        with self.lock:
+            if proxy_path in self.futures or os.path.exists(proxy_path):
+                return
+            self.futures[proxy_path] = self.executor.submit(
+                write_proxy, src_path, proxy_path
+            )
+
+    def get_source_path(self, src_path: str) -> str:
+        """
+        作成済みの代替の素材があればそのパスを、無ければ元のパスを返す。
+
+        Parameters
+        ----------
+        src_path : str
+            元のソースのパス
+
+        Returns
+        -------
+        source_path : str
+            描画に使うソースのパス
+        """
+
+        if not is_heavy_source(src_path):
+            return src_path
+        proxy_path = get_proxy_path(src_path)
+        if os.path.exists(proxy_path):
+            return proxy_path
+        # 作成を待たずに元のソースで描画し、次回以降の描画で使う
+        self.request(src_path)
+        return src_path
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+current_proxy_manager: ContextVar[Optional[ProxyManager]] = ContextVar(
+    "current_proxy_manager", default=None
+)
+
+
+@contextmanager
+def use_proxy_manager(
+    proxy_manager: Optional[ProxyManager] = None,
+) -> Iterator[ProxyManager]:
+    """
+    with文の間、確認用の描画で重いソースを代替の素材に置き換える。
+
+    with文を抜ける際は、作成中の代替の素材の書き出しを待つ。
+
+    Parameters
+    ----------
+    proxy_manager : Optional[ProxyManager]
+        使うマネージャ。Noneの場合は新たに作る
+
+    Yields
+    ------
+    proxy_manager : ProxyManager
+        with文の間に使うマネージャ
+    """
+
+    if proxy_manager is None:
+        proxy_manager = ProxyManager()
+    token = current_proxy_manager.set(proxy_manager)
+    try:
+        yield proxy_manager
+    finally:
+        current_proxy_manager.reset(token)
+        proxy_manager.shutdown()
+
+
+def get_proxy_source(src_path: str) -> str:
+    proxy_manager = current_proxy_manager.get()
+    if proxy_manager is None:
+        return src_path
+    return proxy_manager.get_source_path(src_path)
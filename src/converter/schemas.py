@@ -1,6 +1,8 @@
 from dataclasses import dataclass
-from typing import Any
+from fractions import Fraction
+from typing import Any, Optional
 
+from content import VSMLContent
 from style import Style
 
 
@@ -9,3 +11,21 @@ class Process:
     video: Any
     audio: Any
     style: Style
+
+
+@dataclass
+class SourceInstance:
+    video: Any
+    audio: Any
+    timeline_start: Optional[Fraction]
+    use_count: int = 0
+
+
+@dataclass
+class Segment:
+    items: list[VSMLContent]
+    offsets: list[Fraction]
+    start: Fraction
+    end: Fraction
+    is_first: bool
+    is_last: bool
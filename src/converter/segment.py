@@ -0,0 +1,419 @@
+import os
+import sys
+import tempfile
+from fractions import Fraction
+from typing import Any, Optional
+
+import ffmpeg
+
+from content import WrapContent
+from profiler import profile_stage
+from style import Order, Style, TimeValue
+from utils import ContextThreadPoolExecutor, VSMLManager
+
+from .command import (
+    compile_command,
+    get_filter_script_path,
+    run_command,
+    run_process,
+)
+from .ffmpeg import (
+    concat_filter,
+    get_background_color_code,
+    get_background_process,
+    get_silent_process,
+    object_length_filter,
+    output_fps_filter,
+    set_background_filter,
+    time_space_end_filter,
+    time_space_start_filter,
+)
+from .profile import EncodeProfile
+from .progress import ProgressAggregator, ProgressCallback, run_with_progress
+from .schemas import Process, Segment
+from .wrap import get_child_offsets, is_caption_sequence
+
+# 分割した動画を無劣化で結合するため、音声の形式を揃える
+SEGMENT_AUDIO_SAMPLE_RATE = 48000
+
+
+def snap_to_frame(second: Fraction, frame_rate: Fraction) -> Fraction:
+    return Fraction(round(second * frame_rate)) / frame_rate
+
+
+def split_segments(
+    vsml_content: WrapContent,
+    jobs: int,
+) -> Optional[list[Segment]]:
+    """
+    ルートのseqの子要素の境界で時間軸を分割し、並列に描画できる区間を求める。
+
+    Parameters
+    ----------
+    vsml_content : WrapContent
+        ルートの要素
+    jobs : int
+        分割数の目安
+
+    Returns
+    -------
+    segments : Optional[list[Segment]]
+        分割した区間。分割できない構造の場合はNone
+    """
+
+    style = vsml_content.style
+    if (
+        style.order != Order.SEQUENCE
+        or not style.object_length.has_specific_value()
+        or len(vsml_content.items) < 2
+        # 字幕にまとめるseqは1つのフィルタで描画するため、分割しない
+        or is_caption_sequence(vsml_content)
+    ):
+        return None
+    for item in vsml_content.items:
+        # FITな子要素は後続の時間を埋めるため、区間に閉じない
+        if item.style.object_length.is_fit():
+            return None
+
+    # 時刻はルートの余白を除いた始まりを0とする
+    offsets = get_child_offsets(vsml_content, Fraction(0))
+    ends = [
+        offset + item.style.get_object_length_with_padding().get_fraction()
+        for item, offset in zip(vsml_content.items, offsets)
+    ]
+    inner_end = (
+        style.time_padding_start.get_fraction()
+        + style.object_length.get_fraction()
+    )
+    if max(ends) > inner_end:
+        return None
+    whole_end = inner_end + style.time_padding_end.get_fraction()
+
+    margin_start = style.time_margin_start.get_fraction()
+    frame_rate = VSMLManager.get_output_frame_rate()
+    segments = []
+    segment_start = Fraction(0)
+    first_index = 0
+    for index in range(len(vsml_content.items) - 1):
+        target = whole_end * (len(segments) + 1) / jobs
+        if ends[index] < target or len(segments) + 1 == jobs:
+            continue
+        # 区間ごとに丸められたフレーム数の誤差が結合後に残らないよう、
+        # 切れ目は出力するフレームの境界に揃える
+        cut = (
+            snap_to_frame(margin_start + ends[index], frame_rate)
+            - margin_start
+        )
+        if cut <= segment_start or cut >= whole_end:
+            continue
+        segments.append(
+            Segment(
+                vsml_content.items[first_index : index + 1],
+                offsets[first_index : index + 1],
+                segment_start,
+                cut,
+                len(segments) == 0,
+                False,
+            )
+        )
+        segment_start = cut
+        first_index = index + 1
+    segments.append(
+        Segment(
+            vsml_content.items[first_index:],
+            offsets[first_index:],
+            segment_start,
+            whole_end,
+            len(segments) == 0,
+            True,
+        )
+    )
+    if len(segments) < 2:
+        return None
+    return segments
+
+
+def segment_trim_filter(
+    segment: Segment,
+    origin: Fraction,
+    video_process: Optional[Any] = None,
+    audio_process: Optional[Any] = None,
+) -> tuple[Any, Any]:
+    # 前後の区間と重なる部分を切り取り、区間の長さちょうどにする
+    duration = float(segment.end - segment.start)
+    if video_process is not None:
+        # 切れ目との差は半フレーム未満のため、切れ目の時点で表示している
+        # 先頭のフレームは残し、長さのみ揃える
+        video_process = ffmpeg.trim(video_process, duration=duration)
+    if audio_process is not None:
+        audio_process = ffmpeg.filter(
+            audio_process,
+            "atrim",
+            start=float(segment.start - origin),
+            duration=duration,
+        ).filter("asetpts", "PTS-STARTPTS")
+    return video_process, audio_process
+
+
+def create_segment_process(
+    child_processes: list[Process],
+    segment: Segment,
+    style: Style,
+    exist_video: bool,
+    exist_audio: bool,
+) -> Process:
+    background_color_code = get_background_color_code(style.background_color)
+    segment_length = TimeValue("{}s".format(segment.end - segment.start))
+
+    # 切れ目をフレームの境界に揃えたため、先頭の要素は区間の前から始まりうる
+    origin = min(segment.start, segment.offsets[0])
+    video_processes = []
+    audio_processes = []
+    video_time = origin
+    audio_time = origin
+    for child_process, offset in zip(child_processes, segment.offsets):
+        child_style = child_process.style
+        end = (
+            offset
+            + child_style.get_object_length_with_padding().get_fraction()
+        )
+        # 直前の映像・音声の終わりからの時間を余白として付ける
+        if child_process.video is not None:
+            child_process.video = set_background_filter(
+                width=style.get_width_with_padding(),
+                height=style.get_height_with_padding(),
+                background_color=style.background_color,
+                video_process=child_process.video,
+                fit_video_process=True,
+            )
+            if offset > video_time:
+                child_process.video, _ = time_space_start_filter(
+                    TimeValue("{}s".format(offset - video_time)),
+                    background_color_code,
+                    video_process=child_process.video,
+                )
+            video_processes.append(child_process.video)
+            video_time = end
+        if child_process.audio is not None:
+            if offset > audio_time:
+                _, child_process.audio = time_space_start_filter(
+                    TimeValue("{}s".format(offset - audio_time)),
+                    audio_process=child_process.audio,
+                )
+            audio_processes.append(child_process.audio)
+            audio_time = end
+
+    video_process = None
+    if len(video_processes) > 0:
+        video_process = concat_filter(video_processes, is_video=True)
+        if segment.end > video_time:
+            video_process, _ = time_space_end_filter(
+                TimeValue("{}s".format(segment.end - video_time)),
+                background_color_code,
+                video_process=video_process,
+            )
+        if origin < segment.start or video_time > segment.end:
+            video_process, _ = segment_trim_filter(
+                segment, origin, video_process=video_process
+            )
+    elif exist_video:
+        # 区間内に映像が無い場合も、結合のために背景のみの映像を作る
+        video_process, _ = object_length_filter(
+            segment_length,
+            video_process=get_background_process(
+                "{}x{}".format(
+                    style.get_width_with_padding().get_pixel(),
+                    style.get_height_with_padding().get_pixel(),
+                ),
+                style.background_color,
+            ),
+        )
+    audio_process = None
+    if len(audio_processes) > 0:
+        audio_process = concat_filter(audio_processes, is_video=False)
+        if segment.end > audio_time:
+            _, audio_process = time_space_end_filter(
+                TimeValue("{}s".format(segment.end - audio_time)),
+                audio_process=audio_process,
+            )
+        if origin < segment.start or audio_time > segment.end:
+            _, audio_process = segment_trim_filter(
+                segment, origin, audio_process=audio_process
+            )
+    elif exist_audio:
+        audio_process = get_silent_process(segment_length.get_second())
+
+    if video_process is not None:
+        video_process = set_background_filter(
+            background_color=style.background_color,
+            resolution_text=VSMLManager.get_root_resolution().get_str(),
+            video_process=video_process,
+            fit_video_process=True,
+        )
+    if audio_process is not None:
+        audio_process = ffmpeg.filter(
+            audio_process,
+            "aformat",
+            sample_rates=SEGMENT_AUDIO_SAMPLE_RATE,
+            channel_layouts="stereo",
+        )
+    if segment.is_first:
+        video_process, audio_process = time_space_start_filter(
+            style.time_margin_start,
+            video_process=video_process,
+            audio_process=audio_process,
+        )
+    if segment.is_last:
+        video_process, audio_process = time_space_end_filter(
+            style.time_margin_end,
+            video_process=video_process,
+            audio_process=audio_process,
+        )
+
+    return Process(video_process, audio_process, style)
+
+
+def run_segment_process(
+    process: Any,
+    progress_callback: Optional[ProgressCallback] = None,
+    debug_mode: bool = False,
+):
+    with compile_command(process, True, debug_mode) as args:
+        if debug_mode:
+            # 標準出力に書き出す進捗に混ざらないよう、標準エラー出力に表示する
+            print(
+                "\n[[[command args]]]\n{}\n[[[filter script]]]\n{}".format(
+                    args, get_filter_script_path(args)
+                ),
+                file=sys.stderr,
+            )
+        if progress_callback is None:
+            run_command(args, quiet=True)
+        else:
+            run_with_progress(args, None, progress_callback, quiet=True)
+
+
+def export_segments(
+    processes: list[Process],
+    out_filename: str,
+    debug_mode: bool,
+    overwrite: bool,
+    jobs: int,
+    encode_profile: Optional[EncodeProfile] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+    total_time: Optional[float] = None,
+):
+    """
+    区間ごとの動画を並列に出力し、再エンコードせずに結合する。
+
+    Parameters
+    ----------
+    processes : list[Process]
+        区間ごとのプロセス
+    out_filename : str
+        出力先のパス
+    debug_mode : bool
+        デバッグモード
+    overwrite : bool
+        出力先の上書きを許可するか
+    jobs : int
+        同時に実行するffmpegの数
+    encode_profile : Optional[EncodeProfile]
+        全ての区間で共通して使うエンコードのプロファイル
+    progress_callback : Optional[ProgressCallback]
+        区間全体をまとめた進捗を受け取る関数
+    total_time : Optional[float]
+        出力する動画全体の長さ(秒)
+    """
+
+    video_option = {}
+    audio_option = {}
+    global_args = []
+    if encode_profile is not None:
+        video_option = encode_profile.get_output_option(
+            VSMLManager.get_output_fps()
+        )
+        audio_option = {"audio_bitrate": video_option.pop("audio_bitrate")}
+        global_args = encode_profile.get_global_args()
+
+    if not overwrite and os.path.exists(out_filename):
+        raise FileExistsError(out_filename)
+
+    extension = os.path.splitext(out_filename)[1]
+    out_dir = os.path.dirname(os.path.abspath(out_filename))
+    with tempfile.TemporaryDirectory(dir=out_dir) as segment_dir:
+        video_paths = []
+        audio_paths = []
+        output_processes = []
+        for index, process in enumerate(processes):
+            outputs = []
+            if process.video is not None:
+                video_path = os.path.join(
+                    segment_dir, "video{}{}".format(index, extension)
+                )
+                outputs.append(
+                    ffmpeg.output(
+                        output_fps_filter(process.video),
+                        video_path,
+                        r=VSMLManager.get_output_fps(),
+                        pix_fmt="yuv420p",
+                        **video_option,
+                    )
+                )
+                video_paths.append(video_path)
+            if process.audio is not None:
+                # AACの先頭の無音が継ぎ目に入らないよう、音声は無圧縮で書き出す
+                audio_path = os.path.join(
+                    segment_dir, "audio{}.wav".format(index)
+                )
+                outputs.append(ffmpeg.output(process.audio, audio_path))
+                audio_paths.append(audio_path)
+            output_processes.append(
+                ffmpeg.merge_outputs(*outputs).global_args(*global_args)
+            )
+
+        progress_callbacks: list[Optional[ProgressCallback]] = [None] * len(
+            output_processes
+        )
+        aggregator = None
+        if progress_callback is not None:
+            aggregator = ProgressAggregator(
+                len(output_processes), total_time, progress_callback
+            )
+            progress_callbacks = [
+                aggregator.get_callback(index)
+                for index in range(len(output_processes))
+            ]
+        # 区間のffmpegの実行も、呼び出し元の描画の設定と計測を引き継ぐ
+        with profile_stage("encode"), ContextThreadPoolExecutor(
+            max_workers=jobs
+        ) as executor:
+            # 例外を呼び出し元に伝えるため、結果を取り出す
+            list(
+                executor.map(
+                    run_segment_process,
+                    output_processes,
+                    progress_callbacks,
+                    [debug_mode] * len(output_processes),
+                )
+            )
+
+        inputs = []
+        for name, paths in [("video", video_paths), ("audio", audio_paths)]:
+            if len(paths) == 0:
+                continue
+            list_path = os.path.join(segment_dir, "{}.txt".format(name))
+            with open(list_path, "w") as f:
+                for path in paths:
+                    f.write("file '{}'\n".format(path))
+            inputs.append(ffmpeg.input(list_path, f="concat", safe=0))
+        # 映像は再エンコードせずに結合し、音声のみまとめてエンコードする
+        option = audio_option | (
+            {"c:v": "copy"} if len(video_paths) > 0 else {}
+        )
+        with profile_stage("concat"):
+            run_process(
+                ffmpeg.output(*inputs, out_filename, **option), overwrite
+            )
+        if aggregator is not None:
+            aggregator.finish()
@@ -0,0 +1,272 @@
+import os
+import tempfile
+from typing import Any, Iterator, Optional
+
+import ffmpeg
+from PIL import Image, ImageDraw
+
+from content import SourceContent, VSMLContent, WrapContent
+from profiler import profile_stage
+from style import Color
+from style.utils import get_truetype_font
+from utils import ContextThreadPoolExecutor, SourceType
+
+from .cache import get_cache_key, get_cache_path, get_file_fingerprint
+from .command import run_process
+from .ffmpeg import get_text_process, set_background_filter, source_size_filter
+from .wrap import is_caption_sequence
+
+# 静止画を並列に描画するスレッドの数
+STILL_RENDER_WORKERS = os.cpu_count() or 1
+# drawtextでフォントの大きさを指定しない場合の既定値
+DRAWTEXT_FONT_SIZE = 16
+
+
+def get_still_key(vsml_content: SourceContent) -> str:
+    style = vsml_content.style
+    match vsml_content.type:
+        case SourceType.IMAGE:
+            return get_cache_key(
+                vsml_content.type.name,
+                get_file_fingerprint(vsml_content.src_path),
+                style.width,
+                style.height,
+                style.get_width_with_padding(),
+                style.get_height_with_padding(),
+                style.padding_left,
+                style.padding_top,
+                style.background_color,
+            )
+        case SourceType.TEXT:
+            return get_cache_key(
+                vsml_content.type.name,
+                vsml_content.src_path,
+                style.get_width_with_padding(),
+                style.get_height_with_padding(),
+                style.padding_left,
+                style.padding_top,
+                style.background_color,
+                style.using_font_path,
+                style.font_size,
+                style.font_color,
+                style.font_border_color,
+                style.font_border_width,
+            )
+        case _:
+            raise Exception()
+
+
+def create_still_process(vsml_content: SourceContent) -> Any:
+    style = vsml_content.style
+    match vsml_content.type:
+        case SourceType.IMAGE:
+            video_process = ffmpeg.input(vsml_content.src_path).video.filter(
+                "setsar", "1/1"
+            )
+            video_process = source_size_filter(style, video_process)
+            if (
+                style.padding_top.is_zero_over()
+                or style.padding_left.is_zero_over()
+            ):
+                video_process = set_background_filter(
+                    width=style.get_width_with_padding(),
+                    height=style.get_height_with_padding(),
+                    background_color=style.background_color,
+                    video_process=video_process,
+                    position_x=style.padding_left,
+                    position_y=style.padding_top,
+                    fit_video_process=True,
+                    use_cache=False,
+                )
+        case SourceType.TEXT:
+            video_process = get_text_process(
+                vsml_content.src_path,
+                style.get_width_with_padding(),
+                style.get_height_with_padding(),
+                style.padding_left,
+                style.padding_top,
+                style.background_color,
+                style.using_font_path,
+                style.font_size,
+                style.font_color,
+                style.font_border_color,
+                style.font_border_width,
+                use_cache=False,
+            )
+        case _:
+            raise Exception()
+    return video_process
+
+
+def get_color_tuple(
+    color: Optional[Color], default_color: tuple[int, int, int, int]
+) -> tuple[int, int, int, int]:
+    if color is None:
+        return default_color
+    return (color.r_value, color.g_value, color.b_value, color.a_value)
+
+
+def draw_text(vsml_content: SourceContent) -> Optional[Image.Image]:
+    """
+    テキストの要素をdrawtextと同じ配置でPillowを使って描画する。
+
+    Parameters
+    ----------
+    vsml_content : SourceContent
+        テキストの要素
+
+    Returns
+    -------
+    image : Optional[Image.Image]
+        描画した透過画像。フォントのファイルが無い、もしくは読み込めない場合はNone
+    """
+
+    style = vsml_content.style
+    if style.using_font_path is None:
+        return None
+    font_size = (
+        style.font_size.get_pixel()
+        if style.font_size is not None
+        else DRAWTEXT_FONT_SIZE
+    )
+    try:
+        font = get_truetype_font(style.using_font_path, font_size)
+    except OSError:
+        return None
+
+    image = Image.new(
+        "RGBA",
+        (
+            style.get_width_with_padding().get_pixel(),
+            style.get_height_with_padding().get_pixel(),
+        ),
+        get_color_tuple(style.background_color, (0, 0, 0, 0)),
+    )
+    draw = ImageDraw.Draw(image)
+    lines = vsml_content.src_path.split("\n")
+    x = style.padding_left.get_pixel()
+    y = style.padding_top.get_pixel()
+    border_width = style.font_border_width
+    if border_width is not None:
+        x += border_width
+        if len(lines) == 1:
+            y += border_width
+    # drawtextと同様に、全ての行で最も高い字形の上端をyに揃え、行の高さも揃える
+    boxes = [font.getbbox(line, anchor="ls") for line in lines]
+    top = min(box[1] for box in boxes)
+    line_height = max(box[3] for box in boxes) - top
+    for index, line in enumerate(lines):
+        draw.text(
+            (x, y - top + index * line_height),
+            line,
+            font=font,
+            anchor="ls",
+            fill=get_color_tuple(style.font_color, (0, 0, 0, 255)),
+            stroke_width=border_width or 0,
+            stroke_fill=get_color_tuple(
+                style.font_border_color, (0, 0, 0, 255)
+            ),
+        )
+    return image
+
+
+def write_still(vsml_content: SourceContent, still_path: str):
+    fd, temp_path = tempfile.mkstemp(
+        suffix=".png", dir=os.path.dirname(still_path)
+    )
+    os.close(fd)
+    try:
+        image = (
+            draw_text(vsml_content)
+            if vsml_content.type == SourceType.TEXT
+            else None
+        )
+        if image is not None:
+            image.save(temp_path)
+        else:
+            run_process(
+                ffmpeg.output(
+                    create_still_process(vsml_content),
+                    temp_path,
+                    vframes=1,
+                    pix_fmt="rgba",
+                ),
+                overwrite=True,
+                quiet=True,
+            )
+        os.replace(temp_path, still_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def render_still(vsml_content: SourceContent) -> str:
+    """
+    画像やテキストなど時間で変化しない要素を1フレームだけ描画し、キャッシュしたパスを返す。
+
+    テキストはPillowで描画し、フォントを読み込めない場合のみffmpegのdrawtextを使う。
+
+    Parameters
+    ----------
+    vsml_content : SourceContent
+        画像もしくはテキストの要素
+
+    Returns
+    -------
+    still_path : str
+        スタイルを適用して描画した透過PNGのパス
+    """
+
+    still_path = get_cache_path("still", get_still_key(vsml_content), "png")
+    if not os.path.exists(still_path):
+        with profile_stage("still_render"):
+            write_still(vsml_content, still_path)
+    return still_path
+
+
+def get_still_contents(vsml_content: VSMLContent) -> Iterator[SourceContent]:
+    if isinstance(vsml_content, WrapContent):
+        # 字幕にまとめるseqの文字は静止画として描画しない
+        if is_caption_sequence(vsml_content):
+            return
+        for item in vsml_content.items:
+            yield from get_still_contents(item)
+    elif isinstance(vsml_content, SourceContent) and vsml_content.type in [
+        SourceType.IMAGE,
+        SourceType.TEXT,
+    ]:
+        yield vsml_content
+
+
+def prerender_stills(vsml_content: VSMLContent):
+    """
+    キャッシュに無い静止画を、グラフを組み立てる前にスレッドでまとめて描画する。
+
+    Parameters
+    ----------
+    vsml_content : VSMLContent
+        描画する要素を探すルートの要素
+    """
+
+    still_contents: dict[str, SourceContent] = {}
+    for still_content in get_still_contents(vsml_content):
+        still_path = get_cache_path(
+            "still", get_still_key(still_content), "png"
+        )
+        if not os.path.exists(still_path):
+            still_contents.setdefault(still_path, still_content)
+    if len(still_contents) == 0:
+        return
+    # 縮小描画の大きさはRenderContextで決まるため、ワーカーに引き継ぐ
+    with (
+        profile_stage("still_render"),
+        ContextThreadPoolExecutor(
+            max_workers=STILL_RENDER_WORKERS
+        ) as executor,
+    ):
+        # 例外を呼び出し元に伝えるため、結果を取り出す
+        list(
+            executor.map(
+                write_still, still_contents.values(), still_contents.keys()
+            )
+        )
@@ -1 +1,2 @@
-from .main import create_wrap_process
+from .caption import create_caption_process, is_caption_sequence
+from .main import create_wrap_process, get_child_offsets
@@ -0,0 +1,320 @@
+import os
+import subprocess
+import tempfile
+from fractions import Fraction
+from functools import lru_cache
+from typing import Optional
+
+import ffmpeg
+from matplotlib import font_manager
+
+from content import SourceContent, VSMLContent, WrapContent
+from converter.cache import get_cache_key, get_cache_path
+from converter.ffmpeg import get_background_process, object_length_filter
+from converter.schemas import Process
+from profiler import profiled
+from style import Color, Order, TimeValue
+from style.utils import get_truetype_font
+from utils import SourceType
+
+from .main import set_time_padding_filter
+
+# 1つの字幕にまとめる文字の数の下限。少ない場合は個別に描画した方が速い
+CAPTION_MIN_ITEMS = 8
+# ASSで制御文字として解釈される文字を含む文字列はまとめない
+ASS_SPECIAL_CHARACTERS = ["{", "}", "\\", "\n"]
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 2
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, \
+OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, \
+ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, \
+MarginR, MarginV, Encoding
+Style: Caption,{font_name},{font_size},{font_color},{font_color},\
+{border_color},&H00000000,{bold},{italic},0,0,100,100,0,0,1,{border_width},\
+0,7,0,0,0,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, \
+Text
+"""
+ASS_EVENT = (
+    "Dialogue: 0,{start},{end},Caption,,0,0,0,,{{\\pos({x},{y})}}{text}\n"
+)
+
+
+def get_caption_style(vsml_content: SourceContent) -> tuple:
+    style = vsml_content.style
+    return (
+        style.using_font_path,
+        style.font_size.get_pixel() if style.font_size is not None else None,
+        style.font_color.value if style.font_color is not None else None,
+        (
+            style.font_border_color.value
+            if style.font_border_color is not None
+            else None
+        ),
+        style.font_border_width,
+    )
+
+
+@lru_cache(maxsize=1)
+@profiled("ffmpeg_filter_probe")
+def is_alpha_caption_supported() -> bool:
+    # assフィルタで透過を扱うalphaオプションはFFmpeg 5.0以降にしか無い
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-h", "filter=ass"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except OSError:
+        return False
+    return "alpha" in result.stdout
+
+
+def is_caption_item(vsml_content: VSMLContent) -> bool:
+    if not (
+        isinstance(vsml_content, SourceContent)
+        and vsml_content.type == SourceType.TEXT
+    ):
+        return False
+    style = vsml_content.style
+    return (
+        style.using_font_path is not None
+        and style.background_color is None
+        and style.object_length.has_specific_value()
+        and not any(
+            character in vsml_content.src_path
+            for character in ASS_SPECIAL_CHARACTERS
+        )
+    )
+
+
+def is_caption_sequence(vsml_content: VSMLContent) -> bool:
+    """
+    同じスタイルの1行の文字だけが並ぶseqかどうかを判定する。
+
+    背景色のある文字や複数行の文字は字幕で同じ見た目にできないため、
+    1つでも含む場合は子要素ごとに描画する。
+
+    Parameters
+    ----------
+    vsml_content : VSMLContent
+        判定する要素
+
+    Returns
+    -------
+    is_caption : bool
+        1つの字幕としてまとめて描画できる場合はTrue
+    """
+
+    if not (
+        isinstance(vsml_content, WrapContent)
+        and vsml_content.style.order == Order.SEQUENCE
+        and vsml_content.style.object_length.has_specific_value()
+        and len(vsml_content.items) >= CAPTION_MIN_ITEMS
+    ):
+        return False
+    if not all(is_caption_item(item) for item in vsml_content.items):
+        return False
+    caption_styles = {
+        get_caption_style(item)
+        for item in vsml_content.items
+        if isinstance(item, SourceContent)
+    }
+    return len(caption_styles) == 1 and is_alpha_caption_supported()
+
+
+def get_ass_time(second: Fraction) -> str:
+    centisecond = round(second * 100)
+    return "{}:{:02}:{:02}.{:02}".format(
+        centisecond // 360000,
+        centisecond // 6000 % 60,
+        centisecond // 100 % 60,
+        centisecond % 100,
+    )
+
+
+def get_ass_color(
+    color: Optional[Color], default_color: tuple[int, int, int, int]
+) -> str:
+    r, g, b, a = (
+        (color.r_value, color.g_value, color.b_value, color.a_value)
+        if color is not None
+        else default_color
+    )
+    # ASSは&HAABBGGRRの形式で、透明度が0で不透明になる
+    return "&H{:02X}{:02X}{:02X}{:02X}".format(255 - a, b, g, r)
+
+
+def get_caption_text(vsml_content: WrapContent) -> str:
+    """
+    seqの子要素の文字を、drawtextと同じ時刻と位置に表示するASSの字幕にする。
+
+    ASSのフォントの大きさはOS/2テーブルのwinAscentとwinDescentの和を
+    基準にするため、ピクセルの大きさをその比率で変換する。位置は
+    drawtextと同様に、字形の上端をパディングの位置に揃える。
+
+    Parameters
+    ----------
+    vsml_content : WrapContent
+        is_caption_sequenceを満たすseqの要素
+
+    Returns
+    -------
+    caption_text : str
+        ASSの字幕ファイルの内容
+    """
+
+    style = vsml_content.style
+    first_item = vsml_content.items[0]
+    assert isinstance(first_item, SourceContent)
+    item_style = first_item.style
+    font_path = item_style.using_font_path
+    assert font_path is not None
+    pixel_size = (
+        item_style.font_size.get_pixel()
+        if item_style.font_size is not None
+        else 16
+    )
+    font_info = font_manager.get_font(font_path)
+    os2_table = font_info.get_sfnt_table("OS/2")
+    font_height = (
+        os2_table["usWinAscent"] + os2_table["usWinDescent"]
+        if os2_table is not None
+        else font_info.ascender - font_info.descender
+    )
+    ascender = font_info.ascender * pixel_size / font_info.units_per_EM
+    font = get_truetype_font(font_path, pixel_size)
+    style_name = font_info.style_name.lower()
+    border_width = item_style.font_border_width or 0
+
+    caption_text = ASS_HEADER.format(
+        width=style.get_width_with_padding().get_pixel(),
+        height=style.get_height_with_padding().get_pixel(),
+        font_name=font_info.family_name,
+        font_size=round(pixel_size * font_height / font_info.units_per_EM, 3),
+        font_color=get_ass_color(item_style.font_color, (0, 0, 0, 255)),
+        border_color=get_ass_color(
+            item_style.font_border_color, (0, 0, 0, 255)
+        ),
+        bold=-1 if "bold" in style_name else 0,
+        italic=-1 if "italic" in style_name or "oblique" in style_name else 0,
+        border_width=border_width,
+    )
+    # create_sequence_processと同じ規則で、子要素が表示される時刻を求める
+    current_time = TimeValue("0")
+    previous_time_margin = TimeValue("0")
+    for item in vsml_content.items:
+        assert isinstance(item, SourceContent)
+        item_style = item.style
+        current_time += max(previous_time_margin, item_style.time_margin_start)
+        start_time = current_time + item_style.time_padding_start
+        end_time = start_time + item_style.get_object_length()
+        top = font.getbbox(item.src_path, anchor="ls")[1]
+        caption_text += ASS_EVENT.format(
+            start=get_ass_time(start_time.get_fraction()),
+            end=get_ass_time(end_time.get_fraction()),
+            x=item_style.padding_left.get_pixel() + border_width,
+            y=round(
+                item_style.padding_top.get_pixel()
+                + border_width
+                - top
+                - ascender,
+                3,
+            ),
+            text=item.src_path,
+        )
+        current_time += item_style.get_object_length_with_padding()
+        previous_time_margin = item_style.time_margin_end
+    return caption_text
+
+
+def get_caption_length(vsml_content: WrapContent) -> TimeValue:
+    current_time = TimeValue("0")
+    previous_time_margin = TimeValue("0")
+    for item in vsml_content.items:
+        item_style = item.style
+        current_time += max(previous_time_margin, item_style.time_margin_start)
+        current_time += item_style.get_object_length_with_padding()
+        previous_time_margin = item_style.time_margin_end
+    return current_time + previous_time_margin
+
+
+def write_caption(caption_text: str) -> str:
+    caption_path = get_cache_path(
+        "caption", get_cache_key(caption_text), "ass"
+    )
+    if os.path.exists(caption_path):
+        return caption_path
+    fd, temp_path = tempfile.mkstemp(
+        suffix=".ass", dir=os.path.dirname(caption_path)
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(caption_text)
+        os.replace(temp_path, caption_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return caption_path
+
+
+def create_caption_process(
+    vsml_content: WrapContent,
+    debug_mode: bool = False,
+) -> Process:
+    """
+    同じスタイルの文字が並ぶseqを、1つのASSの字幕を焼き込んだ映像にする。
+
+    子要素ごとの描画、背景、余白、連結のフィルタを作らないため、
+    字幕の数に関わらずグラフのノードの数は一定になる。
+
+    Parameters
+    ----------
+    vsml_content : WrapContent
+        is_caption_sequenceを満たすseqの要素
+    debug_mode : bool
+        デバッグモード
+
+    Returns
+    -------
+    process : Process
+        字幕を焼き込んだ映像のプロセス
+    """
+
+    style = vsml_content.style
+    first_item = vsml_content.items[0]
+    assert isinstance(first_item, SourceContent)
+    font_path = first_item.style.using_font_path
+    assert font_path is not None
+
+    caption_path = write_caption(get_caption_text(vsml_content))
+    video_process = get_background_process(
+        "{}x{}".format(
+            style.get_width_with_padding().get_pixel(),
+            style.get_height_with_padding().get_pixel(),
+        ),
+        style.background_color,
+    )
+    video_process = ffmpeg.trim(
+        video_process, end=get_caption_length(vsml_content).get_second()
+    )
+    video_process = ffmpeg.filter(
+        video_process,
+        "ass",
+        filename=caption_path,
+        fontsdir=os.path.dirname(font_path),
+        alpha=1,
+    )
+    video_process, _ = object_length_filter(
+        style.object_length, video_process=video_process
+    )
+    return set_time_padding_filter(Process(video_process, None, style))
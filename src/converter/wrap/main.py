@@ -1,3 +1,5 @@
+from fractions import Fraction
+
 from content import WrapContent
 from converter.ffmpeg import (
     get_background_color_code,
@@ -5,7 +7,7 @@ from converter.ffmpeg import (
     time_space_start_filter,
 )
 from converter.schemas import Process
-from style import Order
+from style import Order, TimeValue
 
 from .parallel import create_parallel_process
 from .sequence import create_sequence_process
@@ -28,7 +30,11 @@ def create_wrap_process(
         case _:
             raise Exception()
 
-    style = vsml_content.style
+    return set_time_padding_filter(process)
+
+
+def set_time_padding_filter(process: Process) -> Process:
+    style = process.style
     background_color_code = get_background_color_code(style.background_color)
     process.video, process.audio = time_space_start_filter(
         style.time_padding_start,
@@ -45,3 +51,50 @@ def create_wrap_process(
         )
 
     return process
+
+
+def get_child_offsets(
+    vsml_content: WrapContent,
+    offset: Fraction,
+) -> list[Fraction]:
+    """
+    子要素それぞれが動画全体のどの時刻から始まるかを計算する。
+
+    Parameters
+    ----------
+    vsml_content : WrapContent
+        子要素を持つVSMLの要素
+    offset : Fraction
+        vsml_contentの開始時刻(秒)
+
+    Returns
+    -------
+    child_offsets : list[Fraction]
+        子要素それぞれの開始時刻(秒)。区間の分割で境界を比べるため、有理数のまま返す
+    """
+
+    style = vsml_content.style
+    inner_offset = offset + style.time_padding_start.get_fraction()
+    child_offsets = []
+    match style.order:
+        case Order.SEQUENCE:
+            current_time = TimeValue("0")
+            previous_time_margin = TimeValue("0")
+            for item in vsml_content.items:
+                item_style = item.style
+                current_time += max(
+                    previous_time_margin, item_style.time_margin_start
+                )
+                child_offsets.append(
+                    inner_offset + current_time.get_fraction()
+                )
+                current_time += item_style.get_object_length_with_padding()
+                previous_time_margin = item_style.time_margin_end
+        case Order.PARALLEL:
+            for item in vsml_content.items:
+                child_offsets.append(
+                    inner_offset + item.style.time_margin_start.get_fraction()
+                )
+        case _:
+            raise Exception()
+    return child_offsets
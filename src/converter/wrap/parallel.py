@@ -19,7 +19,7 @@ def create_parallel_process(
     debug_mode: bool = False,
 ) -> Process:
     video_process = None
-    audio_process = None
+    audio_processes = []
 
     style = vsml_content.style
     width_with_padding = style.get_width_with_padding()
@@ -115,9 +115,9 @@ def create_parallel_process(
                 else child_style.margin_bottom
             )
         if child_process.audio is not None:
-            audio_process = audio_merge_filter(
-                audio_process, child_process.audio
-            )
+            audio_processes.append(child_process.audio)
+    # 子要素の音声をまとめて1つのフィルタでミックスする
+    audio_process = audio_merge_filter(audio_processes)
     if audio_process is not None:
         audio_process = adjust_parallel_audio(
             style.object_length, audio_process
@@ -17,8 +17,9 @@ def create_sequence_process(
     vsml_content: WrapContent,
     debug_mode: bool = False,
 ) -> Process:
-    video_process = None
-    audio_process = None
+    video_processes = []
+    audio_processes = []
+    is_fit = False
 
     video_time_margin = TimeValue("0")
     audio_time_margin = TimeValue("0")
@@ -61,9 +62,7 @@ def create_sequence_process(
                 video_process=child_process.video,
             )
             video_time_margin = TimeValue("0")
-            video_process = concat_filter(
-                video_process, child_process.video, is_video=True
-            )
+            video_processes.append(child_process.video)
         else:
             # 映像が存在しない場合、余白時間を加算し、後で余白を付ける
             video_time_margin += max_time_margin + length_with_padding
@@ -74,23 +73,27 @@ def create_sequence_process(
                 audio_process=child_process.audio,
             )
             audio_time_margin = TimeValue("0")
-            audio_process = concat_filter(
-                audio_process, child_process.audio, is_video=False
-            )
+            audio_processes.append(child_process.audio)
         else:
             # 音声が存在しない場合、余白時間を加算し、後で余白を付ける
             audio_time_margin += max_time_margin + length_with_padding
 
         # FITな子要素があれば以降をこのオブジェクトで埋める
         if child_style.object_length.is_fit():
-            video_process, audio_process = adjust_fit_sequence(
-                background_color_code, video_process, audio_process
-            )
+            is_fit = True
             video_time_margin = TimeValue("0")
             audio_time_margin = TimeValue("0")
             previous_time_margin = TimeValue("0")
             break
 
+    # 子要素をまとめて1つのフィルタで連結する
+    video_process = concat_filter(video_processes, is_video=True)
+    audio_process = concat_filter(audio_processes, is_video=False)
+    if is_fit:
+        video_process, audio_process = adjust_fit_sequence(
+            background_color_code, video_process, audio_process
+        )
+
     # 余った時間マージンを追加する
     if video_process is not None:
         video_remain_time_margin = video_time_margin + previous_time_margin
@@ -1,7 +1,27 @@
+import asyncio
 import json
+import sys
+from argparse import Namespace
+from contextlib import nullcontext
+from fractions import Fraction
+from typing import Optional
+
+import ffmpeg
 
 from args import get_args
-from converter import convert_image_from_frame, convert_video
+from batch import BatchJob, get_default_output, load_manifest, render_batch
+from converter import (
+    OutputMode,
+    convert_image_from_frame,
+    convert_video,
+    get_encode_profile,
+    get_json_lines_callback,
+    use_proxy_manager,
+)
+from converter.profile import EncodeProfile
+from profiler import profile_stage, start_profiler
+from server import JobQueue, get_default_queue_path, run_server
+from utils import DraftSetting
 from xml_parser import parsing_vsml
 
 
@@ -13,8 +33,31 @@ def main():
     # コマンド引数を受け取る
     args = get_args()
 
+    # 確認用の描画では重いソースを代替の素材に置き換え、無いものは並行して作る
+    with use_proxy_manager() if args.proxy else nullcontext():
+        if args.profile is None:
+            convert_from_args(args)
+            return
+
+        # 各段階の処理時間を計測し、レポートを書き出す
+        profiler = start_profiler(args.profile_cprofile)
+        with profile_stage("main"):
+            convert_from_args(args)
+        profiler.write_report(args.profile)
+        print(profiler.get_summary(), file=sys.stderr)
+
+
+def convert_from_args(args: Namespace):
+    if args.serve:
+        serve_from_args(args)
+        return
+    if len(args.filenames) > 1 or args.manifest is not None:
+        convert_batch_from_args(args)
+        return
+
     # ファイルのVSMLを解析
-    vsml_data = parsing_vsml(args.filename, args.offline)
+    draft = get_draft_setting(args)
+    vsml_data = parsing_vsml(args.filenames[0], args.offline, draft)
 
     if args.debug:
         content_str = (
@@ -31,13 +74,29 @@ def main():
             f.write(content_str)
 
     if args.frame is None:
+        progress_file = None
+        progress_callback = None
+        if args.progress_json is not None:
+            progress_file = (
+                sys.stdout
+                if args.progress_json == "-"
+                else open(args.progress_json, "w")
+            )
+            progress_callback = get_json_lines_callback(progress_file)
         # 解析したデータをもとにffmpegで動画を構築
         convert_video(
             vsml_data,
             args.output,
             args.debug,
             args.overwrite,
+            args.jobs,
+            args.cache,
+            get_encode_profile_from_args(args, draft),
+            progress_callback,
+            OutputMode(args.output_mode),
         )
+        if progress_file is not None and progress_file is not sys.stdout:
+            progress_file.close()
     else:
         convert_image_from_frame(
             vsml_data,
@@ -46,5 +105,85 @@ def main():
         )
 
 
+def get_draft_setting(args: Namespace) -> Optional[DraftSetting]:
+    if not args.draft:
+        return None
+    # 浮動小数の誤差でfpsや解像度がずれないよう、10進の表記から有理数にする
+    return DraftSetting(
+        Fraction(str(args.draft_scale)), Fraction(str(args.draft_fps))
+    )
+
+
+def get_encode_profile_from_args(
+    args: Namespace, draft: Optional[DraftSetting]
+) -> Optional[EncodeProfile]:
+    # 縮小描画でプロファイルを指定しなければ、draftのプロファイルで書き出す
+    return get_encode_profile(
+        (
+            "draft"
+            if draft is not None and args.encode_profile is None
+            else args.encode_profile
+        ),
+        args.config,
+    )
+
+
+def convert_batch_from_args(args: Namespace):
+    # 複数のVSMLを、スキーマやフォントなどを共有しながら1つのプロセスで変換
+    jobs = [
+        BatchJob(
+            filename,
+            get_default_output(filename, args.output, args.frame),
+            args.frame,
+        )
+        for filename in args.filenames
+    ]
+    if args.manifest is not None:
+        jobs += load_manifest(args.manifest, args.frame)
+    draft = get_draft_setting(args)
+    errors = asyncio.run(
+        render_batch(
+            jobs,
+            args.offline,
+            args.overwrite,
+            args.workers,
+            args.cache,
+            get_encode_profile_from_args(args, draft),
+            draft,
+        )
+    )
+    failed_count = 0
+    for job, error in zip(jobs, errors):
+        if error is None:
+            continue
+        failed_count += 1
+        print("{}: {}".format(job.filename, error), file=sys.stderr)
+        if isinstance(error, ffmpeg.Error) and error.stderr:
+            sys.stderr.write(error.stderr.decode(errors="replace"))
+    if failed_count > 0:
+        sys.exit("{} of {} files failed".format(failed_count, len(jobs)))
+
+
+def serve_from_args(args: Namespace):
+    # 常駐して、HTTPで受け付けたジョブを優先度の順に変換する
+    job_queue = JobQueue(args.queue or get_default_queue_path())
+    try:
+        asyncio.run(
+            run_server(
+                job_queue,
+                args.port,
+                args.workers,
+                args.offline,
+                args.overwrite,
+                args.cache,
+                args.output,
+                args.config,
+                get_draft_setting(args),
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,201 @@
+import cProfile
+import functools
+import io
+import json
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Iterator, Optional
+
+from utils import get_render_context
+
+# ffmpegの-benchmarkの出力 (bench: utime=1.234s stime=0.123s rtime=1.456s)
+BENCHMARK_PATTERN = re.compile(r"(\w+)=([\d.]+)(s|kB)")
+
+
+@dataclass
+class StageRecord:
+    count: int = 0
+    total_time: float = 0.0
+    self_time: float = 0.0
+
+
+@dataclass
+class CacheRecord:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+@dataclass
+class Profiler:
+    use_cprofile: bool = False
+    stages: dict[str, StageRecord] = field(default_factory=dict)
+    ffmpeg_benchmarks: list[dict[str, float]] = field(default_factory=list)
+    caches: dict[str, CacheRecord] = field(default_factory=dict)
+    cprofile: Optional[cProfile.Profile] = None
+    # ワーカーのスレッドでも計測するため、ステージの入れ子はスレッドごとに追う
+    local: threading.local = field(default_factory=threading.local)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    thread_id: int = field(default_factory=threading.get_ident)
+
+    def __post_init__(self):
+        if self.use_cprofile:
+            self.cprofile = cProfile.Profile()
+
+    @property
+    def stack(self) -> list[list[float]]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # 入れ子になったステージの時間は、親のself_timeから差し引く
+        frame = [time.perf_counter(), 0.0]
+        stack = self.stack
+        stack.append(frame)
+        # cProfileはスレッドごとに有効にするため、作成したスレッドのみで使う
+        use_cprofile = (
+            len(stack) == 1
+            and self.cprofile is not None
+            and threading.get_ident() == self.thread_id
+        )
+        if use_cprofile:
+            self.cprofile.enable()
+        try:
+            yield
+        finally:
+            if use_cprofile:
+                self.cprofile.disable()
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            with self.lock:
+                record = self.stages.setdefault(name, StageRecord())
+                record.count += 1
+                record.total_time += elapsed
+                record.self_time += elapsed - frame[1]
+            if len(stack) > 0:
+                stack[-1][1] += elapsed
+
+    def add_ffmpeg_benchmark(self, stderr: str):
+        benchmark: dict[str, float] = {}
+        for line in stderr.splitlines():
+            if line.startswith("bench:"):
+                for key, value, _ in BENCHMARK_PATTERN.findall(line):
+                    benchmark[key] = float(value)
+        if len(benchmark) > 0:
+            self.ffmpeg_benchmarks.append(benchmark)
+
+    def add_cache_stats(
+        self, name: str, hits: int, misses: int, evictions: int
+    ):
+        with self.lock:
+            record = self.caches.setdefault(name, CacheRecord())
+            record.hits += hits
+            record.misses += misses
+            record.evictions += evictions
+
+    def get_report(self) -> dict:
+        report: dict = {
+            "stages": {
+                name: asdict(record) for name, record in self.stages.items()
+            },
+            "ffmpeg_benchmarks": self.ffmpeg_benchmarks,
+            "caches": {
+                name: asdict(record) for name, record in self.caches.items()
+            },
+        }
+        if self.cprofile is not None:
+            stream = io.StringIO()
+            pstats.Stats(self.cprofile, stream=stream).sort_stats(
+                "cumulative"
+            ).print_stats(30)
+            report["cprofile"] = stream.getvalue()
+        return report
+
+    def get_summary(self) -> str:
+        lines = [
+            "{:<24}{:>8}{:>12}{:>12}".format(
+                "stage", "count", "total(s)", "self(s)"
+            )
+        ]
+        for name, record in sorted(
+            self.stages.items(), key=lambda item: -item[1].total_time
+        ):
+            lines.append(
+                "{:<24}{:>8}{:>12.3f}{:>12.3f}".format(
+                    name, record.count, record.total_time, record.self_time
+                )
+            )
+        for name, record in self.caches.items():
+            lines.append(
+                "cache[{}] hits={} misses={} evictions={}".format(
+                    name, record.hits, record.misses, record.evictions
+                )
+            )
+        for index, benchmark in enumerate(self.ffmpeg_benchmarks):
+            lines.append(
+                "ffmpeg[{}] {}".format(
+                    index,
+                    " ".join(
+                        "{}={}".format(key, value)
+                        for key, value in benchmark.items()
+                    ),
+                )
+            )
+        return "\n".join(lines)
+
+    def write_report(self, report_path: str):
+        """
+        計測結果をJSONと、人が読むための要約のテキストに書き出す。
+
+        Parameters
+        ----------
+        report_path : str
+            JSONの出力先のパス。要約は拡張子を.txtにしたパスに書き出す
+        """
+
+        with open(report_path, "w") as f:
+            json.dump(self.get_report(), f, indent=2, ensure_ascii=False)
+        summary_path = re.sub(r"(\.json)?$", ".txt", report_path, count=1)
+        with open(summary_path, "w") as f:
+            f.write(self.get_summary() + "\n")
+            if self.cprofile is not None:
+                f.write("\n" + self.get_report()["cprofile"])
+
+
+def start_profiler(use_cprofile: bool = False) -> Profiler:
+    # 以降に解析するVSMLのRenderContextも、同じ計測を引き継ぐ
+    profiler = Profiler(use_cprofile)
+    get_render_context().profiler = profiler
+    return profiler
+
+
+def get_profiler() -> Optional[Profiler]:
+    return get_render_context().profiler
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    profiler = get_profiler()
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(name):
+            yield
+
+
+def profiled(name: str) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,358 @@
+import asyncio
+import contextlib
+import json
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+import ffmpeg
+
+from batch import BatchJob, get_default_output, render_job
+from converter.cache import get_cache_dir
+from converter.profile import get_encode_profile
+from utils import DraftSetting
+
+SERVER_HOST = "127.0.0.1"
+# 数値が小さいほど先に処理する。プレビューは待っている人がいるため、動画の書き出しより優先する
+PREVIEW_PRIORITY = 0
+VIDEO_PRIORITY = 10
+
+
+@dataclass
+class QueuedJob:
+    id: int
+    filename: str
+    output: str
+    frame: Optional[int]
+    priority: int
+    encode_profile: Optional[str]
+    status: str
+    error: Optional[str]
+    created_at: float
+    finished_at: Optional[float]
+
+
+class JobQueue:
+    """
+    変換のジョブをSQLiteに保存し、再起動後も続きから処理できるようにする。
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " filename TEXT NOT NULL,"
+                " output TEXT NOT NULL,"
+                " frame INTEGER,"
+                " priority INTEGER NOT NULL,"
+                " encode_profile TEXT,"
+                " status TEXT NOT NULL,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " finished_at REAL)"
+            )
+            # 前回の終了時に実行中だったジョブは、最初からやり直す
+            self.connection.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'running'"
+            )
+
+    def add(
+        self,
+        filename: str,
+        output: str,
+        frame: Optional[int],
+        priority: int,
+        encode_profile: Optional[str],
+    ) -> QueuedJob:
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO jobs (filename, output, frame, priority,"
+                " encode_profile, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                (
+                    filename,
+                    output,
+                    frame,
+                    priority,
+                    encode_profile,
+                    time.time(),
+                ),
+            )
+            job_id = cursor.lastrowid
+        job = self.get(job_id)
+        assert job is not None
+        return job
+
+    def get(self, job_id: int) -> Optional[QueuedJob]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return QueuedJob(**row) if row is not None else None
+
+    def get_all(self) -> list[QueuedJob]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM jobs ORDER BY id"
+            ).fetchall()
+        return [QueuedJob(**row) for row in rows]
+
+    def claim(self, max_priority: Optional[int] = None) -> Optional[QueuedJob]:
+        """
+        待機中のジョブのうち、最も優先度の高いものを実行中にして返す。
+
+        Parameters
+        ----------
+        max_priority : Optional[int]
+            取り出す優先度の上限。Noneの場合は全てのジョブから選ぶ
+
+        Returns
+        -------
+        job : Optional[QueuedJob]
+            取り出したジョブ。該当するジョブが無い場合はNone
+        """
+
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE status = 'queued'"
+                " AND priority <= ? ORDER BY priority, id LIMIT 1",
+                (max_priority if max_priority is not None else sys.maxsize,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE jobs SET status = 'running' WHERE id = ?",
+                (row["id"],),
+            )
+        return replace(QueuedJob(**row), status="running")
+
+    def finish(self, job_id: int, error: Optional[str] = None):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?"
+                " WHERE id = ?",
+                (
+                    "failed" if error is not None else "done",
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+
+def get_error_message(error: Exception) -> str:
+    message = "{}: {}".format(type(error).__name__, error)
+    if isinstance(error, ffmpeg.Error) and error.stderr:
+        message += "\n" + error.stderr.decode(errors="replace")
+    return message
+
+
+class RenderServer(ThreadingHTTPServer):
+    def __init__(
+        self,
+        port: int,
+        job_queue: JobQueue,
+        on_submit: Callable[[], None],
+        output_dir: Optional[str] = None,
+        config_path: Optional[str] = None,
+    ) -> None:
+        super().__init__((SERVER_HOST, port), RenderRequestHandler)
+        self.job_queue = job_queue
+        self.on_submit = on_submit
+        self.output_dir = output_dir
+        self.config_path = config_path
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs でジョブを登録し、GET /jobs と GET /jobs/<id> で状態を返す。
+    """
+
+    server: RenderServer
+
+    def send_json(self, status: int, body: Any):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        job_queue = self.server.job_queue
+        if self.path == "/jobs":
+            self.send_json(200, [asdict(job) for job in job_queue.get_all()])
+            return
+        if self.path.startswith("/jobs/"):
+            job_id = self.path.removeprefix("/jobs/")
+            job = job_queue.get(int(job_id)) if job_id.isdigit() else None
+            if job is not None:
+                self.send_json(200, asdict(job))
+                return
+        self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+            filename = os.path.abspath(body["filename"])
+            if not os.path.isfile(filename):
+                raise ValueError("file not found: {}".format(filename))
+            frame = int(body["frame"]) if "frame" in body else None
+            output = os.path.abspath(
+                body.get("output")
+                or get_default_output(filename, self.server.output_dir, frame)
+            )
+            encode_profile = body.get("encode_profile")
+            # 登録の時点で、存在しないプロファイル名を弾く
+            get_encode_profile(encode_profile, self.server.config_path)
+            priority = int(
+                body.get(
+                    "priority",
+                    PREVIEW_PRIORITY if frame is not None else VIDEO_PRIORITY,
+                )
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        job = self.server.job_queue.add(
+            filename, output, frame, priority, encode_profile
+        )
+        self.server.on_submit()
+        self.send_json(201, asdict(job))
+
+
+async def run_server(
+    job_queue: JobQueue,
+    port: int,
+    workers: int,
+    is_offline: bool,
+    overwrite: bool,
+    use_cache: bool = False,
+    output_dir: Optional[str] = None,
+    config_path: Optional[str] = None,
+    draft: Optional[DraftSetting] = None,
+):
+    """
+    ローカルのHTTPでジョブを受け付け、優先度の順にworkersの数まで並行して変換する。
+
+    workersが2以上の場合、1つはプレビューの優先度のジョブ専用にし、
+    動画の書き出しで全て埋まってもプレビューをすぐに始める。
+
+    スキーマやフォント、素材の解析結果はプロセス内で共有するため、
+    起動後のジョブは解析や探索をやり直さずに済む。
+
+    Parameters
+    ----------
+    job_queue : JobQueue
+        ジョブを保存するキュー
+    port : int
+        待ち受けるポート
+    workers : int
+        同時に実行するffmpegの数
+    is_offline : bool
+        オフラインモード
+    overwrite : bool
+        出力先の上書きを許可するか
+    use_cache : bool
+        要素ごとの描画結果のキャッシュを使うか
+    output_dir : Optional[str]
+        出力先を省略したジョブの出力ディレクトリ
+    config_path : Optional[str]
+        エンコードのプロファイルを定義した設定ファイルのパス
+    draft : Optional[DraftSetting]
+        全てのジョブで共通して使う縮小描画の設定。プロファイルを指定しない
+        ジョブは、draftのプロファイルで書き出す
+    """
+
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    server = RenderServer(
+        port,
+        job_queue,
+        lambda: loop.call_soon_threadsafe(wakeup.set),
+        output_dir,
+        config_path,
+    )
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    print(
+        "listening on http://{}:{}".format(SERVER_HOST, server.server_port),
+        file=sys.stderr,
+    )
+    limiter = asyncio.Semaphore(workers)
+
+    async def worker(max_priority: Optional[int] = None):
+        while True:
+            # 取り出しの前に消すことで、その間に登録されたジョブを見逃さない
+            wakeup.clear()
+            job = job_queue.claim(max_priority)
+            if job is None:
+                await wakeup.wait()
+                continue
+            try:
+                await render_job(
+                    BatchJob(job.filename, job.output, job.frame),
+                    is_offline,
+                    overwrite,
+                    use_cache,
+                    get_encode_profile(
+                        (
+                            "draft"
+                            if draft is not None and job.encode_profile is None
+                            else job.encode_profile
+                        ),
+                        config_path,
+                    ),
+                    limiter,
+                    draft,
+                )
+            except Exception as e:
+                job_queue.finish(job.id, get_error_message(e))
+            else:
+                job_queue.finish(job.id)
+
+    # 終了の合図を受けたら実行中のffmpegを止め、ジョブは次の起動でやり直す
+    stop = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signal_number, stop.set)
+    max_priorities: list[Optional[int]] = [None] * workers
+    if workers > 1:
+        max_priorities[0] = PREVIEW_PRIORITY
+    workers_task = asyncio.gather(
+        *(worker(max_priority) for max_priority in max_priorities)
+    )
+    stop_task = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait(
+            [workers_task, stop_task], return_when=asyncio.FIRST_COMPLETED
+        )
+        if workers_task.done():
+            workers_task.result()
+    finally:
+        workers_task.cancel()
+        stop_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await workers_task
+        server.shutdown()
+        server.server_close()
+
+
+def get_default_queue_path() -> str:
+    cache_dir = get_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, "queue.sqlite3")
@@ -31,6 +31,14 @@ def time_calculator(
     return output_value
 
 
+def scale_pixel(pixel: int) -> int:
+    # 縮小描画では、文書で指定した大きさとソースの大きさを同じ比率で縮める
+    scale = VSMLManager.get_draft_scale()
+    if scale == 1:
+        return pixel
+    return round(pixel * scale)
+
+
 def graphic_calculator(
     value: GraphicValue,
     parent_pixel: Optional[int] = None,
@@ -42,6 +50,10 @@ def graphic_calculator(
         case GraphicUnit.PIXEL:
             # PIXEL
             output_value = value
+            if VSMLManager.get_draft_scale() != 1:
+                output_value = GraphicValue(
+                    "{}px".format(scale_pixel(value.value))
+                )
         case GraphicUnit.PERCENT:
             if parent_pixel is not None:
                 output_value.value = int(parent_pixel * value.value / 100)
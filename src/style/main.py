@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+import os
 from typing import Optional
 
-from ffmpeg import probe as ffprobe
+from ffmpeg import probe
 from lxml.etree import _Attrib
 
+from profiler import profiled
 from utils import TagInfoTree, VSMLManager
 
-from .calculator import graphic_calculator, time_calculator
+from .calculator import graphic_calculator, scale_pixel, time_calculator
 from .styling_parser import (
     audio_system_parser,
     color_and_pixel_parser,
@@ -23,6 +25,7 @@ from .styling_parser import (
     order_parser,
     percentage_parser,
     pixel_parser,
+    source_loop_parser,
     time_parser,
 )
 from .types import (
@@ -36,6 +39,21 @@ from .types import (
 )
 from .utils import calculate_text_size, find_font_files
 
+# 同じ素材を何度も解析しないよう、パスと更新日時ごとに結果を保持する
+probe_cache: dict[tuple[str, int, int], dict] = {}
+probe_source = profiled("ffprobe")(probe)
+
+
+def ffprobe(filename: str) -> dict:
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return probe_source(filename)
+    key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+    if key not in probe_cache:
+        probe_cache[key] = probe_source(filename)
+    return probe_cache[key]
+
 
 class Style:
     # style param
@@ -46,6 +64,7 @@ class Style:
     time_padding_start: TimeValue
     time_padding_end: TimeValue
     order: Optional[Order]
+    source_loop: Optional[bool]
     # visual param
     width: GraphicValue
     height: GraphicValue
@@ -94,6 +113,7 @@ class Style:
         self.time_padding_start = TimeValue("fit")
         self.time_padding_end = TimeValue("fit")
         self.order = None
+        self.source_loop = None
         self.width = GraphicValue("auto")
         self.height = GraphicValue("auto")
         self.layer_mode = None
@@ -182,8 +202,8 @@ class Style:
                 )
                 width = meta_video["width"]
                 height = meta_video["height"]
-                self.source_width = graphic_parser(f"{width}px")
-                self.source_height = graphic_parser(f"{height}px")
+                self.source_width = graphic_parser(f"{scale_pixel(width)}px")
+                self.source_height = graphic_parser(f"{scale_pixel(height)}px")
                 if meta_audio is not None:
                     channel_layout = meta_audio.get("channel_layout")
                     match channel_layout:
@@ -225,8 +245,8 @@ class Style:
                     raise Exception()
                 width = meta_video["width"]
                 height = meta_video["height"]
-                self.source_width = graphic_parser(f"{width}px")
-                self.source_height = graphic_parser(f"{height}px")
+                self.source_width = graphic_parser(f"{scale_pixel(width)}px")
+                self.source_height = graphic_parser(f"{scale_pixel(height)}px")
             case "txt":
                 if self.font_color is None:
                     self.font_color = Color("white")
@@ -275,6 +295,10 @@ class Style:
                     parse_value = time_parser(value)
                     if parse_value is not None:
                         self.time_padding_end = parse_value
+                case "source-loop":
+                    parse_value = source_loop_parser(value)
+                    if parse_value is not None:
+                        self.source_loop = parse_value
                 case "order":
                     parse_value = order_parser(value)
                     if parse_value is not None:
@@ -403,8 +427,9 @@ class Style:
                     self.background_color = Color(background_color)
             case "txt":
                 if self.font_size is not None:
+                    # 親の文字の大きさは未計算の値のため、縮小してから割合を掛ける
                     parent_font_size = (
-                        parent_param.font_size.value
+                        scale_pixel(parent_param.font_size.value)
                         if parent_param is not None
                         and parent_param.font_size is not None
                         and parent_param.font_size.has_specific_value()
@@ -413,6 +438,10 @@ class Style:
                     self.font_size = graphic_calculator(
                         self.font_size, parent_font_size
                     )
+                    if self.font_border_width is not None:
+                        self.font_border_width = scale_pixel(
+                            self.font_border_width
+                        )
                     self.using_font_path = find_font_files(
                         self.font_family,
                         (
@@ -550,10 +579,19 @@ class Style:
             if (
                 self.source_object_length is not None
                 and not self.object_length.is_fit()
+                and not self.is_source_loop()
             )
             else self.object_length
         )
 
+    def is_source_loop(self) -> bool:
+        if self.source_object_length is None:
+            return False
+        # 指定がない場合、FITなソースはループして長さを埋める
+        if self.source_loop is None:
+            return self.object_length.is_fit()
+        return self.source_loop
+
     def get_width(self) -> GraphicValue:
         return (
             self.source_width
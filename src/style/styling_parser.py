@@ -149,6 +149,16 @@ def font_style_parser(
             return False
 
 
+def source_loop_parser(
+    value: str,
+) -> Optional[bool]:
+    match value:
+        case "true":
+            return True
+        case "false":
+            return False
+
+
 def order_parser(
     value: str,
 ) -> Optional[Order]:
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import re
 from enum import Enum, auto
+from fractions import Fraction
 
 from definition import COLOR_LIST, COLOR_VALUE, REAL_NUMBER_PATTERN
 from utils import VSMLManager
@@ -132,19 +133,20 @@ class ColorType(Enum):
 
 
 class TimeValue:
-    value: float
+    # 足し合わせても誤差が積み重ならないよう、有理数で保持する
+    value: Fraction
     unit: TimeUnit
 
     def __init__(self, val: str) -> None:
         if val == "fit":
             self.unit = TimeUnit.FIT
-            self.value = -1
+            self.value = Fraction(-1)
         elif val == "source":
             self.unit = TimeUnit.SOURCE
-            self.value = -1
+            self.value = Fraction(-1)
         elif val == "0":
             self.unit = TimeUnit.FRAME
-            self.value = 0
+            self.value = Fraction(0)
         else:
             match val[-1:]:
                 case "s":
@@ -155,7 +157,7 @@ class TimeValue:
                     self.unit = TimeUnit.PERCENT
                 case _:
                     raise ValueError()
-            self.value = float(val[:-1])
+            self.value = Fraction(val[:-1])
 
     def __str__(self) -> str:
         match self.unit:
@@ -172,23 +174,35 @@ class TimeValue:
                 return "'{}{}'".format(self.value, self.unit)
 
     def __lt__(self, other: TimeValue) -> bool:
-        return self.get_second() < other.get_second()
+        return self.get_fraction() < other.get_fraction()
 
     def __add__(self, other: TimeValue) -> TimeValue:
-        second = self.get_second() + other.get_second()
-        return TimeValue(f"{second}s")
+        if self.unit == TimeUnit.FRAME and other.unit == TimeUnit.FRAME:
+            return TimeValue("{}f".format(self.value + other.value))
+        second = self.get_fraction() + other.get_fraction()
+        return TimeValue("{}s".format(second))
 
     def __iadd__(self, other: TimeValue) -> TimeValue:
         return self + other
 
-    def get_second(self, default_value: float = 0) -> float:
+    def get_fraction(self, default_value: Fraction = Fraction(0)) -> Fraction:
+        """
+        秒数を有理数のまま取得する。フレーム数はルートのfpsで割った値になる。
+        """
+
         if self.unit == TimeUnit.SECOND:
             return self.value
         elif self.unit == TimeUnit.FRAME:
-            return self.value / VSMLManager.get_root_fps()
+            return self.value / VSMLManager.get_root_frame_rate()
         else:
             return default_value
 
+    def get_second(self, default_value: float = 0) -> float:
+        # ffmpegのオプションに渡す直前でのみ小数にする
+        if not self.has_specific_value():
+            return default_value
+        return float(self.get_fraction())
+
     def is_zero_over(self) -> bool:
         if self.unit in [TimeUnit.SECOND, TimeUnit.FRAME, TimeUnit.PERCENT]:
             return self.value > 0
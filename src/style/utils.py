@@ -1,9 +1,12 @@
 import re
+from functools import lru_cache
 from typing import Optional
 
 from matplotlib import font_manager
 from PIL import ImageFont
 
+from profiler import profiled
+
 font_dict: dict[str, dict[str, str]] = {}
 font_files = font_manager.findSystemFonts(fontpaths=None, fontext="ttf")
 for font_file in font_files:
@@ -89,6 +92,7 @@ def get_regular_font(font_dict: dict[str, str]) -> Optional[str]:
         return regular_fonts[0]
 
 
+@profiled("font_lookup")
 def find_font_files(
     font_names: list[str], bold: bool = False, italic: bool = False
 ) -> Optional[str]:
@@ -110,6 +114,12 @@ def find_font_files(
                 return get_regular_font(font_name_dict)
 
 
+# 同じ文字列の大きさを何度も測らないよう、フォントと結果を保持する
+get_truetype_font = lru_cache(maxsize=64)(ImageFont.truetype)
+
+
+@lru_cache(maxsize=4096)
+@profiled("text_measurement")
 def calculate_text_size(
     font_path: Optional[str],
     text: str,
@@ -128,7 +138,7 @@ def calculate_text_size(
             len(text_lines) * one_line_height,
         )
     else:
-        font = ImageFont.truetype(font_path, font_size)
+        font = get_truetype_font(font_path, font_size)
 
         text_widths: list[int] = []
         text_heights: list[int] = []
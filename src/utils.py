@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Optional
+from fractions import Fraction
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from profiler import Profiler
 
 
 @dataclass
@@ -13,36 +20,157 @@ class TagInfoTree:
     parent: Optional[TagInfoTree]
 
 
-class VSMLManager:
-    root_path: str
-    root_resolution: WidthHeight
-    root_fps: float
+@dataclass
+class DraftSetting:
+    """
+    確認用に、解像度とfpsを下げて描画する設定。
+    """
+
+    scale: Fraction = Fraction(1, 2)
+    fps: Optional[Fraction] = Fraction(15)
+
+
+@dataclass
+class RenderContext:
+    """
+    1つのVSMLの解析から変換までで共有する、ルート要素と描画の設定。
+
+    ContextVarで保持するため、スレッドプールで描画する場合は
+    ContextThreadPoolExecutorを使い、呼び出し元の情報を引き継ぐ。
+    """
+
+    root_path: str = ""
+    root_resolution: Optional[WidthHeight] = None
+    root_fps: Optional[Fraction] = None
+    draft: Optional[DraftSetting] = None
+    input_thread_queue_size: Optional[int] = None
+    max_filter_inputs: Optional[int] = None
+    profiler: Optional[Profiler] = None
+
+
+# スレッドとasyncioのタスクごとに、変換中のVSMLの情報を切り替える
+current_render_context: ContextVar[RenderContext] = ContextVar(
+    "current_render_context"
+)
+
+
+def get_render_context() -> RenderContext:
+    render_context = current_render_context.get(None)
+    if render_context is None:
+        render_context = RenderContext()
+        current_render_context.set(render_context)
+    return render_context
+
+
+@contextmanager
+def use_render_context(
+    render_context: RenderContext,
+) -> Iterator[RenderContext]:
+    """
+    with文の間、VSMLManagerが参照する情報をrender_contextに切り替える。
+
+    Parameters
+    ----------
+    render_context : RenderContext
+        解析したVSMLが持つ情報
+    """
+
+    token = current_render_context.set(render_context)
+    try:
+        yield render_context
+    finally:
+        current_render_context.reset(token)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    呼び出し元のContextVarを引き継いで実行するスレッドプール。
 
+    ThreadPoolExecutorのワーカーは新しいコンテキストで動くため、
+    描画の情報や計測を参照する処理は、必ずこのプールで実行する。
+    mapもsubmitを経由するため、同じく引き継ぐ。
+    """
+
+    def submit(
+        self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+    ) -> Future:
+        # 投入した時点のコンテキストを、タスクごとに複製して使う
+        return super().submit(copy_context().run, fn, *args, **kwargs)
+
+
+class VSMLManager:
     @staticmethod
     def set_root_path(root_path: str):
-        VSMLManager.root_path = root_path
+        get_render_context().root_path = root_path
 
     @staticmethod
     def get_root_path() -> str:
-        return VSMLManager.root_path
+        return get_render_context().root_path
 
     @staticmethod
     def set_root_resolution(
         resolution: WidthHeight,
     ):
-        VSMLManager.root_resolution = resolution
+        scale = VSMLManager.get_draft_scale()
+        if scale != 1:
+            # yuv420pで出力できるよう、縮小後の解像度は偶数に揃える
+            resolution = WidthHeight(
+                max(2, round(resolution.width * scale) // 2 * 2),
+                max(2, round(resolution.height * scale) // 2 * 2),
+            )
+        get_render_context().root_resolution = resolution
 
     @staticmethod
     def get_root_resolution() -> WidthHeight:
-        return VSMLManager.root_resolution
+        resolution = get_render_context().root_resolution
+        if resolution is None:
+            raise RuntimeError("root resolution is not set")
+        return resolution
 
     @staticmethod
-    def set_root_fps(root_fps: float):
-        VSMLManager.root_fps = root_fps
+    def set_root_fps(root_fps: Fraction):
+        get_render_context().root_fps = root_fps
+
+    @staticmethod
+    def get_root_frame_rate() -> Fraction:
+        root_fps = get_render_context().root_fps
+        if root_fps is None:
+            raise RuntimeError("root fps is not set")
+        return root_fps
 
     @staticmethod
     def get_root_fps() -> float:
-        return VSMLManager.root_fps
+        return float(VSMLManager.get_root_frame_rate())
+
+    @staticmethod
+    def get_input_thread_queue_size() -> Optional[int]:
+        return get_render_context().input_thread_queue_size
+
+    @staticmethod
+    def get_max_filter_inputs() -> Optional[int]:
+        return get_render_context().max_filter_inputs
+
+    @staticmethod
+    def is_draft() -> bool:
+        return get_render_context().draft is not None
+
+    @staticmethod
+    def get_draft_scale() -> Fraction:
+        draft = get_render_context().draft
+        return Fraction(1) if draft is None else draft.scale
+
+    @staticmethod
+    def get_output_frame_rate() -> Fraction:
+        # フレーム単位の時間はルートのfpsで数え、書き出しのfpsのみ下げる
+        frame_rate = VSMLManager.get_root_frame_rate()
+        draft = get_render_context().draft
+        if draft is not None and draft.fps is not None:
+            frame_rate = min(frame_rate, draft.fps)
+        return frame_rate
+
+    @staticmethod
+    def get_output_fps() -> float:
+        return float(VSMLManager.get_output_frame_rate())
 
 
 class WidthHeight:
@@ -1,4 +1,7 @@
-from typing import Optional
+import copy
+from dataclasses import replace
+from fractions import Fraction
+from typing import Any, Optional
 
 from lxml.etree import _Element
 
@@ -12,7 +15,13 @@ from style import (
     TimeValue,
     pickup_style,
 )
-from utils import TagInfoTree, VSMLManager, WidthHeight
+from utils import (
+    RenderContext,
+    TagInfoTree,
+    VSMLManager,
+    WidthHeight,
+    get_render_context,
+)
 from vss import convert_prop_val_to_dict, convert_vss_dict
 
 
@@ -53,6 +62,7 @@ class WrapObjectGraphicInfo:
 
 class VSML:
     content: VSMLContent
+    context: RenderContext
 
     def __init__(self, vsml: _Element, is_offline: bool):
         # meta, contentの取得
@@ -67,15 +77,38 @@ class VSML:
             style_tree = element_to_style(metaElement)
 
         # contentデータの操作
+        # 変換時に解析時と同じルートの情報を参照できるよう、保持しておく
+        self.context = get_render_context()
         VSMLManager.set_root_resolution(
             WidthHeight.from_str(contentElement.attrib["resolution"])
         )
-        VSMLManager.set_root_fps(float(contentElement.attrib["fps"]))
+        VSMLManager.set_root_fps(Fraction(contentElement.attrib["fps"]))
         content = element_to_content(contentElement, style_tree, is_offline)
         if content is None:
             raise Exception()
         self.content = content
 
+    def replace_context(self, **changes: Any) -> "VSML":
+        """
+        ルートの情報の一部を変えた、変換ごとのVSMLを返す。
+
+        解析した内容は共有し、元のVSMLが持つ情報は変えない。
+
+        Parameters
+        ----------
+        **changes : Any
+            変更するRenderContextのフィールドと値
+
+        Returns
+        -------
+        vsml_data : VSML
+            変更した情報を持つVSML
+        """
+
+        vsml_data = copy.copy(self)
+        vsml_data.context = replace(self.context, **changes)
+        return vsml_data
+
 
 def element_to_style(
     meta_element: _Element,
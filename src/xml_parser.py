@@ -1,3 +1,4 @@
+from functools import cache
 from os import path
 from typing import Optional
 
@@ -5,7 +6,8 @@ import requests
 from chardet import UniversalDetector
 from lxml import etree
 
-from utils import VSMLManager
+from profiler import get_profiler, profile_stage
+from utils import DraftSetting, RenderContext, use_render_context
 from vsml import VSML
 
 CONFIG_FILE = "http://vsml.pigeons.house/config/vsml.xsd"
@@ -57,11 +59,13 @@ def formatting_xml(
     return formatted_text
 
 
+@cache
 def get_parser_with_xsd(
     is_offline: bool,
 ) -> etree.XMLParser:
     """
-    独自XSDファイルを読み込んだetreeのparserオブジェクトを返す
+    独自XSDファイルを読み込んだetreeのparserオブジェクトを返す。
+    複数のファイルを変換する場合に備え、一度作ったparserを使い回す。
 
     Returns
     -------
@@ -110,7 +114,11 @@ def get_vsml_text(
     return formatting_xml(vsml_text)
 
 
-def parsing_vsml(filename: str, is_offline: bool) -> VSML:
+def parsing_vsml(
+    filename: str,
+    is_offline: bool,
+    draft: Optional[DraftSetting] = None,
+) -> VSML:
     """
     受け取ったVSMLファイルのパスを開きVSMLクラスのオブジェクトにする。
 
@@ -118,6 +126,10 @@ def parsing_vsml(filename: str, is_offline: bool) -> VSML:
     ----------
     filename : str
         VSMLファイルのパス
+    is_offline : bool
+        スキーマをローカルのファイルから読み込むかどうか
+    draft : Optional[DraftSetting]
+        解像度とfpsを下げて描画する設定。Noneの場合は文書の通りに描画する
 
     Returns
     -------
@@ -126,14 +138,23 @@ def parsing_vsml(filename: str, is_offline: bool) -> VSML:
     """
 
     # 入力されたvsmlの読み込み(xsdでのバリデーション付き)
-    parser = get_parser_with_xsd(is_offline)
+    with profile_stage("xsd_load"):
+        parser = get_parser_with_xsd(is_offline)
     vsml_text = get_vsml_text(filename)
-    vsml_element = etree.fromstring(vsml_text, parser)
+    with profile_stage("xsd_validation"):
+        vsml_element = etree.fromstring(vsml_text, parser)
 
     # vsmlファイルからの相対パスを想定するため、vsmlのルートパスを取得
     root_path = path.dirname(filename)
     if root_path != "":
         root_path = root_path + "/"
-    VSMLManager.set_root_path(root_path)
 
-    return VSML(vsml_element, is_offline)
+    # 同じプロセスで別のVSMLを解析しても混ざらないよう、VSMLごとに情報を持つ
+    # 縮小描画の大きさは解析時に確定するため、スタイルの計算より前に設定する
+    # 計測は解析を呼び出した側で始めたものを引き継ぐ
+    render_context = RenderContext(
+        root_path=root_path, draft=draft, profiler=get_profiler()
+    )
+    with use_render_context(render_context):
+        with profile_stage("style_resolution"):
+            return VSML(vsml_element, is_offline)
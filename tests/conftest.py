@@ -0,0 +1,61 @@
+import os
+import shutil
+
+import pytest
+
+from benchmark.documents import get_document
+from benchmark.media import generate_media
+from converter.ffmpeg import get_output_process
+from converter.graph import compile_args
+from converter.schemas import Process
+from utils import use_render_context
+from vsml import VSML
+from xml_parser import parsing_vsml
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STYLE = 'txt { font-size: 24px; font-family: "DejaVu Sans"; }'
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+    reason="ffmpeg and ffprobe are required",
+)
+
+
+@pytest.fixture(autouse=True)
+def render_environment(tmp_path, monkeypatch):
+    # オフラインのXSDはリポジトリのルートからの相対パスで読み込む
+    monkeypatch.chdir(ROOT_DIR)
+    monkeypatch.setenv("VSML_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture(scope="session")
+def media_dir(tmp_path_factory):
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        pytest.skip("ffmpeg and ffprobe are required")
+    media_dir = str(tmp_path_factory.mktemp("media"))
+    generate_media(media_dir)
+    return media_dir
+
+
+def write_document(
+    directory: str,
+    content: str,
+    resolution: str = "640x360",
+    style: str = DEFAULT_STYLE,
+    name: str = "test.vsml",
+) -> str:
+    vsml_path = os.path.join(directory, name)
+    with open(vsml_path, "w") as f:
+        f.write(get_document(content, resolution, style))
+    return vsml_path
+
+
+def load_document(directory: str, content: str, **option) -> VSML:
+    return parsing_vsml(write_document(directory, content, **option), True)
+
+
+def get_command_args(vsml_data: VSML, process: Process) -> list[str]:
+    with use_render_context(vsml_data.context):
+        return compile_args(
+            get_output_process(process.video, process.audio, "out.mp4")
+        )
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import threading
+
+from conftest import load_document
+
+import converter.asynchronous
+from converter.asynchronous import convert_video_async
+from converter.profile import get_encode_profile
+from utils import VSMLManager
+
+
+def test_graph_is_built_off_the_event_loop(media_dir, tmp_path, monkeypatch):
+    vsml_data = load_document(
+        media_dir, '<vid src="video.mp4" style="object-length: 1s;" />'
+    )
+    encode_profile = get_encode_profile("draft")
+    assert encode_profile is not None
+    calls = []
+    create_root_process = converter.asynchronous.create_root_process
+
+    def record_root_process(*args, **kwargs):
+        calls.append(
+            (
+                threading.get_ident(),
+                VSMLManager.get_input_thread_queue_size(),
+            )
+        )
+        return create_root_process(*args, **kwargs)
+
+    monkeypatch.setattr(
+        converter.asynchronous, "create_root_process", record_root_process
+    )
+    out_path = str(tmp_path / "out.mp4")
+    asyncio.run(
+        convert_video_async(vsml_data, out_path, encode_profile=encode_profile)
+    )
+
+    # スレッドでも、変換ごとのルートの情報を参照して組み立てる
+    assert calls == [(calls[0][0], encode_profile.thread_queue_size)]
+    assert calls[0][0] != threading.get_ident()
+    assert os.path.getsize(out_path) > 0
@@ -0,0 +1,24 @@
+import asyncio
+import os
+
+from conftest import write_document
+
+from batch import BatchJob, get_default_output, render_batch
+
+
+def test_batch_creates_output_dir(media_dir, tmp_path):
+    vsml_path = write_document(
+        media_dir, '<vid src="video.mp4" style="object-length: 1s;" />'
+    )
+    output_dir = str(tmp_path / "out")
+    jobs = [
+        BatchJob(
+            vsml_path, get_default_output(vsml_path, output_dir, frame), frame
+        )
+        for frame in [None, 0]
+    ]
+    errors = asyncio.run(render_batch(jobs, True, True, 2))
+
+    # 存在しない出力先のディレクトリは、変換の前に作る
+    assert errors == [None, None]
+    assert sorted(os.listdir(output_dir)) == ["test.mp4", "test.png"]
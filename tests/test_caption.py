@@ -0,0 +1,114 @@
+import re
+
+import ffmpeg
+import pytest
+from conftest import get_command_args, load_document
+from PIL import Image
+
+import converter.wrap.caption
+from converter.main import convert_video, create_root_process
+from converter.wrap.caption import get_caption_text, is_caption_sequence
+from utils import use_render_context
+from vsml import VSML
+
+# 白い文字を黒の背景に重ね、描画した位置を比べられるようにする
+CAPTION_STYLE = (
+    'txt { font-size: 24px; font-family: "DejaVu Sans"; font-color: #ffffff; }'
+)
+
+
+def get_caption_content(
+    count: int, item_style: str = "", length: str = "1s"
+) -> str:
+    return "<seq>{}</seq>".format(
+        "".join(
+            '<txt style="object-length: {};{}">caption {}</txt>'.format(
+                length, item_style, index
+            )
+            for index in range(count)
+        )
+    )
+
+
+def get_filter_names(args: list[str]) -> list[str]:
+    filter_complex = args[args.index("-filter_complex") + 1]
+    return re.findall(r"\]([a-z_]+)[=\[]", filter_complex)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        # 字幕にまとめるには文字が少なすぎる
+        get_caption_content(4),
+        # 背景色のある文字は字幕で同じ見た目にできない
+        get_caption_content(8, " background-color: #ff0000;"),
+        # スタイルの異なる文字が混ざる
+        get_caption_content(7)
+        + '<txt style="object-length: 1s; font-size: 30px;">large</txt>',
+    ],
+)
+def test_caption_sequence_requires_same_style(media_dir, content):
+    vsml_data = load_document(media_dir, "<seq>{}</seq>".format(content))
+    assert not is_caption_sequence(vsml_data.content.items[0])
+
+
+def test_captions_are_burned_in_once(media_dir):
+    # 字幕の数に関わらず、1つのassフィルタでグラフの大きさは変わらない
+    filter_names = []
+    for count in [8, 32]:
+        vsml_data = load_document(media_dir, get_caption_content(count))
+        assert is_caption_sequence(vsml_data.content.items[0])
+        args = get_command_args(vsml_data, create_root_process(vsml_data))
+        filter_names.append(get_filter_names(args))
+
+    assert filter_names[0] == filter_names[1]
+    assert filter_names[0].count("ass") == 1
+    assert "drawtext" not in filter_names[0]
+    assert "concat" not in filter_names[0]
+
+
+def test_caption_events_follow_sequence(media_dir):
+    vsml_data = load_document(media_dir, get_caption_content(8))
+    with use_render_context(vsml_data.context):
+        caption_text = get_caption_text(vsml_data.content.items[0])
+
+    events = re.findall(r"Dialogue: 0,([^,]+),([^,]+),.*\}(.*)", caption_text)
+    assert events[:2] == [
+        ("0:00:00.00", "0:00:01.00", "caption 0"),
+        ("0:00:01.00", "0:00:02.00", "caption 1"),
+    ]
+    assert len(events) == 8
+
+
+def get_text_box(vsml_data: VSML, out_path: str) -> tuple[int, int, int, int]:
+    # 2つ目の字幕の途中のフレームで、明るい画素を囲む範囲を求める
+    convert_video(vsml_data, out_path, False, True)
+    frame_path = out_path + ".png"
+    ffmpeg.input(out_path, ss=0.375).output(frame_path, vframes=1).run(
+        quiet=True, overwrite_output=True
+    )
+    with Image.open(frame_path) as image:
+        text_box = (
+            image.convert("L").point(lambda v: v > 128 and 255).getbbox()
+        )
+    assert text_box is not None
+    return text_box
+
+
+def test_caption_matches_individual_texts(media_dir, tmp_path, monkeypatch):
+    vsml_data = load_document(
+        media_dir,
+        get_caption_content(8, length="0.25s"),
+        style=CAPTION_STYLE,
+    )
+    assert is_caption_sequence(vsml_data.content.items[0])
+    caption_box = get_text_box(vsml_data, str(tmp_path / "caption.mp4"))
+    # assの透過に対応しない場合と同じく、文字を個別に描画する
+    monkeypatch.setattr(
+        converter.wrap.caption, "is_alpha_caption_supported", lambda: False
+    )
+    assert not is_caption_sequence(vsml_data.content.items[0])
+    text_box = get_text_box(vsml_data, str(tmp_path / "text.mp4"))
+
+    for caption_edge, text_edge in zip(caption_box, text_box):
+        assert abs(caption_edge - text_edge) <= 1
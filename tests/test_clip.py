@@ -0,0 +1,78 @@
+import importlib
+
+import ffmpeg
+from conftest import DEFAULT_STYLE
+
+from converter.main import convert_video
+from utils import DraftSetting
+from xml_parser import parsing_vsml
+
+# converter.mainはconverter.previewのmainに隠れるため、モジュールを直接読み込む
+converter_main = importlib.import_module("converter.main")
+
+# ルートの子要素のseqをクリップとしてキャッシュするVSML
+CLIP_DOCUMENT = """<vsml>
+  <meta>
+    <style>
+      {style}
+    </style>
+  </meta>
+  <cont resolution="640x360" fps="{fps}">
+    <seq><img src="image.png" style="object-length: 60f;" /></seq>
+  </cont>
+</vsml>
+"""
+
+
+def write_clip_document(directory: str, fps: int) -> str:
+    vsml_path = "{}/clip{}.vsml".format(directory, fps)
+    with open(vsml_path, "w") as f:
+        f.write(CLIP_DOCUMENT.format(style=DEFAULT_STYLE, fps=fps))
+    return vsml_path
+
+
+def count_frames(path: str) -> int:
+    stream = ffmpeg.probe(path, count_frames=None)["streams"][0]
+    return int(stream["nb_read_frames"])
+
+
+def record_render_clip(monkeypatch) -> list[str]:
+    clip_paths = []
+    render_clip = converter_main.render_clip
+
+    def recorded_render_clip(process, clip_path):
+        clip_paths.append(clip_path)
+        render_clip(process, clip_path)
+
+    monkeypatch.setattr(converter_main, "render_clip", recorded_render_clip)
+    return clip_paths
+
+
+def test_clip_is_reused_from_cache(media_dir, tmp_path, monkeypatch):
+    clip_paths = record_render_clip(monkeypatch)
+    vsml_data = parsing_vsml(write_clip_document(media_dir, 30), True)
+    frame_counts = []
+    for index in range(2):
+        out_path = str(tmp_path / "out{}.mp4".format(index))
+        convert_video(vsml_data, out_path, False, True, use_cache=True)
+        frame_counts.append(count_frames(out_path))
+
+    # 2回目は1回目に描画したクリップを使い、同じ長さの動画になる
+    assert len(clip_paths) == 1
+    assert frame_counts == [60, 60]
+
+
+def test_clip_key_depends_on_root_fps(media_dir, tmp_path, monkeypatch):
+    clip_paths = record_render_clip(monkeypatch)
+    frame_counts = []
+    for fps in [30, 60]:
+        vsml_data = parsing_vsml(
+            write_clip_document(media_dir, fps), True, DraftSetting()
+        )
+        out_path = str(tmp_path / "out{}.mp4".format(fps))
+        convert_video(vsml_data, out_path, False, True, use_cache=True)
+        frame_counts.append(count_frames(out_path))
+
+    # 書き出しのfpsが同じでも、60fは各ルートのfpsで異なる長さになる
+    assert len(set(clip_paths)) == 2
+    assert frame_counts == [30, 15]
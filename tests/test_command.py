@@ -0,0 +1,49 @@
+import os
+
+import ffmpeg
+import pytest
+
+from converter.command import compile_command, get_filter_script_path
+from converter.graph import compile_args
+
+
+def get_filtered_process():
+    return ffmpeg.input("in.mp4").filter("scale", 320, 180).output("out.mp4")
+
+
+def test_filter_graph_is_passed_as_script():
+    process = get_filtered_process()
+    compiled_args = compile_args(process)
+    filter_complex = compiled_args[compiled_args.index("-filter_complex") + 1]
+    with compile_command(process) as args:
+        script_path = get_filter_script_path(args)
+        assert script_path is not None
+        with open(script_path, "r") as f:
+            assert f.read() == filter_complex
+        # コマンド引数にはフィルタグラフを含めない
+        assert "-filter_complex" not in args
+        assert filter_complex not in args
+
+    # 実行後はスクリプトを消す
+    assert not os.path.exists(script_path)
+
+
+def test_script_is_removed_on_error():
+    with pytest.raises(RuntimeError):
+        with compile_command(get_filtered_process()) as args:
+            script_path = get_filter_script_path(args)
+            raise RuntimeError()
+    assert script_path is not None and not os.path.exists(script_path)
+
+
+def test_script_is_kept_for_debug():
+    with compile_command(get_filtered_process(), keep_script=True) as args:
+        script_path = get_filter_script_path(args)
+    assert script_path is not None and os.path.exists(script_path)
+    os.remove(script_path)
+
+
+def test_command_without_filters_has_no_script():
+    with compile_command(ffmpeg.input("in.mp4").output("out.mp4")) as args:
+        assert get_filter_script_path(args) is None
+        assert args == ["ffmpeg", "-i", "in.mp4", "out.mp4"]
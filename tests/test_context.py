@@ -0,0 +1,50 @@
+from conftest import get_command_args, load_document
+
+from converter.main import create_root_process, get_render_vsml
+from converter.profile import get_encode_profile
+from profiler import get_profiler, profile_stage, start_profiler
+from utils import (
+    ContextThreadPoolExecutor,
+    RenderContext,
+    VSMLManager,
+    use_render_context,
+)
+
+
+def test_executor_inherits_render_context():
+    with use_render_context(RenderContext(root_path="root/")):
+        with ContextThreadPoolExecutor(max_workers=2) as executor:
+            root_paths = list(
+                executor.map(lambda _: VSMLManager.get_root_path(), range(4))
+            )
+    assert root_paths == ["root/"] * 4
+
+
+def run_stage():
+    with profile_stage("worker"):
+        pass
+
+
+def test_profiler_is_scoped_to_render_context():
+    with use_render_context(RenderContext()):
+        profiler = start_profiler()
+        with ContextThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(run_stage).result()
+        assert get_profiler() is profiler
+    with use_render_context(RenderContext()):
+        assert get_profiler() is None
+    assert profiler.stages["worker"].count == 1
+
+
+def test_thread_queue_size_is_per_render(media_dir):
+    vsml_data = load_document(media_dir, '<vid src="video.mp4" />')
+    render_vsml = get_render_vsml(vsml_data, get_encode_profile("final"))
+
+    # 解析したVSMLの情報は変えず、変換ごとの複製だけが設定を持つ
+    assert vsml_data.context.input_thread_queue_size is None
+    assert "-thread_queue_size" in get_command_args(
+        render_vsml, create_root_process(render_vsml)
+    )
+    assert "-thread_queue_size" not in get_command_args(
+        vsml_data, create_root_process(vsml_data)
+    )
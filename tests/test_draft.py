@@ -0,0 +1,98 @@
+import asyncio
+
+import ffmpeg
+import pytest
+from conftest import write_document
+from PIL import Image
+
+from batch import BatchJob, render_batch
+from converter.cache import get_cache_path
+from converter.main import convert_video
+from converter.segment import split_segments
+from converter.still import get_still_key, prerender_stills
+from profiler import start_profiler
+from style.main import ffprobe
+from utils import DraftSetting, RenderContext, use_render_context
+from xml_parser import parsing_vsml
+
+# 生成する画像の素材(160x120)をそのまま描画するVSML
+IMAGE_CONTENT = '<img src="image.png" style="object-length: 2s;" />'
+
+
+def test_draft_image_still_is_scaled(media_dir):
+    vsml_data = parsing_vsml(
+        write_document(media_dir, IMAGE_CONTENT), True, DraftSetting()
+    )
+    image_content = vsml_data.content.items[0]
+
+    # 静止画はスレッドで描画するため、縮小描画の設定を引き継ぐ必要がある
+    with use_render_context(vsml_data.context):
+        prerender_stills(vsml_data.content)
+        still_path = get_cache_path(
+            "still", get_still_key(image_content), "png"
+        )
+    with Image.open(still_path) as image:
+        assert image.size == (80, 60)
+
+
+def test_draft_segments_keep_render_context(media_dir, tmp_path):
+    vsml_path = write_document(
+        media_dir,
+        IMAGE_CONTENT + '<vid src="video.mp4" style="object-length: 2s;" />',
+    )
+    # 解析したVSMLは、解析時に始めていた計測を引き継ぐ
+    with use_render_context(RenderContext()):
+        profiler = start_profiler()
+        vsml_data = parsing_vsml(vsml_path, True, DraftSetting())
+    with use_render_context(vsml_data.context):
+        assert split_segments(vsml_data.content, 2) is not None
+    out_path = str(tmp_path / "out.mp4")
+    convert_video(vsml_data, out_path, False, True, jobs=2)
+
+    stream = ffprobe(out_path)["streams"][0]
+    assert (stream["width"], stream["height"]) == (320, 180)
+    assert stream["r_frame_rate"] == "15/1"
+    # 静止画、2つの区間、結合の全てのコマンドの組み立てを同じ計測に記録する
+    assert profiler.stages["compile"].count == 4
+    with use_render_context(vsml_data.context):
+        still_path = get_cache_path(
+            "still", get_still_key(vsml_data.content.items[0]), "png"
+        )
+    with Image.open(still_path) as image:
+        assert image.size == (80, 60)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_draft_frame_count_matches_length(media_dir, tmp_path, jobs):
+    vsml_data = parsing_vsml(
+        write_document(media_dir, IMAGE_CONTENT + IMAGE_CONTENT),
+        True,
+        DraftSetting(),
+    )
+    out_path = str(tmp_path / "out.mp4")
+    convert_video(vsml_data, out_path, False, True, jobs)
+
+    # 4秒を15fpsで書き出し、-rによる末尾のフレームの複製を含まない
+    stream = ffmpeg.probe(out_path, count_frames=None)["streams"][0]
+    assert int(stream["nb_read_frames"]) == 60
+
+
+def test_batch_forwards_draft(media_dir, tmp_path):
+    vsml_path = write_document(
+        media_dir, '<vid src="video.mp4" style="object-length: 1s;" />'
+    )
+    out_path = str(tmp_path / "out.mp4")
+    errors = asyncio.run(
+        render_batch(
+            [BatchJob(vsml_path, out_path, None)],
+            True,
+            True,
+            1,
+            draft=DraftSetting(),
+        )
+    )
+
+    assert errors == [None]
+    stream = ffprobe(out_path)["streams"][0]
+    assert (stream["width"], stream["height"]) == (320, 180)
+    assert stream["r_frame_rate"] == "15/1"
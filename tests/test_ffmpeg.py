@@ -0,0 +1,49 @@
+import re
+from dataclasses import replace
+
+from conftest import get_command_args, load_document
+
+from converter.main import create_root_process, get_render_vsml
+from converter.profile import get_encode_profile
+
+
+def get_filter_inputs(args: list[str], filter_name: str) -> list[int]:
+    # フィルタごとの入力数 (concatはn、amixはinputs)
+    filter_complex = args[args.index("-filter_complex") + 1]
+    return sorted(
+        int(count)
+        for count in re.findall(
+            r"\]{}=[^;\[]*?(?:n|inputs)=(\d+)".format(filter_name),
+            filter_complex,
+        )
+    )
+
+
+def test_long_sequence_is_chunked(media_dir):
+    vsml_data = load_document(
+        media_dir,
+        "<seq>{}</seq>".format(
+            '<img src="image.png" style="object-length: 1f;" />' * 70
+        ),
+    )
+    args = get_command_args(vsml_data, create_root_process(vsml_data))
+
+    # 64個ずつのconcatに分け、それぞれの出力をさらに連結する
+    assert get_filter_inputs(args, "concat") == [2, 6, 64]
+
+
+def test_max_filter_inputs_from_profile(media_dir):
+    vsml_data = load_document(
+        media_dir,
+        "<prl>{}</prl>".format(
+            '<aud src="audio.wav" style="object-length: 1s;" />' * 20
+        ),
+    )
+    encode_profile = get_encode_profile("draft")
+    assert encode_profile is not None
+    render_vsml = get_render_vsml(
+        vsml_data, replace(encode_profile, max_filter_inputs=8)
+    )
+    args = get_command_args(render_vsml, create_root_process(render_vsml))
+
+    assert get_filter_inputs(args, "amix") == [3, 4, 8, 8]
@@ -0,0 +1,66 @@
+import ffmpeg
+import pytest
+
+from converter.graph import compile_args
+
+
+def get_mixed_process():
+    source = ffmpeg.input("a.mp4", ss=1, t=2)
+    image = ffmpeg.input("b.png", loop=1)
+    videos = source.video.split()
+    video = ffmpeg.concat(
+        ffmpeg.overlay(videos[0].filter("scale", 320, 180), image, x=10),
+        videos[1],
+        v=1,
+        a=0,
+    )
+    audio = ffmpeg.filter(
+        [source.audio, ffmpeg.input("c.wav").audio], "amix", inputs=2
+    )
+    return ffmpeg.output(
+        video, audio, "out.mp4", r=30, audio_bitrate="128k"
+    ).global_args("-benchmark")
+
+
+def get_merged_process():
+    source = ffmpeg.input("a.mp4")
+    return ffmpeg.merge_outputs(
+        ffmpeg.output(source.video.filter("hflip"), "video.mp4"),
+        ffmpeg.output(source.audio, "audio.wav"),
+    )
+
+
+@pytest.mark.parametrize(
+    "get_process", [get_mixed_process, get_merged_process]
+)
+def test_args_match_ffmpeg_python(get_process):
+    process = get_process()
+    assert compile_args(process, True) == ffmpeg.compile(
+        process, overwrite_output=True
+    )
+
+
+def test_identical_inputs_are_kept_apart():
+    # ffmpeg-pythonはハッシュが同じ入力を1つにまとめるが、同一性で区別する
+    inputs = [ffmpeg.input("a.mp4") for _ in range(2)]
+    args = compile_args(
+        ffmpeg.output(ffmpeg.concat(*inputs, v=1, a=0), "out.mp4")
+    )
+    assert args.count("-i") == 2
+    assert "[0][1]concat" in args[args.index("-filter_complex") + 1]
+
+
+def test_deep_graph_compiles_without_recursion():
+    # 再帰で辿るとPythonの再帰の上限を超える深さのグラフ
+    video = ffmpeg.input("a.mp4").video
+    for _ in range(5000):
+        video = video.filter("null")
+    args = compile_args(ffmpeg.output(video, "out.mp4"))
+    filter_complex = args[args.index("-filter_complex") + 1]
+    assert filter_complex.count("null") == 5000
+
+
+def test_reused_stream_requires_split():
+    video = ffmpeg.input("a.mp4").video.filter("hflip")
+    with pytest.raises(ValueError, match="split"):
+        compile_args(ffmpeg.output(ffmpeg.concat(video, video), "out.mp4"))
@@ -0,0 +1,50 @@
+from converter.ffmpeg import get_background_process
+from converter.graph_cache import (
+    BoundedCache,
+    CacheStats,
+    get_graph_cache,
+    use_graph_cache,
+)
+from profiler import start_profiler
+from utils import RenderContext, use_render_context
+
+
+def test_bounded_cache_evicts_least_recently_used():
+    cache = BoundedCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    # 最近使ったaを残し、使っていないbを捨てる
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats == CacheStats(hits=3, misses=1, evictions=1)
+
+
+def test_graph_cache_is_scoped_to_graph():
+    # 同じグラフの中では1つの背景をsplitで共有する
+    with use_graph_cache() as graph_cache:
+        for _ in range(2):
+            get_background_process("640x360")
+        assert get_graph_cache() is graph_cache
+        assert len(graph_cache.background_processes) == 1
+        assert graph_cache.background_processes.stats.hits == 1
+
+    # グラフの外では共有せず、前のグラフのノードも使わない
+    assert get_graph_cache() is not graph_cache
+    with use_graph_cache() as next_graph_cache:
+        get_background_process("640x360")
+        assert next_graph_cache.background_processes.stats.hits == 0
+
+
+def test_graph_cache_stats_are_profiled():
+    with use_render_context(RenderContext()):
+        profiler = start_profiler()
+        with use_graph_cache():
+            for _ in range(3):
+                get_background_process("640x360")
+
+    record = profiler.caches["background_processes"]
+    assert (record.hits, record.misses, record.evictions) == (2, 1, 0)
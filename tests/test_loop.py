@@ -0,0 +1,47 @@
+import re
+
+import pytest
+from conftest import get_command_args, load_document
+
+from converter.main import create_root_process
+
+
+def get_filter_names(args: list[str]) -> list[str]:
+    filter_complex = args[args.index("-filter_complex") + 1]
+    return re.findall(r"\]([a-z_]+)[=\[]", filter_complex)
+
+
+def count_graph_nodes(args: list[str]) -> tuple[int, int]:
+    # 入力(デコーダ)の数と、フィルタのノードの数
+    return args.count("-i"), len(get_filter_names(args))
+
+
+def get_loop_args(media_dir: str, content: str, length: str) -> list[str]:
+    vsml_data = load_document(
+        media_dir, content.format(length=length), name="loop.vsml"
+    )
+    return get_command_args(vsml_data, create_root_process(vsml_data))
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        '<vid src="video.mp4" '
+        'style="object-length: {length}; source-loop: true;" />',
+        '<aud src="audio.wav" '
+        'style="object-length: {length}; source-loop: true;" />',
+    ],
+)
+def test_long_loop_has_no_per_iteration_nodes(media_dir, content):
+    # 素材(2秒)を3回と300回ループするグラフを比べ、長さ以外が同じことを確かめる
+    short_args = get_loop_args(media_dir, content, "6s")
+    long_args = get_loop_args(media_dir, content, "600s")
+
+    # ループの回数が増えても、デコードする入力とフィルタのノードは増えない
+    assert count_graph_nodes(long_args) == count_graph_nodes(short_args)
+    assert get_filter_names(long_args) == get_filter_names(short_args)
+    assert long_args.count("-stream_loop") == 1
+    # 以前のloopとaloopは、ループする区間の全てのフレームを保持していた
+    assert "32767" not in " ".join(long_args)
+    assert "2147483647" not in " ".join(long_args)
+    assert "aloop" not in get_filter_names(long_args)
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+import ffmpeg
+from conftest import ROOT_DIR, write_document
+
+from converter.main import convert_video
+from converter.output import OutputMode, get_output_target
+from converter.profile import get_encode_profile
+from xml_parser import parsing_vsml
+
+VIDEO_CONTENT = '<vid src="video.mp4" style="object-length: 2s;" />'
+
+
+def test_output_target_follows_mode(tmp_path):
+    assert get_output_target(OutputMode.PIPE, "out.mp4") == "pipe:1"
+    assert get_output_target(OutputMode.FILE, None) == "video.mp4"
+    # HLSでは.m3u8以外をディレクトリとして扱い、無ければ作る
+    hls_dir = str(tmp_path / "hls")
+    assert get_output_target(OutputMode.HLS, hls_dir) == os.path.join(
+        hls_dir, "playlist.m3u8"
+    )
+    assert os.path.isdir(hls_dir)
+
+
+def test_fragmented_mp4_output(media_dir, tmp_path):
+    vsml_data = parsing_vsml(write_document(media_dir, VIDEO_CONTENT), True)
+    out_path = str(tmp_path / "out.mp4")
+    convert_video(
+        vsml_data,
+        out_path,
+        False,
+        True,
+        encode_profile=get_encode_profile("draft"),
+        output_mode=OutputMode.FMP4,
+    )
+
+    # 書き出し中でも再生できるよう、キーフレーム(1秒ごと)で断片に分かれる
+    with open(out_path, "rb") as f:
+        assert f.read().count(b"moof") >= 2
+    assert float(ffmpeg.probe(out_path)["format"]["duration"]) == 2.0
+
+
+def test_hls_output(media_dir, tmp_path):
+    vsml_data = parsing_vsml(write_document(media_dir, VIDEO_CONTENT), True)
+    hls_dir = str(tmp_path / "hls")
+    convert_video(vsml_data, hls_dir, False, True, output_mode=OutputMode.HLS)
+
+    with open(os.path.join(hls_dir, "playlist.m3u8"), "r") as f:
+        playlist = f.read()
+    assert "#EXT-X-ENDLIST" in playlist
+    segment_names = [
+        line for line in playlist.splitlines() if line.endswith(".ts")
+    ]
+    assert len(segment_names) > 0
+    for segment_name in segment_names:
+        assert os.path.exists(os.path.join(hls_dir, segment_name))
+
+
+def test_pipe_output(media_dir):
+    vsml_path = write_document(media_dir, VIDEO_CONTENT)
+    result = subprocess.run(
+        [
+            sys.executable,
+            os.path.join(ROOT_DIR, "src", "main.py"),
+            vsml_path,
+            "--offline",
+            "--output-mode",
+            "pipe",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+    # 標準出力には動画だけを書き出す
+    assert result.stdout[4:8] == b"ftyp"
+    assert b"moof" in result.stdout
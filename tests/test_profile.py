@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from converter.profile import ENCODE_PROFILES, get_encode_profile
+
+
+def write_config(tmp_path, config: dict) -> str:
+    config_path = str(tmp_path / "config.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+    return config_path
+
+
+def test_profile_is_looked_up_by_name():
+    assert get_encode_profile() is None
+    assert get_encode_profile("final") == ENCODE_PROFILES["final"]
+    with pytest.raises(ValueError, match="unknown encode profile: fast"):
+        get_encode_profile("fast")
+
+
+def test_config_overrides_and_adds_profiles(tmp_path):
+    config_path = write_config(
+        tmp_path,
+        {
+            "encode_profile": "final",
+            "encode_profiles": {
+                "final": {"crf": 20, "threads": 8},
+                "archive": {
+                    "preset": "veryslow",
+                    "crf": 16,
+                    "keyframe_interval": 10,
+                    "audio_bitrate": "256k",
+                    "thread_queue_size": 64,
+                },
+            },
+        },
+    )
+
+    # 名前の指定が無ければ設定ファイルのプロファイルを使い、上書きを反映する
+    encode_profile = get_encode_profile(None, config_path)
+    assert encode_profile is not None
+    assert (encode_profile.preset, encode_profile.crf) == ("slow", 20)
+    assert encode_profile.get_output_option(30) == {
+        "vcodec": "libx264",
+        "preset": "slow",
+        "crf": 20,
+        "g": 60,
+        "audio_bitrate": "192k",
+        "threads": 8,
+    }
+    archive_profile = get_encode_profile("archive", config_path)
+    assert archive_profile is not None
+    assert archive_profile.preset == "veryslow"
+    # 組み込みのプロファイルは書き換えない
+    assert ENCODE_PROFILES["final"].crf == 18
+
+
+@pytest.mark.parametrize(
+    "values, message",
+    [
+        ({"quality": 1}, "unknown encode profile options: quality"),
+        ({"max_filter_inputs": 1}, "max_filter_inputs must be at least 2"),
+    ],
+)
+def test_invalid_profile_options_are_rejected(tmp_path, values, message):
+    config_path = write_config(
+        tmp_path, {"encode_profiles": {"draft": values}}
+    )
+    with pytest.raises(ValueError, match=message):
+        get_encode_profile("draft", config_path)
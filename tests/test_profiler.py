@@ -0,0 +1,55 @@
+import threading
+
+from conftest import write_document
+
+from converter.main import convert_video
+from profiler import Profiler, start_profiler
+from utils import RenderContext, use_render_context
+from xml_parser import parsing_vsml
+
+
+def test_stage_nesting_is_tracked_per_thread():
+    profiler = Profiler()
+    entered = threading.Event()
+    finished = threading.Event()
+
+    def run_worker():
+        entered.wait()
+        with profiler.stage("worker"):
+            pass
+        finished.set()
+
+    thread = threading.Thread(target=run_worker)
+    thread.start()
+    with profiler.stage("main"):
+        entered.set()
+        finished.wait()
+    thread.join()
+
+    # 別のスレッドのステージは、子として親のself_timeから差し引かない
+    main_record = profiler.stages["main"]
+    assert main_record.self_time == main_record.total_time
+    assert profiler.stages["worker"].count == 1
+    assert profiler.stack == []
+
+
+def test_ffmpeg_benchmark_is_kept_with_progress(media_dir, tmp_path):
+    vsml_path = write_document(
+        media_dir, '<vid src="video.mp4" style="object-length: 1s;" />'
+    )
+    progresses = []
+    with use_render_context(RenderContext()):
+        profiler = start_profiler()
+        vsml_data = parsing_vsml(vsml_path, True)
+    convert_video(
+        vsml_data,
+        str(tmp_path / "out.mp4"),
+        False,
+        True,
+        progress_callback=progresses.append,
+    )
+
+    # 進捗を受け取る場合も、ffmpegの-benchmarkの結果を記録する
+    assert progresses[-1].is_end
+    assert len(profiler.ffmpeg_benchmarks) == 1
+    assert "rtime" in profiler.ffmpeg_benchmarks[0]
@@ -0,0 +1,32 @@
+import os
+
+from conftest import write_document
+
+from converter.main import convert_video
+from xml_parser import parsing_vsml
+
+
+def test_segment_progress_ends_after_concat(media_dir, tmp_path):
+    vsml_data = parsing_vsml(
+        write_document(
+            media_dir,
+            '<vid src="video.mp4" style="object-length: 1s;" />' * 2,
+        ),
+        True,
+    )
+    out_path = str(tmp_path / "out.mp4")
+    events = []
+    convert_video(
+        vsml_data,
+        out_path,
+        False,
+        True,
+        jobs=2,
+        progress_callback=lambda progress: events.append(
+            (progress.is_end, os.path.exists(out_path))
+        ),
+    )
+
+    # 全ての区間を描画し終えても、結合した出力が書き出されるまで終了としない
+    assert events[-1] == (True, True)
+    assert [is_end for is_end, _ in events].count(True) == 1
@@ -0,0 +1,68 @@
+from fractions import Fraction
+
+import ffmpeg
+import pytest
+from conftest import write_document
+
+from converter.main import convert_video
+from converter.segment import split_segments
+from style import TimeValue
+from utils import DraftSetting, RenderContext, VSMLManager, use_render_context
+from xml_parser import parsing_vsml
+
+# フレームの境界に揃わない長さの要素を並べたVSML
+UNALIGNED_CONTENT = "".join(
+    '<img src="image.png" style="object-length: 1.02s;" />' for _ in range(6)
+)
+
+
+def test_time_value_arithmetic_is_exact():
+    with use_render_context(RenderContext(root_fps=Fraction(30000, 1001))):
+        frames = TimeValue("0f")
+        seconds = TimeValue("0s")
+        for _ in range(1001):
+            frames += TimeValue("1f")
+            seconds += TimeValue("0.1s")
+
+        assert frames.unit == TimeValue("1f").unit
+        assert frames.get_fraction() == Fraction(1001 * 1001, 30000)
+        assert seconds.get_fraction() == Fraction(1001, 10)
+        assert (frames + seconds).get_fraction() == Fraction(
+            1001 * 1001, 30000
+        ) + Fraction(1001, 10)
+
+
+@pytest.mark.parametrize("draft", [None, DraftSetting()])
+def test_segment_boundaries_fall_on_frames(media_dir, draft):
+    vsml_data = parsing_vsml(
+        write_document(media_dir, UNALIGNED_CONTENT), True, draft
+    )
+    with use_render_context(vsml_data.context):
+        segments = split_segments(vsml_data.content, 3)
+        frame_rate = VSMLManager.get_output_frame_rate()
+
+    assert segments is not None and len(segments) == 3
+    for segment in segments[:-1]:
+        assert (segment.end * frame_rate).denominator == 1
+    for previous, segment in zip(segments, segments[1:]):
+        assert previous.end == segment.start
+
+
+def test_segmented_render_keeps_frame_count(media_dir, tmp_path):
+    vsml_data = parsing_vsml(
+        write_document(media_dir, UNALIGNED_CONTENT), True
+    )
+    frame_counts = []
+    for jobs in [1, 3]:
+        out_path = str(tmp_path / "out{}.mp4".format(jobs))
+        convert_video(vsml_data, out_path, False, True, jobs)
+        frame_counts.append(
+            int(
+                ffmpeg.probe(out_path, count_frames=None)["streams"][0][
+                    "nb_read_frames"
+                ]
+            )
+        )
+
+    # 区間ごとに丸めたフレーム数の誤差が、結合後に積み重ならない
+    assert frame_counts[0] == frame_counts[1]
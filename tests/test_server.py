@@ -0,0 +1,77 @@
+import asyncio
+import json
+import socket
+import urllib.request
+
+import server
+from server import JobQueue, run_server
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def submit(port: int, body: dict):
+    request = urllib.request.Request(
+        "http://127.0.0.1:{}/jobs".format(port),
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request) as response:
+        assert response.status == 201
+
+
+def test_preview_starts_while_finals_fill_workers(tmp_path, monkeypatch):
+    vsml_path = tmp_path / "test.vsml"
+    vsml_path.write_text("")
+    started: list[str] = []
+    release = asyncio.Event()
+
+    async def render_job(job, *args):
+        started.append("preview" if job.frame is not None else job.output)
+        # 動画の書き出しは、全てのジョブを登録し終えるまで終わらない
+        if job.frame is None:
+            await release.wait()
+
+    async def wait_started(count: int):
+        while len(started) < count:
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        port = get_free_port()
+        job_queue = JobQueue(str(tmp_path / "queue.sqlite3"))
+        server_task = asyncio.create_task(
+            run_server(
+                job_queue, port, 2, True, True, output_dir=str(tmp_path)
+            )
+        )
+        try:
+            await asyncio.sleep(0.1)
+            for index in range(3):
+                await asyncio.to_thread(
+                    submit,
+                    port,
+                    {
+                        "filename": str(vsml_path),
+                        "output": str(tmp_path / "final{}.mp4".format(index)),
+                    },
+                )
+            await asyncio.wait_for(wait_started(1), 5)
+            await asyncio.to_thread(
+                submit, port, {"filename": str(vsml_path), "frame": 0}
+            )
+            await asyncio.wait_for(wait_started(2), 5)
+            release.set()
+            await asyncio.wait_for(wait_started(4), 5)
+        finally:
+            server_task.cancel()
+            await asyncio.gather(server_task, return_exceptions=True)
+
+    monkeypatch.setattr(server, "render_job", render_job)
+    asyncio.run(scenario())
+
+    # 書き出し中の1件に続き、待機中の書き出しより先にプレビューを始める
+    assert started[:2] == [str(tmp_path / "final0.mp4"), "preview"]
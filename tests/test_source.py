@@ -0,0 +1,77 @@
+from conftest import get_command_args, load_document
+
+from converter.graph import compile_args
+from converter.main import create_root_process
+from converter.preview.main import create_image_process
+
+
+def get_input_options(args: list[str], src_name: str) -> list[list[str]]:
+    # 素材を読み込む入力ごとに、-iの前に付く入力オプションを取り出す
+    options = []
+    start = 1
+    for index, arg in enumerate(args):
+        if arg != "-i":
+            continue
+        if args[index + 1].endswith(src_name):
+            options.append(args[start:index])
+        start = index + 2
+    return options
+
+
+def get_filter_complex(args: list[str]) -> str:
+    return args[args.index("-filter_complex") + 1]
+
+
+def test_source_length_is_an_input_option(media_dir):
+    vsml_data = load_document(
+        media_dir, '<vid src="video.mp4" style="object-length: 1s;" />'
+    )
+    args = get_command_args(vsml_data, create_root_process(vsml_data))
+
+    # 長さは入力の-tで指定し、デコードした後にtrimしない
+    assert get_input_options(args, "video.mp4") == [["-t", "1.0"]]
+    assert "trim=end=1.0" not in get_filter_complex(args)
+
+
+def test_preview_seeks_at_input(media_dir):
+    vsml_data = load_document(
+        media_dir,
+        '<seq><img src="image.png" style="object-length: 1s;" />'
+        '<vid src="video.mp4" style="object-length: 2s;" /></seq>',
+    )
+    # 1.5秒目(vidの先頭から0.5秒目)のフレーム
+    args = compile_args(create_image_process(vsml_data, 45, "preview.png"))
+
+    assert get_input_options(args, "video.mp4") == [["-ss", "0.5"]]
+    assert "trim" not in get_filter_complex(args)
+
+
+def test_distant_uses_get_their_own_input(media_dir):
+    vsml_data = load_document(
+        media_dir,
+        '<seq><vid src="video.mp4" style="object-length: 1s;" />'
+        '<img src="image.png" style="object-length: 5s;" />'
+        '<vid src="video.mp4" style="object-length: 1s;" /></seq>',
+    )
+    args = get_command_args(vsml_data, create_root_process(vsml_data))
+    filter_complex = get_filter_complex(args)
+
+    # 離れた時刻の利用は独立した入力とし、splitの連鎖で繋がない
+    assert get_input_options(args, "video.mp4") == [["-t", "1.0"]] * 2
+    assert filter_complex.count("[1:v]split=1[") == 1
+    assert filter_complex.count("[3:v]split=1[") == 1
+
+
+def test_simultaneous_uses_share_one_split(media_dir):
+    vsml_data = load_document(
+        media_dir,
+        "<prl>{}</prl>".format(
+            '<vid src="video.mp4" style="object-length: 1s;" />' * 3
+        ),
+    )
+    args = get_command_args(vsml_data, create_root_process(vsml_data))
+
+    # 同じ時刻の利用は、1つの入力の1つのsplitから分ける
+    assert get_input_options(args, "video.mp4") == [["-t", "1.0"]]
+    assert get_filter_complex(args).count("[1:v]split=3[") == 1
+    assert get_filter_complex(args).count("[1:v]") == 1
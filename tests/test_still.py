@@ -0,0 +1,82 @@
+import os
+import re
+
+import ffmpeg
+from conftest import get_command_args, load_document
+from PIL import Image
+
+import converter.still
+from converter.cache import get_cache_dir
+from converter.command import run_process
+from converter.main import create_root_process
+from converter.still import create_still_process, draw_text, render_still
+from utils import use_render_context
+
+# 同じ画像と文字を2回ずつ並べたVSML
+STILL_CONTENT = (
+    '<img src="image.png" style="object-length: 1s;" />'
+    '<txt style="object-length: 1s;">still</txt>'
+) * 2
+
+
+def test_stills_are_rendered_once(media_dir, monkeypatch):
+    written_paths = []
+    write_still = converter.still.write_still
+
+    def recorded_write_still(vsml_content, still_path):
+        written_paths.append(still_path)
+        write_still(vsml_content, still_path)
+
+    monkeypatch.setattr(converter.still, "write_still", recorded_write_still)
+    vsml_data = load_document(media_dir, "<seq>{}</seq>".format(STILL_CONTENT))
+    args = get_command_args(vsml_data, create_root_process(vsml_data))
+    create_root_process(vsml_data)
+
+    # 同じ画像と文字は1度だけ描画し、2回目のグラフもキャッシュを使う
+    assert len(written_paths) == 2
+    assert sorted(os.listdir(os.path.join(get_cache_dir(), "still"))) == [
+        os.path.basename(path) for path in sorted(written_paths)
+    ]
+    # 描画済みの1フレームを保持し、毎フレームのフィルタを掛けない
+    filter_complex = args[args.index("-filter_complex") + 1]
+    assert "drawtext" not in filter_complex
+    assert len(re.findall(r"loop=loop=-1:size=1:", filter_complex)) == 4
+    assert sum(arg in written_paths for arg in args) == 4
+
+
+def test_text_still_matches_drawtext(media_dir, tmp_path, monkeypatch):
+    vsml_data = load_document(
+        media_dir,
+        '<txt style="object-length: 1s; padding: 4px;">still text</txt>',
+    )
+    text_content = vsml_data.content.items[0]
+    drawtext_path = str(tmp_path / "drawtext.png")
+    with use_render_context(vsml_data.context):
+        image = draw_text(text_content)
+        run_process(
+            ffmpeg.output(
+                create_still_process(text_content),
+                drawtext_path,
+                vframes=1,
+                pix_fmt="rgba",
+            ),
+            overwrite=True,
+            quiet=True,
+        )
+
+        def fail_run_process(*args, **kwargs):
+            raise AssertionError("ffmpeg should not be used for text")
+
+        # フォントを読み込める文字は、ffmpegを使わずPillowで描画する
+        monkeypatch.setattr(converter.still, "run_process", fail_run_process)
+        render_still(text_content)
+
+    assert image is not None
+    with Image.open(drawtext_path) as drawtext_image:
+        assert image.size == drawtext_image.size
+        # drawtextと同じ位置に文字を置く(アンチエイリアスの差は許容する)
+        image_box = image.getchannel("A").getbbox()
+        drawtext_box = drawtext_image.getchannel("A").getbbox()
+    assert image_box is not None and drawtext_box is not None
+    for image_edge, drawtext_edge in zip(image_box, drawtext_box):
+        assert abs(image_edge - drawtext_edge) <= 1